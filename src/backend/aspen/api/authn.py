@@ -20,6 +20,7 @@ import aspen.api.error.http_exceptions as ex
 from aspen.api.deps import get_db, get_settings
 from aspen.api.settings import APISettings
 from aspen.auth.auth0_management import Auth0Client
+from aspen.auth.context_cache import auth_context_cache
 from aspen.auth.device_auth import validate_auth_header
 from aspen.database.models import Group, GroupRole, User, UserRole
 
@@ -70,6 +71,33 @@ async def setup_userinfo(
     return user
 
 
+async def setup_cached_userinfo(
+    session: AsyncSession,
+    auth0_user_id: Optional[str] = None,
+    user_id: Optional[str] = None,
+) -> Optional[User]:
+    """setup_userinfo, but served from the auth context cache when it's enabled."""
+    if auth0_user_id and auth_context_cache.enabled:
+        # A cached user is only good if their roles haven't changed since, in
+        # this process or any other.
+        auth_version = (
+            await session.execute(
+                sa.select(User.auth_version).where(  # type: ignore
+                    User.auth0_user_id == auth0_user_id
+                )
+            )
+        ).scalar_one_or_none()
+        cached_user = auth_context_cache.get(auth0_user_id, None, auth_version)
+        if cached_user:
+            user = await session.merge(cached_user, load=False)
+            sentry_sdk.set_user({"id": user.id, "auth0_uid": user.auth0_user_id})
+            return user
+    user = await setup_userinfo(session, auth0_user_id, user_id)
+    if user and auth0_user_id:
+        auth_context_cache.set(auth0_user_id, None, user.auth_version, user)
+    return user
+
+
 class MagicLinkPayload(TypedDict):
     user_id: str
     expiry: str
@@ -154,7 +182,7 @@ async def get_auth_user(
     if not auth0_user_id and not user_id:
         # TODO - redirect to login.
         raise ex.UnauthenticatedException("Login failure")
-    found_auth_user = await setup_userinfo(session, auth0_user_id, user_id)
+    found_auth_user = await setup_cached_userinfo(session, auth0_user_id, user_id)
     if not found_auth_user:
         # login attempt from user not in DB
         # TODO - redirect to login.
@@ -218,6 +246,9 @@ async def get_user_roles(
 ) -> MutableSequence[UserRole]:
     # Figure out whether this user is a *direct member* of the group
     # we're trying to get context for.
+    if auth_context_cache.enabled and "user_roles" in sa.inspect(user).dict:
+        # Cached users come with all of their roles already loaded.
+        return [row for row in user.user_roles if row.group_id == group_id]
     query = (
         sa.select(UserRole)  # type: ignore
         .options(  # type: ignore
@@ -246,6 +277,12 @@ async def get_auth_context(
         roles.append(row.role.name)
         group = row.group
     if group:
+        # The user's auth_version was checked against the db for this request.
+        cached_group_roles = auth_context_cache.get(
+            user.auth0_user_id, group_id, user.auth_version
+        )
+        if cached_group_roles is not None:
+            return AuthContext(user, group, roles, cached_group_roles)
         query = (
             sa.select(GroupRole)  # type: ignore
             .options(  # type: ignore
@@ -258,6 +295,7 @@ async def get_auth_context(
         group_roles = rolewait.unique().scalars().all()
         for row in group_roles:
             groles.append({"group_id": row.grantor_group.id, "role": row.role.name})
+        auth_context_cache.set(user.auth0_user_id, group_id, user.auth_version, groles)
 
     # Generate an auth context with or without group info.
     ac = AuthContext(user, group, roles, groles)
@@ -1,12 +1,18 @@
+import logging
+import time
+from contextvars import ContextVar
 from functools import lru_cache
 from pathlib import Path
-from typing import Optional
+from typing import Dict, List, Optional, Tuple
 
+import sentry_sdk
 from fastapi import Depends
 from oso import AsyncOso, Relation
+from polar.data.adapter import DataAdapter
 from polar.data.adapter.async_sqlalchemy2_adapter import AsyncSqlAlchemyAdapter
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm.exc import NoResultFound
+from sqlalchemy.sql.expression import Select
 from starlette.requests import Request
 
 from aspen.api.authn import AuthContext, get_auth_context
@@ -15,6 +21,15 @@ from aspen.api.error import http_exceptions as ex
 from aspen.database.models import Group, PhyloRun, PhyloTree, Sample, User
 from aspen.database.models.base import idbase
 
+logger = logging.getLogger(__name__)
+
+POLICY_FILE = Path.joinpath(Path(__file__).parent.absolute(), "policy.polar")
+
+# The db session for the request that's currently asking Oso for a query. Oso's
+# data filtering adapter is global to an Oso instance, so this is how we let one
+# shared instance build queries against each request's own session.
+_request_session: ContextVar[AsyncSession] = ContextVar("authz_request_session")
+
 
 def register_classes(oso):
     oso.register_class(
@@ -76,28 +91,78 @@ def register_classes(oso):
     )
 
 
+class RequestSessionAdapter(DataAdapter):
+    """Data filtering adapter that forwards to the current request's db session."""
+
+    def build_query(self, filter):
+        return AsyncSqlAlchemyAdapter(_request_session.get()).build_query(filter)
+
+    def execute_query(self, query):
+        return AsyncSqlAlchemyAdapter(_request_session.get()).execute_query(query)
+
+
+_oso: Optional[AsyncOso] = None
+
+
+async def get_oso() -> AsyncOso:
+    """Returns this process's Oso instance, loading our policy the first time.
+
+    Registering classes and parsing policy.polar is expensive relative to the
+    queries we run with it, so we do it once per process instead of per request.
+    """
+    global _oso
+    if _oso is None:
+        oso = AsyncOso()
+        oso.set_data_filtering_adapter(RequestSessionAdapter())
+        register_classes(oso)
+        await oso.load_files([POLICY_FILE])
+        _oso = oso
+    return _oso
+
+
 # This is just a thin indirection/wrapper for Oso's interface in case we need to swap it out
 # with something else in the future.
 class AuthZSession:
     def __init__(self, session: AsyncSession, auth_context: AuthContext):
-        oso = AsyncOso()
-        oso.set_data_filtering_adapter(AsyncSqlAlchemyAdapter(session))
-        register_classes(oso)
+        self.session = session
         self.auth_context = auth_context
-        self.oso = oso
-        self.config_loaded = False
-
-    async def load_config(self):
-        await self.oso.load_files(
-            [Path.joinpath(Path(__file__).parent.absolute(), "policy.polar")]
-        )
-        self.config_loaded = True
-
-    async def authorized_query(self, privilege: str, model: idbase):
-        # Temp hack to avoid an await in __init__
-        if not self.config_loaded:
-            await self.load_config()
-        return await self.oso.authorized_query(self.auth_context, privilege, model)
+        # Seconds spent in policy evaluation, per (privilege, model) call.
+        self.timings: List[Tuple[str, str, float]] = []
+        # Our actor is fixed for the life of this session (one request), so the
+        # filter for a given privilege/model never changes. SQLAlchemy selects are
+        # immutable, so callers can safely build on top of a cached one.
+        self._query_cache: Dict[Tuple[str, idbase], Select] = {}
+        self.cache_hits = 0
+
+    async def authorized_query(self, privilege: str, model: idbase) -> Select:
+        cache_key = (privilege, model)
+        if cache_key in self._query_cache:
+            self.cache_hits += 1
+            return self._query_cache[cache_key]
+        query = await self._evaluate_policy(privilege, model)
+        self._query_cache[cache_key] = query
+        return query
+
+    async def _evaluate_policy(self, privilege: str, model: idbase) -> Select:
+        oso = await get_oso()
+        model_name = model.__name__  # type: ignore
+        token = _request_session.set(self.session)
+        try:
+            with sentry_sdk.start_span(
+                op="authz.authorized_query", description=f"{privilege} {model_name}"
+            ):
+                start = time.perf_counter()
+                query = await oso.authorized_query(self.auth_context, privilege, model)
+                elapsed = time.perf_counter() - start
+        finally:
+            _request_session.reset(token)
+        self.timings.append((privilege, model_name, elapsed))
+        logger.debug("authorized_query %s %s took %f", privilege, model_name, elapsed)
+        return query
+
+    @property
+    def total_time(self) -> float:
+        return sum(timing[2] for timing in self.timings)
 
 
 async def get_authz_session(
@@ -114,10 +179,8 @@ class AuthorizedQuery:
 
     async def __call__(
         self,
-        auth_context: AuthContext = Depends(get_auth_context),
-        session: AsyncSession = Depends(get_db),
+        authz_session: AuthZSession = Depends(get_authz_session),
     ):
-        authz_session = AuthZSession(session, auth_context)
         return await authz_session.authorized_query(self.privilege, self.model)
 
 
@@ -137,8 +200,8 @@ class AuthorizedGroup:
         self,
         ac: AuthContext = Depends(get_auth_context),
         db: AsyncSession = Depends(get_db),
+        authz_session: AuthZSession = Depends(get_authz_session),
     ):
-        authz_session = AuthZSession(db, ac)
         query = (await authz_session.authorized_query(self.privilege, Group)).where(Group.id == ac.group.id)  # type: ignore
         res = await (db.execute(query))
         group = res.scalars().one_or_none()
@@ -165,10 +228,9 @@ class AuthorizedRow:
     async def __call__(
         self,
         request: Request,
-        auth_context: AuthContext = Depends(get_auth_context),
         session: AsyncSession = Depends(get_db),
+        authz_session: AuthZSession = Depends(get_authz_session),
     ) -> idbase:
-        authz_session = AuthZSession(session, auth_context)
         query = await authz_session.authorized_query(self.privilege, self.model)
         id_value = int(request.path_params[self.id_field])
         try:
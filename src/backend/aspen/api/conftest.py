@@ -1,7 +1,6 @@
 import random
 import string
 from dataclasses import dataclass
-from functools import partial
 from typing import AsyncGenerator
 from unittest.mock import create_autospec, MagicMock
 
@@ -115,17 +114,6 @@ async def async_session(
         await session.close()  # type: ignore
 
 
-async def override_get_db(
-    async_db: AsyncPostgresDatabase,
-) -> AsyncGenerator[AsyncSession, None]:
-    db = init_async_db(async_db.as_uri())
-    session = db.make_session()
-    try:
-        yield session
-    finally:
-        await session.close()  # type: ignore
-
-
 async def override_get_cookie_userid(
     request: Request, session: AsyncSession = Depends(get_db)
 ) -> User:
@@ -153,14 +141,19 @@ async def api(
     auth0_apiclient: MagicMock,
     auth0_oauth: MagicMock,
     split_client: SplitClient,
-) -> FastAPI:
+) -> AsyncGenerator[FastAPI, None]:
     api = get_app()
-    api.dependency_overrides[get_db] = partial(override_get_db, async_db)
+    # Every request shares one engine (and pool), like they do outside of tests.
+    db_interface = init_async_db(async_db.as_uri())
+    api.state.db_interface = db_interface
     api.dependency_overrides[get_cookie_userid] = override_get_cookie_userid
     api.dependency_overrides[get_auth0_apiclient] = lambda: auth0_apiclient
     api.dependency_overrides[get_auth0_client] = lambda: auth0_oauth
     api.dependency_overrides[get_splitio] = lambda: split_client
-    return api
+    try:
+        yield api
+    finally:
+        await db_interface.engine.dispose()
 
 
 @pytest_asyncio.fixture(scope="function")
@@ -10,6 +10,7 @@ from starlette.requests import Request
 
 from aspen.api.error import http_exceptions as ex
 from aspen.api.settings import APISettings
+from aspen.api.utils.job_dispatcher import JobDispatcher
 from aspen.database.connection import init_async_db, SqlAlchemyInterface
 from aspen.database.models import Pathogen
 from aspen.database.models.pathogens import PathogenRepoConfig
@@ -36,15 +37,28 @@ def get_splitio(request: Request) -> SplitClient:
     return splitio
 
 
-async def get_engine(
-    request: Request, settings: APISettings = Depends(get_settings)
-) -> AsyncGenerator[SqlAlchemyInterface, None]:
-    """Store db session in the context var and reset it"""
-    engine = init_async_db(settings.DB_DSN)
-    try:
-        yield engine
-    finally:
-        pass
+def get_job_dispatcher(request: Request) -> JobDispatcher:
+    # Also stashed at startup, see aspen.api.main.
+    return request.app.state.job_dispatcher
+
+
+def init_api_db(settings: APISettings) -> SqlAlchemyInterface:
+    """Build the process-wide engine (and its connection pool) for the API."""
+    return init_async_db(
+        settings.DB_DSN,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_pre_ping=settings.DB_POOL_PRE_PING,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        echo=settings.DB_ECHO,
+    )
+
+
+def get_engine(request: Request) -> SqlAlchemyInterface:
+    # The engine is created once when the app is built (see aspen.api.main) so
+    # that every request shares the same connection pool.
+    return request.app.state.db_interface
 
 
 async def get_db(
@@ -12,7 +12,7 @@ logging.basicConfig(
 
 # Gunicorn config variables
 loglevel = os.getenv("LOG_LEVEL", "info")
-workers = os.getenv("WORKERS", 4)
+workers = int(os.getenv("WORKERS", 4))
 bind = "unix:///var/run/uvicorn.sock"
 errorlog = "-"
 worker_tmp_dir = "/dev/shm"
@@ -23,6 +23,13 @@ keepalive = int(os.getenv("KEEP_ALIVE", "5"))
 # TODO - this is broken, per https://github.com/encode/uvicorn/issues/527
 access_log_format = 'apiv2 %(h)s %(l)s %(u)s %(t)s "%(r)s" %(s)s %(b)s "%(f)s" "%(a)s"'
 
+# Each worker holds its own connection pool (see aspen.api.deps.init_api_db), so
+# the service as a whole can open up to workers * (pool size + overflow) connections.
+# Compare this against /v2/health/db_pool and the database's max_connections.
+db_pool_size = int(os.getenv("DB_POOL_SIZE", 5))
+db_max_overflow = int(os.getenv("DB_MAX_OVERFLOW", 5))
+max_db_connections = workers * (db_pool_size + db_max_overflow)
+
 # For debugging and testing
 log_data = {
     "loglevel": loglevel,
@@ -34,5 +41,6 @@ log_data = {
     "keepalive": keepalive,
     "errorlog": errorlog,
     "accesslog": accesslog,
+    "max_db_connections": max_db_connections,
 }
 print(json.dumps(log_data))
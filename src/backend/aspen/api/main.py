@@ -10,9 +10,14 @@ from sentry_sdk.integrations.asgi import SentryAsgiMiddleware
 from starlette.middleware.cors import CORSMiddleware
 
 from aspen.api.authn import get_auth_user, require_group_membership
+from aspen.api.deps import init_api_db
 from aspen.api.error.http_exceptions import AspenException, exception_handler
 from aspen.api.middleware.session import SessionMiddleware
 from aspen.api.settings import APISettings
+from aspen.api.utils.etags import configure_fingerprint_cache
+from aspen.api.utils.job_dispatcher import JobDispatcher
+from aspen.api.utils.location_distances import configure_location_coordinate_cache
+from aspen.api.utils.tree_cache import configure_phylo_tree_cache
 from aspen.api.views import (
     auspice,
     auth,
@@ -29,6 +34,8 @@ from aspen.api.views import (
     users,
     usher,
 )
+from aspen.auth.context_cache import configure_auth_context_cache
+from aspen.database.models.sequences import configure_sequence_packing
 from aspen.util.split import SplitClient
 
 
@@ -79,6 +86,49 @@ def get_app() -> FastAPI:
     # Add a global settings object to the app that we can use as a dependency
     _app.state.aspen_settings = settings
 
+    # One engine (and connection pool) per worker process, shared by every request.
+    # Connections aren't opened until they're first needed, so this is cheap.
+    _app.state.db_interface = init_api_db(settings)
+
+    # Starts the on-demand jobs that sample uploads queue up. Registered before
+    # the engine is disposed of, since shutdown handlers run in order.
+    _app.state.job_dispatcher = JobDispatcher(
+        _app.state.db_interface,
+        settings,
+        window=settings.JOB_DISPATCH_WINDOW_SECONDS,
+        max_delay=settings.JOB_DISPATCH_MAX_DELAY_SECONDS,
+        poll_interval=settings.JOB_DISPATCH_POLL_SECONDS,
+        max_samples=settings.JOB_DISPATCH_MAX_SAMPLES,
+        retry_delay=settings.JOB_DISPATCH_RETRY_SECONDS,
+        max_attempts=settings.JOB_DISPATCH_MAX_ATTEMPTS,
+    )
+
+    @_app.on_event("startup")
+    async def start_job_dispatcher() -> None:
+        _app.state.job_dispatcher.start()
+
+    @_app.on_event("shutdown")
+    async def stop_job_dispatcher() -> None:
+        await _app.state.job_dispatcher.stop()
+
+    @_app.on_event("shutdown")
+    async def dispose_db_engine() -> None:
+        await _app.state.db_interface.engine.dispose()
+
+    # Optionally cache each user's resolved roles for a short while.
+    configure_auth_context_cache(
+        settings.AUTH_CONTEXT_CACHE_SIZE, settings.AUTH_CONTEXT_CACHE_TTL
+    )
+    # Optionally cache processed trees for viewers that fetch them repeatedly.
+    configure_phylo_tree_cache(
+        settings.PHYLO_TREE_CACHE_SIZE,
+        settings.PHYLO_TREE_CACHE_TTL,
+        settings.PHYLO_TREE_CACHE_DIR,
+    )
+    configure_location_coordinate_cache(settings.LOCATION_COORDINATES_CACHE_TTL)
+    configure_fingerprint_cache(settings.ETAG_FINGERPRINT_CACHE_TTL)
+    configure_sequence_packing(settings.PACK_SEQUENCES)
+
     # Set up Split.io feature flagging
     splitio = SplitClient(settings)
 
@@ -3,3 +3,21 @@ from aspen.api.schemas.base import BaseResponse
 
 class Health(BaseResponse):
     healthy: bool = False
+
+
+class DBPoolStats(BaseResponse):
+    pool_class: str
+    size: int
+    checked_in: int
+    checked_out: int
+    overflow: int
+    max_overflow: int
+
+
+class PhyloTreeCacheStats(BaseResponse):
+    enabled: bool
+    size: int
+    maxsize: int
+    hits: int
+    disk_hits: int
+    misses: int
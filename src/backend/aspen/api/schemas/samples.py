@@ -1,7 +1,8 @@
 import datetime
-from typing import Any, List, Optional
+from functools import lru_cache
+from typing import Any, Dict, FrozenSet, List, Optional, Type
 
-from pydantic import constr, validator
+from pydantic import constr, create_model, validator
 from pydantic.utils import GetterDict
 
 from aspen.api.schemas.base import BaseRequest, BaseResponse
@@ -116,6 +117,23 @@ class SampleResponse(BaseResponse):
     qc_metrics: Optional[List[SampleQCMetricsResponse]]
 
 
+@lru_cache(maxsize=None)
+def sample_response_projection(fields: FrozenSet[str]) -> Type[BaseResponse]:
+    """A version of SampleResponse that only has (and only reads) `fields`."""
+    field_definitions: Dict[str, Any] = {}
+    for name in fields:
+        field = SampleResponse.__fields__[name]
+        field_definitions[name] = (
+            field.outer_type_,
+            ... if field.required else None,
+        )
+    return create_model(  # type: ignore
+        "SampleResponseProjection",
+        __config__=SampleResponse.__config__,
+        **field_definitions,
+    )
+
+
 class SampleBulkDeleteRequest(BaseRequest):
     ids: List[int]
 
@@ -124,6 +142,13 @@ class SamplesResponse(BaseResponse):
     samples: List[SampleResponse]
 
 
+class SamplesPageResponse(BaseResponse):
+    # Each sample only includes the fields that were requested.
+    samples: List[Dict[str, Any]]
+    # Pass this back to get the next page. It's null on the last page.
+    next_cursor: Optional[str]
+
+
 class SampleBulkDeleteResponse(BaseResponse):
     ids: List[int]
 
@@ -11,7 +11,13 @@ class SequenceRequest(BaseRequest):
 class FastaURLRequest(BaseRequest):
     samples: list[str]
     downstream_consumer: Optional[str] = None
+    # Write the file in the background and return right away. Poll
+    # /getfastaurl/{upload_id} to find out when it's ready.
+    background: bool = False
 
 
 class FastaURLResponse(BaseResponse):
     url: str
+    upload_id: str
+    # One of "pending", "ready" or "failed"
+    status: str
@@ -76,7 +76,13 @@ class Settings(BaseSettings):
     SERVICE_NAME: str = "Aspen"
     DB_DRIVER: str = "postgresql+asyncpg"
     DB_POOL_SIZE: int = 5
-    DB_MAX_OVERFLOW: int = 0
+    DB_MAX_OVERFLOW: int = 5
+    DB_POOL_TIMEOUT: int = 30
+    # Check connections are alive before handing them out of the pool, and
+    # recycle them periodically so we don't hold on to connections that RDS
+    # or a proxy has silently dropped.
+    DB_POOL_PRE_PING: bool = True
+    DB_POOL_RECYCLE: int = 1800
     DB_ECHO: bool = False
     DEBUG: bool = False
 
@@ -236,6 +242,43 @@ class APISettings(Settings):
     # Env vars usually read from env vars
     FLASK_ENV: str
     API_URL: str
+    # Seconds to keep resolved users/roles around between requests. 0 disables
+    # the cache and resolves them from the db on every request.
+    AUTH_CONTEXT_CACHE_TTL: int = 0
+    AUTH_CONTEXT_CACHE_SIZE: int = 1024
+    # Seconds to keep processed phylo trees around for repeat downloads and
+    # auspice views. 0 disables the cache. If a directory is set, trees are
+    # also cached there so that all workers on a host can share them.
+    PHYLO_TREE_CACHE_TTL: int = 0
+    PHYLO_TREE_CACHE_SIZE: int = 32
+    PHYLO_TREE_CACHE_DIR: Optional[str] = None
+    # Seconds to keep location coordinates around for tree colorings. These only
+    # change when the import_location_latlongs job fills in missing lat/longs,
+    # so this is also how long it takes for that job's results to show up.
+    LOCATION_COORDINATES_CACHE_TTL: int = 3600
+    # Seconds to reuse the fingerprints we compute ETags for the location and
+    # lineage lists from, instead of reading those tables on every request.
+    # Changes to them can take this long to show up. 0 disables the cache.
+    ETAG_FINGERPRINT_CACHE_TTL: int = 5
+    # Write uploaded sequences packed (normalized and compressed) instead of as
+    # the raw FASTA text. Workflows read the same PACK_SEQUENCES env var.
+    PACK_SEQUENCES: bool = False
+    # On-demand jobs (Pangolin, lineage QC) for new samples are held for this many
+    # seconds after the last upload for the same group and pathogen, so uploads
+    # close together share one job. They're never held longer than
+    # JOB_DISPATCH_MAX_DELAY_SECONDS, and each worker also checks for held jobs
+    # every JOB_DISPATCH_POLL_SECONDS.
+    JOB_DISPATCH_WINDOW_SECONDS: float = 30
+    JOB_DISPATCH_MAX_DELAY_SECONDS: float = 300
+    JOB_DISPATCH_POLL_SECONDS: float = 60
+    # Step Functions caps an execution's input at 256KB, so no job is started for
+    # more than this many samples; bigger backlogs are split across several jobs.
+    JOB_DISPATCH_MAX_SAMPLES: int = 2000
+    # Samples whose job fails to start are retried after
+    # JOB_DISPATCH_RETRY_SECONDS, doubling each time, and set aside (and logged)
+    # after JOB_DISPATCH_MAX_ATTEMPTS tries.
+    JOB_DISPATCH_RETRY_SECONDS: float = 60
+    JOB_DISPATCH_MAX_ATTEMPTS: int = 5
 
     ####################################################################################
     # Stack name
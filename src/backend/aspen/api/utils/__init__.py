@@ -6,6 +6,9 @@ from aspen.api.utils.pathogens import (  # noqa: F401
 )
 from aspen.api.utils.phylo import (  # noqa: F401
     extract_accessions,
+    get_public_tree_location,
+    get_tree_accessions,
+    get_tree_etag,
     process_phylo_tree,
     verify_and_access_phylo_tree,
 )
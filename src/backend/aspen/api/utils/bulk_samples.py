@@ -0,0 +1,148 @@
+"""Creates uploaded samples, and their genomes, a whole upload at a time.
+
+Adding an upload's samples through the ORM one by one costs several round
+trips per sample: a location lookup, then an INSERT into each of samples,
+entities, pathogen_genomes and uploaded_pathogen_genomes, each waiting on the
+one before it for its id. Here locations are looked up with one query, ids are
+reserved up front with one query per table, and every table is then written
+with multi-row INSERTs.
+
+Rows written this way skip the ORM, so everything the models would fill in on
+flush (genome statistics, stripped sequences) is filled in here instead.
+"""
+from typing import Any, Dict, Iterable, List, Mapping, Sequence, TYPE_CHECKING
+
+import sqlalchemy as sa
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from aspen.database.models import (
+    Entity,
+    EntityType,
+    Group,
+    Location,
+    Pathogen,
+    PathogenGenome,
+    Sample,
+    UploadedPathogenGenome,
+    User,
+)
+from aspen.util.sequences import sequence_statistics, strip_sequence
+from aspen.workflows.shared_utils.database import insert_batches, reserve_ids_query
+
+if TYPE_CHECKING:
+    from aspen.api.schemas.samples import CreateSampleRequest
+
+
+async def get_locations_by_id(
+    db: AsyncSession, location_ids: Iterable[int]
+) -> Dict[int, Location]:
+    query = sa.select(Location).where(  # type: ignore
+        Location.id.in_(set(location_ids))  # type: ignore
+    )
+    res = await db.execute(query)
+    return {location.id: location for location in res.scalars()}
+
+
+async def reserve_ids(db: AsyncSession, table: sa.Table, count: int) -> List[int]:
+    """Takes `count` ids from the sequence behind `table`'s id column, in
+    ascending order."""
+    if not count:
+        return []
+    res = await db.execute(reserve_ids_query(table, count))
+    return sorted(res.scalars())
+
+
+async def insert_rows(
+    db: AsyncSession, table: sa.Table, rows: Sequence[Mapping[str, Any]]
+) -> None:
+    for statement in insert_batches(table, rows):
+        await db.execute(statement)
+
+
+async def create_uploaded_samples(
+    db: AsyncSession,
+    group: Group,
+    user: User,
+    pathogen: Pathogen,
+    public_identifier_prefix: str,
+    locations: Mapping[int, Location],
+    create_samples_request: Sequence["CreateSampleRequest"],
+) -> List[int]:
+    """Inserts a sample and uploaded genome for each row of the request, which
+    must already be validated: no duplicate identifiers, and every row's
+    location in `locations`. Returns the new samples' ids, in request order."""
+    sample_ids = await reserve_ids(
+        db, Sample.__table__, len(create_samples_request)  # type: ignore
+    )
+    genome_ids = await reserve_ids(
+        db, Entity.__table__, len(create_samples_request)  # type: ignore
+    )
+
+    samples: List[Dict[str, Any]] = []
+    entities: List[Dict[str, Any]] = []
+    pathogen_genomes: List[Dict[str, Any]] = []
+    uploaded_pathogen_genomes: List[Dict[str, Any]] = []
+    for row, sample_id, genome_id in zip(
+        create_samples_request, sample_ids, genome_ids
+    ):
+        sample_input = row.sample
+        pathogen_genome_input = row.pathogen_genome
+        location = locations[sample_input.location_id]
+
+        public_identifier = sample_input.public_identifier
+        if not public_identifier:
+            before_id, after_id = Sample.public_identifier_affixes(
+                public_identifier_prefix, location.country, group.prefix
+            )
+            public_identifier = f"{before_id}{sample_id}{after_id}"
+        samples.append(
+            {
+                "id": sample_id,
+                "submitting_group_id": group.id,
+                "uploaded_by_id": user.id,
+                "sample_collected_by": group.name,
+                "sample_collector_contact_address": group.address,
+                "organism": sample_input.organism,
+                "private_identifier": sample_input.private_identifier,
+                "collection_date": sample_input.collection_date,
+                "private": sample_input.private,
+                "public_identifier": public_identifier,
+                "authors": sample_input.authors or [group.name],
+                "location_id": location.id,
+                "pathogen_id": pathogen.id,
+                "original_submission": {},
+            }
+        )
+
+        sequence = pathogen_genome_input.sequence
+        statistics = sequence_statistics(sequence)
+        stripped_sequence = strip_sequence(sequence)
+        entities.append(
+            {"id": genome_id, "entity_type": EntityType.UPLOADED_PATHOGEN_GENOME}
+        )
+        pathogen_genomes.append(
+            {
+                "entity_id": genome_id,
+                "sequence": sequence,
+                "num_unambiguous_sites": statistics.num_unambiguous_sites,
+                "num_missing_alleles": statistics.num_missing_alleles,
+                "num_mixed": statistics.num_mixed,
+                "sequencing_date": pathogen_genome_input.sequencing_date,
+            }
+        )
+        uploaded_pathogen_genomes.append(
+            {
+                "pathogen_genome_id": genome_id,
+                "sample_id": sample_id,
+                "stripped_sequence": stripped_sequence,
+                "stripped_sequence_length": len(stripped_sequence),
+            }
+        )
+
+    await insert_rows(db, Sample.__table__, samples)  # type: ignore
+    await insert_rows(db, Entity.__table__, entities)  # type: ignore
+    await insert_rows(db, PathogenGenome.__table__, pathogen_genomes)  # type: ignore
+    await insert_rows(
+        db, UploadedPathogenGenome.__table__, uploaded_pathogen_genomes  # type: ignore
+    )
+    return sample_ids
@@ -1,6 +1,6 @@
 import re
 from enum import Enum
-from typing import AsyncGenerator, Optional, Set
+from typing import AsyncGenerator, AsyncIterator, Optional, Set
 
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import joinedload
@@ -8,6 +8,7 @@ from sqlalchemy.orm import joinedload
 from aspen.api.authn import AuthContext
 from aspen.api.authz import AuthZSession
 from aspen.api.utils import apply_pathogen_prefix_to_identifier, samples_by_identifiers
+from aspen.api.utils.chunked_output import chunk_output_async, DEFAULT_CHUNK_SIZE
 from aspen.database.models import Pathogen, Sample, UploadedPathogenGenome
 
 
@@ -27,6 +28,8 @@ class FastaStreamer:
         sample_ids: Set[str],
         prefix: Optional[str] = None,
         downstream_consumer: Optional[str] = None,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        compress: bool = False,
     ):
         self.db = db
         self.ac = ac
@@ -36,15 +39,21 @@ class FastaStreamer:
         self.pathogen = pathogen
         # Certain consumers have different requirements on fasta
         self.downstream_consumer = downstream_consumer
+        # Output is sent in chunks of about chunk_size bytes, gzipped if compress
+        self.chunk_size = chunk_size
+        self.compress = compress
 
-    async def stream(self) -> AsyncGenerator[str, None]:
+    def stream(self) -> AsyncIterator[bytes]:
+        return chunk_output_async(self.records(), self.chunk_size, self.compress)
+
+    async def records(self) -> AsyncGenerator[str, None]:
         # query for samples
         sample_query = await samples_by_identifiers(
             self.az, self.pathogen, self.sample_ids, "sequences"
         )
         sample_query = sample_query.options(  # type: ignore
             joinedload(Sample.uploaded_pathogen_genome, innerjoin=True).undefer(  # type: ignore
-                UploadedPathogenGenome.sequence
+                UploadedPathogenGenome.fasta_sequence
             )
         )
 
@@ -55,14 +64,7 @@ class FastaStreamer:
                 pathogen_genome: UploadedPathogenGenome = (
                     sample.uploaded_pathogen_genome
                 )
-                sequence: str = "".join(
-                    [
-                        line
-                        for line in pathogen_genome.sequence.splitlines()
-                        if not (line.startswith(">") or line.startswith(";"))
-                    ]
-                )
-                stripped_sequence: str = sequence.strip("Nn")
+                stripped_sequence: str = pathogen_genome.get_stripped_sequence()
                 # use private id if the user has access to it, else public id
                 if sample.submitting_group_id == self.ac.group.id:  # type: ignore
                     yield self._output_id_line(sample.private_identifier)
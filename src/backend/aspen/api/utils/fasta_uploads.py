@@ -0,0 +1,190 @@
+"""FASTA files for downstream consumers (UShER placements etc.), written to S3.
+
+Files are named after a hash of everything that goes into them, so asking for
+the same samples again (a repeated placement, say) reuses the file we already
+wrote instead of streaming every sequence out of the db and into S3 again.
+Large sample sets can take a while to write, so uploads can also run in the
+background while the client polls for them by their upload id.
+
+A background upload leaves a marker next to its file in S3 while it's being
+written, with the time it started, so identical requests to any worker don't
+start it again. Uploads that have been pending for longer than
+FASTA_UPLOAD_TIMEOUT are assumed to have died along with their worker: they're
+reported as failed, and the next request for them starts them over.
+"""
+import hashlib
+import logging
+import time
+from typing import Optional, Set
+
+import sqlalchemy as sa
+from botocore.exceptions import ClientError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from aspen.api.authn import AuthContext
+from aspen.api.authz import AuthZSession
+from aspen.api.utils.fasta_streamer import FastaStreamer
+from aspen.api.utils.sample import samples_by_identifiers
+from aspen.aws import s3_gateway
+from aspen.database.connection import SqlAlchemyInterface
+from aspen.database.models import Pathogen, UploadedPathogenGenome
+
+logger = logging.getLogger(__name__)
+
+# Bump this if FastaStreamer's output changes, so we stop reusing old files.
+FASTA_FORMAT_VERSION = 1
+# Big parts mean fewer requests to S3 for big sample sets.
+FASTA_UPLOAD_PART_SIZE = 64 * 1024 * 1024
+
+UPLOAD_PENDING = "pending"
+UPLOAD_READY = "ready"
+UPLOAD_FAILED = "failed"
+
+# Seconds. Far longer than writing even the biggest FASTAs takes.
+FASTA_UPLOAD_TIMEOUT = 30 * 60
+
+
+def fasta_upload_key(group_name: str, upload_id: str) -> str:
+    return f"fasta-url-files/{group_name}/{upload_id}.fasta"
+
+
+def _failure_marker_key(key: str) -> str:
+    return f"{key}.failed"
+
+
+def _pending_marker_key(key: str) -> str:
+    return f"{key}.pending"
+
+
+async def _upload_started_at(bucket: str, key: str) -> Optional[float]:
+    """When the upload of `key` that's still being written started, if any."""
+    try:
+        response = await s3_gateway().get_object(bucket, _pending_marker_key(key))
+    except ClientError as err:
+        if err.response["Error"]["Code"] in ("404", "NoSuchKey"):
+            return None
+        raise
+    return float(response["Body"])
+
+
+def _timed_out(started_at: Optional[float]) -> bool:
+    return started_at is None or time.time() - started_at > FASTA_UPLOAD_TIMEOUT
+
+
+async def fasta_upload_id(
+    db: AsyncSession,
+    az: AuthZSession,
+    ac: AuthContext,
+    pathogen: Pathogen,
+    sample_ids: Set[str],
+    downstream_consumer: Optional[str] = None,
+) -> str:
+    """A hash of the contents of the FASTA FastaStreamer would write for these
+    samples. Sequences are hashed in the db so we don't have to load them."""
+    group_id = ac.group.id  # type: ignore
+    samples = (
+        await samples_by_identifiers(az, pathogen, sample_ids, "sequences")
+    ).subquery()
+    query = (
+        sa.select(  # type: ignore
+            samples.c.id,
+            samples.c.private_identifier,
+            samples.c.public_identifier,
+            samples.c.submitting_group_id == group_id,
+            sa.func.md5(UploadedPathogenGenome.sequence),
+        )
+        .join(UploadedPathogenGenome, UploadedPathogenGenome.sample_id == samples.c.id)
+        .order_by(samples.c.id)
+    )
+    rows = [tuple(row) for row in await db.execute(query)]
+    contents = (FASTA_FORMAT_VERSION, group_id, downstream_consumer, rows)
+    return hashlib.sha256(repr(contents).encode("utf8")).hexdigest()
+
+
+async def fasta_upload_exists(bucket: str, key: str) -> bool:
+    try:
+        await s3_gateway().head_object(bucket, key)
+    except ClientError as err:
+        if err.response["Error"]["Code"] in ("404", "NoSuchKey"):
+            return False
+        raise
+    return True
+
+
+async def get_fasta_upload_status(bucket: str, key: str) -> str:
+    if await fasta_upload_exists(bucket, key):
+        return UPLOAD_READY
+    if await fasta_upload_exists(bucket, _failure_marker_key(key)):
+        return UPLOAD_FAILED
+    if _timed_out(await _upload_started_at(bucket, key)):
+        # Nothing is writing it (anymore), asking for it again will.
+        return UPLOAD_FAILED
+    return UPLOAD_PENDING
+
+
+async def write_fasta_upload(
+    db: AsyncSession,
+    az: AuthZSession,
+    ac: AuthContext,
+    pathogen: Pathogen,
+    sample_ids: Set[str],
+    downstream_consumer: Optional[str],
+    bucket: str,
+    key: str,
+) -> None:
+    streamer = FastaStreamer(
+        db, az, ac, pathogen, sample_ids, downstream_consumer=downstream_consumer
+    )
+    async with s3_gateway().writer(bucket, key, FASTA_UPLOAD_PART_SIZE) as writer:
+        async for line in streamer.stream():
+            await writer.write(line)
+
+
+async def start_fasta_upload(bucket: str, key: str) -> bool:
+    """Claims an upload. Returns False if it's already being written, by this
+    worker or any other.
+
+    Two requests that race each other here can both claim the same upload.
+    They write identical files, so that only costs the duplicate work."""
+    if not _timed_out(await _upload_started_at(bucket, key)):
+        return False
+    gateway = s3_gateway()
+    await gateway.put_object(
+        bucket, _pending_marker_key(key), str(time.time()).encode("utf8")
+    )
+    # Clear out any earlier failure, we're trying again.
+    await gateway.delete_object(bucket, _failure_marker_key(key))
+    return True
+
+
+async def run_fasta_upload(
+    engine: SqlAlchemyInterface,
+    ac: AuthContext,
+    pathogen: Pathogen,
+    sample_ids: Set[str],
+    downstream_consumer: Optional[str],
+    bucket: str,
+    key: str,
+) -> None:
+    """Writes a FASTA claimed with `start_fasta_upload`, after the request that
+    asked for it has finished. Uses its own db session since the request's may
+    be closed by the time this runs. Failures are recorded in S3 so that
+    `get_fasta_upload_status` can report them."""
+    session = engine.make_session()
+    try:
+        await write_fasta_upload(
+            session,
+            AuthZSession(session, ac),
+            ac,
+            pathogen,
+            sample_ids,
+            downstream_consumer,
+            bucket,
+            key,
+        )
+    except Exception:
+        logger.exception(f"Failed to write {key}")
+        await s3_gateway().put_object(bucket, _failure_marker_key(key), b"")
+    finally:
+        await session.close()  # type: ignore
+        await s3_gateway().delete_object(bucket, _pending_marker_key(key))
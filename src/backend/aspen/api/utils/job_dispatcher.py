@@ -0,0 +1,300 @@
+"""Starts the on-demand jobs (Pangolin, lineage QC) we run on new samples.
+
+Uploads don't start these jobs themselves. They add their samples to the
+pending_ondemand_jobs outbox, in the same transaction as the samples, and a
+JobDispatcher in each API worker merges all the pending rows for the same
+group, pathogen and job type into a single Step Functions execution. Rows are
+held back until none have been added for `window` seconds, or until the oldest
+has waited `max_delay` seconds, so a burst of small uploads gets one job
+instead of one per upload.
+
+No job is started for more than `max_samples` samples, since Step Functions
+caps the size of an execution's input, so a big backlog is split across
+several jobs.
+
+Rows are claimed with SELECT ... FOR UPDATE SKIP LOCKED, so dispatchers in
+different workers never start a job for the same rows, and they're only
+deleted once their job has started. If starting it fails, the rows stay put
+and are retried after `retry_delay` seconds, doubling with each attempt, while
+rows queued since go ahead without them. After `max_attempts` failures they're
+logged and set aside (see PendingOnDemandJob.failed_at).
+"""
+import asyncio
+import datetime
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Iterable, List, Optional, Sequence, Set, Tuple
+
+import sqlalchemy as sa
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from aspen.api.settings import Settings
+from aspen.database.connection import SqlAlchemyInterface
+from aspen.database.models import Group, OnDemandJobType, Pathogen, PendingOnDemandJob
+from aspen.util.swipe import LineageQcJob, PangolinJob
+
+logger = logging.getLogger(__name__)
+
+# (group id, pathogen id, job type)
+JobKey = Tuple[int, int, OnDemandJobType]
+
+
+def enqueue_ondemand_job(
+    db: AsyncSession,
+    group: Group,
+    pathogen: Pathogen,
+    job_type: OnDemandJobType,
+    sample_ids: Sequence[Any],
+) -> None:
+    """Queues a job for `sample_ids` in the caller's transaction. A dispatcher
+    starts it once the transaction has committed."""
+    if not sample_ids:
+        return
+    db.add(
+        PendingOnDemandJob(
+            group_id=group.id,
+            pathogen_id=pathogen.id,
+            job_type=job_type,
+            sample_ids=list(sample_ids),
+        )
+    )
+
+
+def merge_sample_ids(batches: Iterable[Sequence[Any]]) -> List[Any]:
+    """All the ids in `batches`, in order, without repeats."""
+    return list(dict.fromkeys(id for batch in batches for id in batch))
+
+
+def batch_pending_jobs(
+    rows: Sequence[Any], max_samples: int
+) -> List[Tuple[List[Any], List[List[Any]]]]:
+    """Groups pending rows, in order, so that each group's merged sample ids
+    fit in one job. Returns each group of rows along with the sample ids of the
+    jobs to start for it: just the one, unless a single row has more than
+    `max_samples` samples by itself."""
+    groups: List[List[Any]] = []
+    group_ids: Set[Any] = set()
+    for row in rows:
+        row_ids = set(row.sample_ids)
+        if groups and len(group_ids | row_ids) <= max_samples:
+            groups[-1].append(row)
+            group_ids |= row_ids
+        else:
+            groups.append([row])
+            group_ids = row_ids
+    batches = []
+    for group in groups:
+        sample_ids = merge_sample_ids(row.sample_ids for row in group)
+        jobs = [
+            sample_ids[start : start + max_samples]
+            for start in range(0, len(sample_ids), max_samples)
+        ]
+        batches.append((group, jobs))
+    return batches
+
+
+class JobDispatcher:
+    def __init__(
+        self,
+        interface: SqlAlchemyInterface,
+        settings: Settings,
+        window: float,
+        max_delay: float,
+        poll_interval: float,
+        max_samples: int = 2000,
+        retry_delay: float = 60,
+        max_attempts: int = 5,
+        sfn_client: Any = None,
+    ):
+        self.interface = interface
+        self.settings = settings
+        self.window = window
+        self.max_delay = max(max_delay, window)
+        self.poll_interval = poll_interval
+        self.max_samples = max_samples
+        self.retry_delay = retry_delay
+        self.max_attempts = max_attempts
+        # See SwipeJob. Tests pass a LocalStepFunctionsClient.
+        self.sfn_client = sfn_client
+        # boto3 is synchronous, so jobs are started from a single thread, one at
+        # a time, however many uploads come in.
+        self._executor = ThreadPoolExecutor(1, thread_name_prefix="ondemand-jobs")
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        """Starts dispatching in the background, on the running event loop."""
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self._executor.shutdown(wait=True)
+
+    def notify(self) -> None:
+        """Lets the dispatcher know jobs were just queued, so it doesn't wait
+        for its next poll to look at them."""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def dispatch_ready(self) -> int:
+        """Starts jobs for every group, pathogen and job type whose pending
+        samples are ready. Returns how many jobs were started."""
+        started = 0
+        for key in await self._ready_keys():
+            started += await self._dispatch(key)
+        return started
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.dispatch_ready()
+            except Exception:
+                logger.exception("Failed to dispatch on-demand jobs")
+            await self._wait()
+
+    async def _wait(self) -> None:
+        wakeup: asyncio.Event = self._wakeup  # type: ignore
+        try:
+            await asyncio.wait_for(wakeup.wait(), self.poll_interval)
+        except asyncio.TimeoutError:
+            return
+        wakeup.clear()
+        # Give anything else that's about to be uploaded a chance to join in.
+        await asyncio.sleep(self.window)
+
+    @staticmethod
+    def _pending() -> List[Any]:
+        """Filters for the rows that aren't set aside or waiting on a retry."""
+        jobs = PendingOnDemandJob
+        return [
+            jobs.failed_at.is_(None),
+            sa.or_(jobs.retry_at.is_(None), jobs.retry_at <= sa.func.now()),
+        ]
+
+    async def _ready_keys(self) -> List[JobKey]:
+        jobs = PendingOnDemandJob
+        # created_at is set by the db, so compare it against the db's clock.
+        now = sa.func.now()
+        query = (
+            sa.select(jobs.group_id, jobs.pathogen_id, jobs.job_type)  # type: ignore
+            .where(*self._pending())
+            .group_by(jobs.group_id, jobs.pathogen_id, jobs.job_type)
+            .having(
+                sa.or_(
+                    sa.func.max(jobs.created_at)
+                    <= now - datetime.timedelta(seconds=self.window),
+                    sa.func.min(jobs.created_at)
+                    <= now - datetime.timedelta(seconds=self.max_delay),
+                )
+            )
+        )
+        session = self.interface.make_session()
+        try:
+            return [tuple(row) for row in await session.execute(query)]  # type: ignore
+        finally:
+            await session.close()  # type: ignore
+
+    async def _dispatch(self, key: JobKey) -> int:
+        group_id, pathogen_id, job_type = key
+        jobs = PendingOnDemandJob
+        session = self.interface.make_session()
+        started = 0
+        try:
+            claimed = (
+                await session.execute(
+                    sa.select(jobs.id, jobs.sample_ids, jobs.attempts)  # type: ignore
+                    .where(
+                        jobs.group_id == group_id,
+                        jobs.pathogen_id == pathogen_id,
+                        jobs.job_type == job_type,
+                        *self._pending(),
+                    )
+                    .order_by(jobs.id)
+                    .with_for_update(skip_locked=True)
+                )
+            ).all()
+            if not claimed:
+                # Another worker's dispatcher got to them first.
+                return 0
+            group = await session.get(Group, group_id)
+            pathogen = await session.get(Pathogen, pathogen_id)
+            for rows, job_sample_ids in batch_pending_jobs(claimed, self.max_samples):
+                row_ids = [row.id for row in rows]
+                try:
+                    for sample_ids in job_sample_ids:
+                        await asyncio.get_running_loop().run_in_executor(
+                            self._executor,
+                            self._start_job,
+                            group,
+                            pathogen,
+                            job_type,
+                            sample_ids,
+                        )
+                        started += 1
+                except Exception:
+                    logger.exception(
+                        f"Failed to start {job_type.value} job for group {group_id}, "
+                        f"pathogen {pathogen_id}"
+                    )
+                    await self._retry_later(session, rows)
+                    continue
+                await session.execute(sa.delete(jobs).where(jobs.id.in_(row_ids)))
+            await session.commit()  # type: ignore
+            return started
+        except Exception:
+            logger.exception(
+                f"Failed to dispatch {job_type.value} jobs for group {group_id}, "
+                f"pathogen {pathogen_id}"
+            )
+            await session.rollback()  # type: ignore
+            return started
+        finally:
+            await session.close()  # type: ignore
+
+    async def _retry_later(self, session: AsyncSession, rows: Sequence[Any]) -> None:
+        """Backs off from rows whose job failed to start, or sets them aside
+        once they've used up their attempts."""
+        jobs = PendingOnDemandJob
+        retry_ids = [row.id for row in rows if row.attempts + 1 < self.max_attempts]
+        failed = [row for row in rows if row.attempts + 1 >= self.max_attempts]
+        if retry_ids:
+            # Doubles with every attempt.
+            delay = sa.cast(
+                datetime.timedelta(seconds=self.retry_delay), sa.Interval
+            ) * sa.func.power(2, jobs.attempts)
+            await session.execute(
+                sa.update(jobs)
+                .where(jobs.id.in_(retry_ids))
+                .values(attempts=jobs.attempts + 1, retry_at=sa.func.now() + delay)
+            )
+        if failed:
+            for row in failed:
+                logger.error(
+                    f"Giving up on pending on-demand job {row.id} after "
+                    f"{row.attempts + 1} attempts, samples: {row.sample_ids}"
+                )
+            await session.execute(
+                sa.update(jobs)
+                .where(jobs.id.in_([row.id for row in failed]))
+                .values(attempts=jobs.attempts + 1, failed_at=sa.func.now())
+            )
+
+    def _start_job(
+        self,
+        group: Group,
+        pathogen: Pathogen,
+        job_type: OnDemandJobType,
+        sample_ids: List[Any],
+    ):
+        if job_type == OnDemandJobType.PANGOLIN:
+            return PangolinJob(self.settings, self.sfn_client).run(group, sample_ids)
+        return LineageQcJob(self.settings, self.sfn_client).run(
+            group, pathogen.slug, sample_ids
+        )
@@ -0,0 +1,71 @@
+import threading
+import time
+from typing import Collection, Dict, List, Optional, Tuple
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from aspen.phylo_tree.colors import add_coordinate_rows, coordinate_queries, Coordinates
+from aspen.phylo_tree.walk import ExtractedLocation
+
+
+class LocationCoordinateCache:
+    """Caches the coordinates of (country, division, location) triples.
+
+    Tree colorings need the distance from a tree's location to every location
+    found on the tree. The set of locations we see on trees is fairly stable,
+    so we keep their coordinates in memory and compute distances in python,
+    only going to the db for locations we haven't seen recently.
+    """
+
+    def __init__(self, ttl: float = 0):
+        self.ttl = ttl
+        # location -> (expiry, whether it's in our db, coordinates if known)
+        self._entries: Dict[
+            ExtractedLocation, Tuple[float, bool, Optional[Coordinates]]
+        ] = {}
+        self._lock = threading.Lock()
+
+    async def get_many(
+        self, db: AsyncSession, locations: Collection[ExtractedLocation]
+    ) -> Dict[ExtractedLocation, Optional[Coordinates]]:
+        """Returns coordinates (or None, if they're unknown) for each of
+        `locations` that exists in our db. Locations not in the db are left out.
+        """
+        now = time.monotonic()
+        found: Dict[ExtractedLocation, Optional[Coordinates]] = {}
+        missing: List[ExtractedLocation] = []
+        with self._lock:
+            for location in locations:
+                entry = self._entries.get(location)
+                if entry is None or entry[0] < now:
+                    missing.append(location)
+                elif entry[1]:
+                    found[location] = entry[2]
+        if not missing:
+            return found
+
+        loaded: Dict[ExtractedLocation, Optional[Coordinates]] = {}
+        for query in coordinate_queries(missing):
+            add_coordinate_rows(loaded, await db.execute(query))
+        found.update(loaded)
+        if self.ttl > 0:
+            expiry = now + self.ttl
+            with self._lock:
+                for location in missing:
+                    in_db = location in loaded
+                    self._entries[location] = (expiry, in_db, loaded.get(location))
+        return found
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+# Only looks coordinates up until the API configures it at startup.
+location_coordinate_cache = LocationCoordinateCache()
+
+
+def configure_location_coordinate_cache(ttl: float) -> LocationCoordinateCache:
+    location_coordinate_cache.ttl = ttl
+    location_coordinate_cache.clear()
+    return location_coordinate_cache
@@ -0,0 +1,36 @@
+from typing import Any, AsyncGenerator, Callable
+
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql.expression import Select
+from starlette.requests import Request
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+# How many rows the ORM loads (and runs selectin loads for) at a time.
+STREAM_BATCH_SIZE = 500
+
+
+def accepts_ndjson(request: Request) -> bool:
+    return NDJSON_MEDIA_TYPE in request.headers.get("accept", "")
+
+
+async def stream_ndjson_rows(
+    db: AsyncSession,
+    query: Select,
+    serialize: Callable[[Any], BaseModel],
+) -> AsyncGenerator[str, None]:
+    """Yields one json document per row of `query` as rows arrive from the db.
+
+    Rows are fetched through a server-side cursor in batches, so only one batch
+    of ORM objects is ever held in memory. That means queries streamed this way
+    can't use joinedload() for collections -- use selectinload() instead.
+    """
+    result = await db.stream(query.execution_options(yield_per=STREAM_BATCH_SIZE))
+    async for row in result.scalars():
+        yield serialize(row).json() + "\n"
+
+
+def ndjson_response(rows: AsyncGenerator[str, None]) -> StreamingResponse:
+    return StreamingResponse(rows, media_type=NDJSON_MEDIA_TYPE)
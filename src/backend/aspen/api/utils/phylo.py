@@ -1,90 +1,47 @@
 import json
-import os
-import re
-from collections import namedtuple
-from typing import Dict, Mapping, Optional, Set, Tuple
-
-import boto3
-import sqlalchemy as sa
-from sqlalchemy import asc
+from typing import Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import aliased, joinedload, selectinload
-from sqlalchemy.sql.expression import and_, or_
+from sqlalchemy.orm import joinedload, selectinload, undefer
 
 from aspen.api.authz import AuthZSession
 from aspen.api.error import http_exceptions as ex
-from aspen.database.models import Group, Location, Pathogen, PhyloRun, PhyloTree, Sample
+from aspen.api.utils.etags import make_etag
+from aspen.api.utils.location_distances import location_coordinate_cache
+from aspen.api.utils.tree_cache import phylo_tree_cache, TreeCacheKey
+from aspen.aws import s3_gateway
+from aspen.database.models import Group, Pathogen, PhyloRun, PhyloTree, Sample
 from aspen.database.models.pathogens import PathogenRepoConfig
-
-# 16 colors
-NEXTSTRAIN_COLOR_SCALE = [
-    "#277F8E",
-    "#084A9F",
-    "#4187E0",
-    "#B2D3FD",
-    "#DFC6FF",
-    "#9069C2",
-    "#440278",
-    "#BD3232",
-    "#ED5151",
-    "#FF9999",
-    "#FF8A24",
-    "#FFDABA",
-    "#A76738",
-    "#FDE725",
-    "#A0DA39",
-    "#4AB569",
-]
-
-
-ExtractedLocation = namedtuple("ExtractedLocation", ("country", "division", "location"))
-LOCATION_KEYS = ExtractedLocation._fields
-
-CATEGORY_NAMES = {
-    "country": "Country",
-    "division": "Admin Division",
-    "location": "Location",
-}
-
-
-def _rename_nodes_on_tree(
-    prefix: str,
-    node: dict,
-    name_map: Mapping[str, str],
-    save_key: Optional[str] = None,
-) -> dict:
-    """Given a tree, a mapping of identifiers to their replacements, rename the nodes on
-    the tree.  If `save_key` is provided, then the original identifier is saved using
-    that as the key."""
-
-    # The mixed situations we're dealing with here:
-    #  - The public identifiers in our database *sometimes* have gisaid prefixes on them
-    #  - The samples on a tree *sometimes* have gisaid prefixes on them.
-    #  - We want to match identifiers from trees and the db with the prefix *stripped*
-    #  - At the end of this method, we want *all* tree samples to have gisaid prefixes on them.
-    # So this means we have to:
-    #  - Strip gisaid prefixes from tree nodes before trying to match them to db samples
-    #  - Add gisaid prefixes to all public tree identifiers if they aren't already prefixed
-
-    # Strip the gisaid prefix from our tree identifier if it's present
-    tree_identifier = node["name"]
-    if tree_identifier.lower().startswith(prefix.lower()):
-        tree_identifier = tree_identifier[len(f"{prefix}/") :]
-
-    renamed_value = name_map.get(tree_identifier, None)
-
-    # Strip prefixes from the sample names in the tree
-    node["name"] = tree_identifier
-
-    if renamed_value is not None:
-        # we found the replacement value! first, save the old value if the caller
-        # requested.
-        if save_key is not None:
-            node[save_key] = node["name"]
-        node["name"] = renamed_value
-    for child in node.get("children", []):
-        _rename_nodes_on_tree(prefix, child, name_map, save_key)
-    return node
+from aspen.phylo_tree.colors import all_category_locations, Coordinates, set_colors
+from aspen.phylo_tree.node_index import (
+    get_index_accessions,
+    get_index_locations,
+    get_index_names,
+    is_usable,
+)
+from aspen.phylo_tree.walk import (
+    AccessionCollector,
+    ExtractedLocation,
+    LocationCollector,
+    NameCollector,
+    NodeRenamer,
+    walk_tree,
+)
+
+# Keep each IN (...) list in our identifier lookups to a sane size.
+IDENTIFIER_LOOKUP_BATCH_SIZE = 5000
+
+
+class TreeETag(NamedTuple):
+    """An ETag for a processed tree, along with what `get_tree_etag` looked up
+    to compute it, so `process_phylo_tree` doesn't have to look it up again."""
+
+    etag: str
+    phylo_tree: PhyloTree
+    phylo_run: PhyloRun
+    s3_etag: str
+    identifier_map: Dict[str, str]
+    coordinates: Dict[ExtractedLocation, Optional[Coordinates]]
 
 
 async def verify_and_access_phylo_tree(
@@ -93,10 +50,13 @@ async def verify_and_access_phylo_tree(
     phylo_tree_id: int,
     pathogen: Pathogen,
     load_samples: bool = False,
+    load_node_index: bool = False,
 ) -> Tuple[bool, Optional[PhyloTree], Optional[PhyloRun]]:
     tree_query = (await az.authorized_query("read", PhyloTree)).join(PhyloRun)  # type: ignore
     if load_samples:
         tree_query = tree_query.options(selectinload(PhyloTree.constituent_samples), joinedload(PhyloTree.pathogen))  # type: ignore
+    if load_node_index:
+        tree_query = tree_query.options(undefer(PhyloTree.node_index))  # type: ignore
     tree_query = tree_query.filter(PhyloTree.entity_id.in_({phylo_tree_id}))  # type: ignore
     tree_query = tree_query.filter(PhyloTree.pathogen == pathogen)  # type: ignore
     authz_tree_query_result = await db.execute(tree_query)
@@ -120,233 +80,318 @@ async def verify_and_access_phylo_tree(
     return True, phylo_tree, phylo_run
 
 
-def _collect_locations(node: dict) -> Set[ExtractedLocation]:
-    locations = set()
-    extracted_location_list = [
-        node.get("node_attrs", {}).get(key, {}).get("value", None)
-        for key in LOCATION_KEYS
-    ]
-    locations.add(ExtractedLocation(*extracted_location_list))
-    for child in node.get("children", []):
-        locations |= _collect_locations(child)
-    return locations
-
-
-# set which locations will be given color labels in the nextstrain viewer
-# keep in mind that the color categories are very simple and are not
-# interconnected with one another.
-# noqa: E711 is vital for the SQL query to compile correctly.
-async def _set_colors_for_location_category(
+async def _set_colors(
     db: AsyncSession,
     tree_json: dict,
-    tree_location: Location,
+    phylo_run: PhyloRun,
     extracted_locations: Set[ExtractedLocation],
-    category: str,
+    coordinates: Optional[Dict[ExtractedLocation, Optional[Coordinates]]] = None,
+) -> dict:
+    # Look up where every location on the tree is (mostly from our cache) once,
+    # then sort them by distance from the tree's location for each category.
+    if coordinates is None:
+        coordinates = await location_coordinate_cache.get_many(
+            db, all_category_locations(extracted_locations)
+        )
+    return set_colors(
+        tree_json,
+        phylo_run.group.default_tree_location,
+        extracted_locations,
+        coordinates,
+    )
+
+
+async def process_phylo_tree(
+    db: AsyncSession,
+    az: AuthZSession,
+    phylo_tree_id: int,
+    pathogen: Pathogen,
+    pathogen_repo_config: PathogenRepoConfig,
+    id_style: Optional[str] = None,
+    tree_etag: Optional[TreeETag] = None,
 ) -> dict:
-    # information stored in tree_json["meta"]["colorings"], which is an
-    # array of objects. we grab the index of the one for "{category}"
-    category_defines_index = None
-    for index, defines in enumerate(tree_json["meta"]["colorings"]):
-        if defines["key"] == category:
-            category_defines_index = index
-
-    and_clauses = []
-    if category == "country":
-        # Make sure we only have country-level locations in our set.
-        sample_locations = {
-            ExtractedLocation(country=loc.country, division=None, location=None)
-            for loc in extracted_locations
-        }
-    elif category == "division":
-        # Make sure we only have division-level locations in our set.
-        sample_locations = {
-            ExtractedLocation(country=loc.country, division=loc.division, location=None)
-            for loc in extracted_locations
-            if loc.division is not None
-        }
+    """The tree's Auspice json, with identifiers translated for the current
+    user and locations colored. Pass along what `get_tree_etag` returned for
+    the same tree and id_style, if anything, to reuse its lookups."""
+    identifier_map: Optional[Dict[str, str]] = None
+    coordinates: Optional[Dict[ExtractedLocation, Optional[Coordinates]]] = None
+    if tree_etag is not None:
+        phylo_tree, phylo_run = tree_etag.phylo_tree, tree_etag.phylo_run
+        identifier_map, coordinates = tree_etag.identifier_map, tree_etag.coordinates
     else:
-        sample_locations = {
-            ExtractedLocation(
-                country=loc.country, division=loc.division, location=loc.location
+        (
+            authorized,
+            phylo_tree_result,
+            phylo_run_result,
+        ) = await verify_and_access_phylo_tree(
+            db, az, phylo_tree_id, pathogen, load_samples=True
+        )
+        if not authorized or not phylo_tree_result:
+            raise ex.BadRequestException(
+                f"PhyloTree with id {phylo_tree_id} not viewable by user"
             )
-            for loc in extracted_locations
-            if loc.location is not None
-        }
-    # This builds up a list of SQL filters that looks like this:
-    #  location.country = 'USA' AND location.division = 'CA' AND location.location = 'San Francisco'
-    # Or for division-level locations for example:
-    #  location.country = 'USA' AND location.division = 'CA' AND location.location IS NULL
-    for location in sample_locations:
-        and_clauses.append(
-            and_(
-                Location.country == location.country,
-                Location.division == location.division,
-                Location.location == location.location,
+        if not phylo_run_result:
+            raise ex.ServerException(
+                f"No phylo run found for phylo tree {phylo_tree_id}"
             )
+        phylo_tree = phylo_tree_result
+        phylo_run = phylo_run_result
+
+    s3 = s3_gateway()
+    etag = tree_etag.s3_etag if tree_etag is not None else None
+    cache_key: Optional[TreeCacheKey] = None
+    if phylo_tree_cache.enabled:
+        if etag is None:
+            # A HEAD is much cheaper than downloading and processing the tree.
+            head = await s3.head_object(phylo_tree.s3_bucket, phylo_tree.s3_key)
+            etag = head["ETag"]
+        cache_key = _tree_cache_key(
+            az, phylo_tree, phylo_run, pathogen_repo_config, etag, id_style, tree_etag
         )
+        cached_tree = phylo_tree_cache.get(cache_key)
+        if cached_tree is not None:
+            return cached_tree
+
+    s3_response = await s3.get_object(phylo_tree.s3_bucket, phylo_tree.s3_key)
+    json_data = json.loads(s3_response["Body"])
+    json_data = await _process_tree_json(
+        db,
+        az,
+        json_data,
+        phylo_run,
+        pathogen_repo_config,
+        id_style,
+        identifier_map,
+        coordinates,
+    )
+    # Don't cache under the old ETag if the tree was rewritten since our HEAD.
+    if cache_key is not None and s3_response["ETag"] == etag:
+        phylo_tree_cache.set(cache_key, json_data)
+    return json_data
 
-    # If we didn't find any locations on the tree, we probably have bigger problems
-    if not and_clauses:
-        return tree_json
-
-    origin_location = aliased(Location)
-    sorting_query = (
-        sa.select(  # type: ignore
-            getattr(Location, category),
-            sa.func.earth_distance(
-                sa.func.ll_to_earth(Location.latitude, Location.longitude),
-                sa.func.ll_to_earth(
-                    origin_location.latitude, origin_location.longitude
-                ),
-            ).label("distance"),
-        )
-        .select_from(origin_location)  # type: ignore
-        .join(
-            Location,  # type: ignore
-            or_(*and_clauses),
+
+async def get_public_tree_location(
+    db: AsyncSession,
+    az: AuthZSession,
+    phylo_tree_id: int,
+    pathogen: Pathogen,
+    pathogen_repo_config: PathogenRepoConfig,
+) -> Optional[Tuple[str, str]]:
+    """The S3 (bucket, key) of the gzipped id_style=public rendering of a tree
+    that we made when the tree was saved, if there is one we can use. Otherwise
+    returns None, and the tree should go through `process_phylo_tree` instead."""
+    authorized, phylo_tree, phylo_run = await verify_and_access_phylo_tree(
+        db, az, phylo_tree_id, pathogen
+    )
+    if not authorized or not phylo_tree or not phylo_run:
+        raise ex.BadRequestException(
+            f"PhyloTree with id {phylo_tree_id} not viewable by user"
         )
-        .where(
-            and_(
-                origin_location.country == tree_location.country,
-                origin_location.division == tree_location.division,
-                origin_location.location == tree_location.location,
-            )
+    if phylo_tree.public_tree_s3_key is None:
+        return None
+    # The rendering uses the prefix and id key of the tree's contextual repository.
+    if phylo_tree.contextual_repository_id != pathogen_repo_config.public_repository_id:
+        return None
+    # Its colors are ordered by distance from the group's tree location, as it
+    # was when the tree was saved.
+    tree_location = phylo_run.group.default_tree_location
+    if (
+        phylo_tree.public_tree_location_id,
+        phylo_tree.public_tree_latitude,
+        phylo_tree.public_tree_longitude,
+    ) != (tree_location.id, tree_location.latitude, tree_location.longitude):
+        return None
+
+    return phylo_tree.s3_bucket, phylo_tree.public_tree_s3_key
+
+
+async def get_tree_etag(
+    db: AsyncSession,
+    az: AuthZSession,
+    phylo_tree_id: int,
+    pathogen: Pathogen,
+    pathogen_repo_config: PathogenRepoConfig,
+    id_style: Optional[str] = None,
+) -> Optional[TreeETag]:
+    """An ETag for what `process_phylo_tree` returns, computed from everything
+    the processed tree depends on, without downloading the tree. Returns None
+    for trees that don't have a node index to compute it from."""
+    authorized, phylo_tree, phylo_run = await verify_and_access_phylo_tree(
+        db, az, phylo_tree_id, pathogen, load_node_index=True
+    )
+    if not authorized or not phylo_tree or not phylo_run:
+        # Leave it to process_phylo_tree to complain.
+        return None
+    node_index = phylo_tree.node_index
+    if not is_usable(node_index):
+        return None
+
+    public = id_style == "public"
+    identifier_map: Dict[str, str] = {}
+    if not public:
+        identifier_map = await get_identifier_map(
+            db, az, pathogen_repo_config.prefix, get_index_names(node_index)
         )
-        .order_by(asc("distance"))
-        .limit(16)
+    coordinates = await location_coordinate_cache.get_many(
+        db, all_category_locations(get_index_locations(node_index))
+    )
+    tree_location = phylo_run.group.default_tree_location
+    s3_head = await s3_gateway().head_object(phylo_tree.s3_bucket, phylo_tree.s3_key)
+    etag = make_etag(
+        "phylo_tree",
+        phylo_tree.entity_id,
+        s3_head["ETag"],
+        public,
+        pathogen_repo_config.id,
+        sorted(identifier_map.items()),
+        (tree_location.id, tree_location.latitude, tree_location.longitude),
+        sorted(coordinates.items(), key=repr),
+    )
+    return TreeETag(
+        etag, phylo_tree, phylo_run, s3_head["ETag"], identifier_map, coordinates
     )
 
-    sorted_locations_result = await db.execute(sorting_query)
-    sorted_locations = [row[category] for row in sorted_locations_result]
 
-    # Add the locations we found location data for
-    # If we still have fewer than 16, add whatever is left from the set we collected
-    # in the tree, even if we don't have spatial data on them.
-    location_strings = [getattr(tree_location, category)]
-    location_strings.extend(
-        [location for location in sorted_locations if location not in location_strings]
+def _tree_cache_key(
+    az: AuthZSession,
+    phylo_tree: PhyloTree,
+    phylo_run: PhyloRun,
+    pathogen_repo_config: PathogenRepoConfig,
+    s3_etag: str,
+    id_style: Optional[str],
+    tree_etag: Optional[TreeETag] = None,
+) -> TreeCacheKey:
+    """Everything a processed tree depends on.
+
+    The tree's ETag already covers all of it, including the identifiers and
+    coordinates we looked up from the db, so a tree that changes for any reason
+    gets a new key in every worker at once. Trees we can't compute an ETag for
+    are keyed on what we know without those lookups, and changes to the
+    identifiers or coordinates on them show up once their entries expire."""
+    ac = az.auth_context
+    group_id = ac.group.id if ac.group else None
+    if tree_etag is not None:
+        return (phylo_tree.entity_id, group_id, tree_etag.etag)
+    # Which private identifiers we can translate depends on our roles.
+    roles = (
+        tuple(sorted(ac.user_roles)),
+        tuple(sorted((grole["group_id"], grole["role"]) for grole in ac.group_roles)),
     )
-    if len(location_strings) < 16:
-        remaining_category_locs_in_tree = set(
-            [
-                getattr(loc, category)
-                for loc in extracted_locations
-                if getattr(loc, category) not in location_strings
-                and getattr(loc, category) is not None
-            ]
+    tree_location = phylo_run.group.default_tree_location
+    return (
+        phylo_tree.entity_id,
+        group_id,
+        (
+            s3_etag,
+            id_style,
+            roles,
+            pathogen_repo_config.id,
+            (tree_location.id, tree_location.latitude, tree_location.longitude),
+        ),
+    )
+
+
+async def _process_tree_json(
+    db: AsyncSession,
+    az: AuthZSession,
+    json_data: dict,
+    phylo_run: PhyloRun,
+    pathogen_repo_config: PathogenRepoConfig,
+    id_style: Optional[str] = None,
+    identifier_map: Optional[Dict[str, str]] = None,
+    coordinates: Optional[Dict[ExtractedLocation, Optional[Coordinates]]] = None,
+) -> dict:
+    name = pathogen_repo_config.public_repository.name
+    save_key = "{}_ID".format(name.upper())
+    tree = json_data["tree"]
+    locations = LocationCollector()
+    if id_style == "public":
+        walk_tree(
+            tree, NodeRenamer(pathogen_repo_config.prefix, {}, save_key), locations
         )
-        location_strings.extend(
-            list(remaining_category_locs_in_tree)[: 16 - len(location_strings)]
+        return await _set_colors(
+            db, json_data, phylo_run, locations.locations, coordinates
         )
 
-    colorings_entry = list(zip(location_strings, NEXTSTRAIN_COLOR_SCALE))
-
-    if category_defines_index is not None:
-        tree_json["meta"]["colorings"][category_defines_index][
-            "scale"
-        ] = colorings_entry
-    else:
-        tree_json["meta"]["colorings"].append(
-            {
-                "key": category,
-                "title": CATEGORY_NAMES[category],
-                "type": "categorical",
-                "scale": colorings_entry,
-            }
+    # Collect everything we need from the tree in one pass, then load the
+    # public:private mappings this user/group has access to for just the samples
+    # on the tree.
+    names = NameCollector()
+    walk_tree(tree, names, locations)
+    if identifier_map is None:
+        identifier_map = await get_identifier_map(
+            db, az, pathogen_repo_config.prefix, names.names
         )
+    walk_tree(tree, NodeRenamer(pathogen_repo_config.prefix, identifier_map, save_key))
+    # set country labeling/colors
+    return await _set_colors(db, json_data, phylo_run, locations.locations, coordinates)
 
-    return tree_json
 
+def _strip_prefix(prefix: str, identifier: str) -> str:
+    if identifier.lower().startswith(f"{prefix.lower()}/"):
+        return identifier[len(f"{prefix}/") :]
+    return identifier
 
-async def _set_colors(db: AsyncSession, tree_json: dict, phylo_run: PhyloRun) -> dict:
-    extracted_locations = _collect_locations(tree_json["tree"])
-    tree_location = phylo_run.group.default_tree_location
-    for key in LOCATION_KEYS:
-        tree_json = await _set_colors_for_location_category(
-            db, tree_json, tree_location, extracted_locations, key
-        )
 
-    return tree_json
+async def get_identifier_map(
+    db: AsyncSession, az: AuthZSession, prefix: str, tree_names: Iterable[str]
+) -> Dict[str, str]:
+    """Maps public identifiers (prefix stripped) to private identifiers for the
+    samples named on a tree that the current user can see privately.
 
+    Public identifiers in our db may or may not carry the pathogen prefix, so
+    we look up both forms of each name, which lets the lookup use the index on
+    `samples.public_identifier`. This keeps the cost proportional to the size
+    of the tree rather than to the number of samples the group can read.
+    """
+    names = {_strip_prefix(prefix, name) for name in tree_names}
+    candidates = list(names | {f"{prefix}/{name}" for name in names})
+    identifier_map: Dict[str, str] = {}
+    for offset in range(0, len(candidates), IDENTIFIER_LOOKUP_BATCH_SIZE):
+        batch = candidates[offset : offset + IDENTIFIER_LOOKUP_BATCH_SIZE]
+        query = (await az.authorized_query("read_private", Sample)).where(  # type: ignore
+            Sample.public_identifier.in_(batch)  # type: ignore
+        )
+        for sample in (await db.execute(query)).scalars():
+            public_id = sample.public_identifier.replace(f"{prefix}/", "")
+            identifier_map[public_id] = sample.private_identifier
+    return identifier_map
 
-async def process_phylo_tree(
+
+async def get_tree_accessions(
     db: AsyncSession,
     az: AuthZSession,
     phylo_tree_id: int,
     pathogen: Pathogen,
     pathogen_repo_config: PathogenRepoConfig,
     id_style: Optional[str] = None,
-) -> dict:
-    (
-        authorized,
-        phylo_tree_result,
-        phylo_run_result,
-    ) = await verify_and_access_phylo_tree(
-        db, az, phylo_tree_id, pathogen, load_samples=True
+) -> List[str]:
+    """The accessions on a tree, with identifiers translated the same way
+    `process_phylo_tree` would. Uses the tree's node index when it has one, so
+    we don't need to download the tree from S3."""
+    authorized, phylo_tree, _ = await verify_and_access_phylo_tree(
+        db, az, phylo_tree_id, pathogen, load_node_index=True
     )
-    if not authorized or not phylo_tree_result:
+    if not authorized or not phylo_tree:
         raise ex.BadRequestException(
             f"PhyloTree with id {phylo_tree_id} not viewable by user"
         )
-    if not phylo_run_result:
-        raise ex.ServerException(f"No phylo run found for phylo tree {phylo_tree_id}")
-    phylo_tree: PhyloTree = phylo_tree_result
-    phylo_run: PhyloRun = phylo_run_result
-
-    s3 = boto3.resource(
-        "s3",
-        endpoint_url=os.getenv("BOTO_ENDPOINT_URL") or None,
-        config=boto3.session.Config(signature_version="s3v4"),
-    )
-
-    data = (
-        s3.Bucket(phylo_tree.s3_bucket).Object(phylo_tree.s3_key).get()["Body"].read()
-    )
-    json_data = json.loads(data)
-    name = pathogen_repo_config.public_repository.name
-    save_key = "{}_ID".format(name.upper())
-    if id_style == "public":
-        json_data = await _set_colors(db, json_data, phylo_run)
-        json_data["tree"] = _rename_nodes_on_tree(
-            pathogen_repo_config.prefix, json_data["tree"], {}, save_key
+    node_index = phylo_tree.node_index
+    if not is_usable(node_index):
+        # Trees saved before we started indexing them.
+        phylo_tree_data = await process_phylo_tree(
+            db, az, phylo_tree_id, pathogen, pathogen_repo_config, id_style
         )
-        return json_data
+        return extract_accessions([], phylo_tree_data["tree"])
 
-    # Load all the public:private sample mappings this user/group has access to.
-    # TODO we should limit the query scope here to just the samples on the tree.
     identifier_map: Dict[str, str] = {}
-    translatable_samples: list[Sample] = (
-        (
-            await db.execute(
-                await az.authorized_query("read_private", Sample)  # type: ignore
-            )
+    if id_style != "public":
+        identifier_map = await get_identifier_map(
+            db, az, pathogen_repo_config.prefix, get_index_names(node_index)
         )
-        .scalars()
-        .all()
-    )
-    for sample in translatable_samples:
-        public_id = sample.public_identifier.replace(
-            f"{pathogen_repo_config.prefix}/", ""
-        )
-        identifier_map[public_id] = sample.private_identifier
-    # we pass in the root node of the tree to the recursive naming function.
-    json_data["tree"] = _rename_nodes_on_tree(
-        pathogen_repo_config.prefix, json_data["tree"], identifier_map, save_key
-    )
-    # set country labeling/colors
-    json_data = await _set_colors(db, json_data, phylo_run)
-    return json_data
+    return get_index_accessions(node_index, pathogen_repo_config.prefix, identifier_map)
 
 
 def extract_accessions(accessions_list: list, node: dict):
-    node_attributes = node.get("node_attrs", {})
-    if "external_accession" in node_attributes:
-        accessions_list.append(node_attributes["external_accession"]["value"])
-    if "name" in node:
-        # NODE_ is some sort of generic name and not useful
-        if not re.match("NODE_", node["name"]):
-            accessions_list.append(node["name"])
-    if "children" in node:
-        for child in node["children"]:
-            extract_accessions(accessions_list, child)
+    walk_tree(node, AccessionCollector(accessions_list))
     return accessions_list
@@ -121,30 +121,6 @@ def get_all_identifiers_in_request(
     return private_ids, public_ids
 
 
-async def get_existing_private_ids(
-    private_ids: list[str], session: AsyncSession, group_id=None
-) -> list[str]:
-    samples = sa.select(Sample).filter(Sample.private_identifier.in_(private_ids))  # type: ignore
-
-    if group_id is not None:
-        samples = samples.filter(Sample.submitting_group_id == group_id)
-
-    res = await session.execute(samples)
-    return [i.private_identifier for i in res.scalars().all()]
-
-
-async def get_existing_public_ids(
-    public_ids: list[str], session: AsyncSession, group_id=None
-) -> list[str]:
-    samples = sa.select(Sample).filter(Sample.public_identifier.in_(public_ids))  # type: ignore
-
-    if group_id is not None:
-        samples = samples.filter(Sample.submitting_group_id == group_id)
-
-    res = await session.execute(samples)
-    return [i.public_identifier for i in res.scalars().all()]
-
-
 async def check_duplicate_samples(
     data: List["CreateSampleRequest"],
     session: AsyncSession,
@@ -156,15 +132,31 @@ async def check_duplicate_samples(
     If called with a `group_id` arg, limits to only searching for duplicates within
     the given group. If no group given, searches globally for duplicate IDs and will
     match against any ID in any group that is already existing.
+
+    Both kinds of ID are checked with a single query that only reads identifiers.
     """
     private_ids, public_ids = get_all_identifiers_in_request(data)
 
-    existing_private_ids: list[str] = await get_existing_private_ids(
-        private_ids, session, group_id
-    )
-    existing_public_ids: list[str] = await get_existing_public_ids(
-        public_ids, session, group_id
+    existing = sa.select(  # type: ignore
+        Sample.private_identifier, Sample.public_identifier
+    ).where(
+        or_(
+            Sample.private_identifier.in_(private_ids),
+            Sample.public_identifier.in_(public_ids),
+        )
     )
+    if group_id is not None:
+        existing = existing.where(Sample.submitting_group_id == group_id)
+
+    requested_private_ids = set(private_ids)
+    requested_public_ids = set(public_ids)
+    existing_private_ids: list[str] = []
+    existing_public_ids: list[str] = []
+    for private_id, public_id in await session.execute(existing):
+        if private_id in requested_private_ids:
+            existing_private_ids.append(private_id)
+        if public_id in requested_public_ids:
+            existing_public_ids.append(public_id)
 
     if existing_private_ids or existing_public_ids:
         return {
@@ -0,0 +1,196 @@
+import base64
+import datetime
+import json
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Tuple,
+)
+
+import sqlalchemy as sa
+from sqlalchemy.orm import selectinload
+from sqlalchemy.sql.expression import Select
+
+from aspen.api.error import http_exceptions as ex
+from aspen.api.utils.sample import determine_gisaid_status
+from aspen.database.models import (
+    Sample,
+    SampleLineage,
+    SampleQCMetric,
+    UploadedPathogenGenome,
+)
+
+# Relationships we need to eager-load to render each field of a SampleResponse.
+# Fields that aren't listed here are plain columns on the samples table.
+SAMPLE_FIELD_RELATIONSHIPS: Dict[str, Sequence[Any]] = {
+    "collection_location": [Sample.collection_location],
+    "gisaid": [Sample.accessions],
+    "pathogen": [Sample.pathogen],
+    "sequencing_date": [Sample.uploaded_pathogen_genome],
+    "submitting_group": [Sample.submitting_group],
+    "uploaded_by": [Sample.uploaded_by],
+    "upload_date": [Sample.uploaded_pathogen_genome],
+    "lineages": [Sample.lineages, Sample.qc_metrics, Sample.pathogen],
+    "qc_metrics": [Sample.qc_metrics],
+}
+
+_upload_dates = UploadedPathogenGenome.__table__
+
+
+class SampleSortField(NamedTuple):
+    # The expression to order by. It must never be NULL so that it can be
+    # compared against a cursor.
+    expression: Any
+    # Turns a cursor value (as stored in json) back into a python value.
+    parse: Callable[[Any], Any]
+
+
+SAMPLE_SORT_FIELDS: Dict[str, SampleSortField] = {
+    "id": SampleSortField(Sample.id, int),
+    "collection_date": SampleSortField(
+        Sample.collection_date, datetime.date.fromisoformat
+    ),
+    "upload_date": SampleSortField(
+        sa.func.coalesce(
+            sa.select(_upload_dates.c.upload_date)
+            .where(_upload_dates.c.sample_id == Sample.id)
+            .scalar_subquery(),
+            datetime.datetime(1970, 1, 1),
+        ),
+        datetime.datetime.fromisoformat,
+    ),
+    # Samples can have more than one lineage (one per lineage caller), so sort
+    # on the first one alphabetically.
+    "lineage": SampleSortField(
+        sa.func.coalesce(
+            sa.select(sa.func.min(SampleLineage.lineage))
+            .where(SampleLineage.sample_id == Sample.id)
+            .scalar_subquery(),
+            "",
+        ),
+        str,
+    ),
+    # Likewise QC metrics (one per QC caller), so sort on the newest one. This
+    # has to pick the same row every time, or keyset pages skip or repeat rows.
+    "qc_status": SampleSortField(
+        sa.func.coalesce(
+            sa.select(SampleQCMetric.qc_status)
+            .where(SampleQCMetric.sample_id == Sample.id)
+            .order_by(SampleQCMetric.id.desc())
+            .limit(1)
+            .scalar_subquery(),
+            "",
+        ),
+        str,
+    ),
+}
+
+
+def sample_load_options(fields: Optional[Iterable[str]] = None) -> List[Any]:
+    """Eager-load options for the relationships needed to render `fields`.
+
+    If `fields` is None, everything a full SampleResponse needs is loaded.
+    """
+    if fields is None:
+        fields = SAMPLE_FIELD_RELATIONSHIPS.keys()
+    relationships = []
+    for field in fields:
+        for relationship in SAMPLE_FIELD_RELATIONSHIPS.get(field, []):
+            if relationship not in relationships:
+                relationships.append(relationship)
+    return [selectinload(relationship) for relationship in relationships]
+
+
+def prepare_sample_for_response(
+    sample: Sample, group_id: int, fields: Optional[Iterable[str]] = None
+) -> Sample:
+    """Attach the computed attributes SampleResponse expects to a sample."""
+    if fields is None or "gisaid" in fields:
+        sample.gisaid = determine_gisaid_status(sample)
+    # TODO - convert this to an oso check.
+    sample.show_private_identifier = sample.submitting_group_id == group_id
+    return sample
+
+
+def filter_samples(
+    query: Select,
+    collection_date_start: Optional[datetime.date] = None,
+    collection_date_end: Optional[datetime.date] = None,
+    upload_date_start: Optional[datetime.datetime] = None,
+    upload_date_end: Optional[datetime.datetime] = None,
+    lineages: Optional[List[str]] = None,
+    qc_statuses: Optional[List[str]] = None,
+) -> Select:
+    if collection_date_start:
+        query = query.where(Sample.collection_date >= collection_date_start)
+    if collection_date_end:
+        query = query.where(Sample.collection_date <= collection_date_end)
+    if upload_date_start or upload_date_end:
+        upload_filter = sa.exists().where(_upload_dates.c.sample_id == Sample.id)
+        if upload_date_start:
+            upload_filter = upload_filter.where(
+                _upload_dates.c.upload_date >= upload_date_start
+            )
+        if upload_date_end:
+            upload_filter = upload_filter.where(
+                _upload_dates.c.upload_date <= upload_date_end
+            )
+        query = query.where(upload_filter)
+    if lineages:
+        query = query.where(Sample.lineages.any(SampleLineage.lineage.in_(lineages)))  # type: ignore
+    if qc_statuses:
+        query = query.where(Sample.qc_metrics.any(SampleQCMetric.qc_status.in_(qc_statuses)))  # type: ignore
+    return query
+
+
+def encode_cursor(sort_value: Any, sample_id: int) -> str:
+    if isinstance(sort_value, (datetime.date, datetime.datetime)):
+        sort_value = sort_value.isoformat()
+    payload = json.dumps([sort_value, sample_id]).encode("utf8")
+    return base64.urlsafe_b64encode(payload).decode("utf8")
+
+
+def decode_cursor(cursor: str, sort_field: SampleSortField) -> Tuple[Any, int]:
+    try:
+        sort_value, sample_id = json.loads(base64.urlsafe_b64decode(cursor))
+        return sort_field.parse(sort_value), int(sample_id)
+    except (ValueError, TypeError):
+        raise ex.BadRequestException("Invalid cursor")
+
+
+def paginate_samples(
+    query: Select,
+    sort_by: str,
+    descending: bool,
+    limit: int,
+    cursor: Optional[str] = None,
+) -> Select:
+    """Keyset-paginate a sample query.
+
+    Rows are ordered by (sort value, sample id) so that the order is stable,
+    and the cursor is the (sort value, id) of the last row of the previous
+    page. The sort value is added as an extra "sort_key" column so that we can
+    build the next cursor. We fetch one extra row to tell whether there's
+    another page after this one.
+    """
+    if sort_by not in SAMPLE_SORT_FIELDS:
+        raise ex.BadRequestException(f"Can't sort samples by {sort_by}")
+    sort_field = SAMPLE_SORT_FIELDS[sort_by]
+    sort_key = sort_field.expression
+    if cursor:
+        last_key = sa.tuple_(*decode_cursor(cursor, sort_field))
+        current_key = sa.tuple_(sort_key, Sample.id)
+        query = query.where(
+            current_key < last_key if descending else current_key > last_key
+        )
+    if descending:
+        query = query.order_by(sort_key.desc(), Sample.id.desc())
+    else:
+        query = query.order_by(sort_key.asc(), Sample.id.asc())
+    return query.add_columns(sort_key.label("sort_key")).limit(limit + 1)
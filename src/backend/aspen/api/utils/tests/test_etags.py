@@ -0,0 +1,64 @@
+import time
+from types import SimpleNamespace
+from typing import List
+
+import pytest
+
+from aspen.api.utils import etags
+from aspen.api.utils.etags import FingerprintCache, query_fingerprint
+from aspen.database.models import Location
+
+# All test coroutines will be treated as marked.
+pytestmark = pytest.mark.asyncio
+
+
+class FakeFingerprintDB:
+    """Answers fingerprint queries with a made up digest, counting the queries."""
+
+    def __init__(self):
+        self.queries: List[str] = []
+        self.digest = "abc"
+
+    async def execute(self, query):
+        self.queries.append(str(query))
+        return SimpleNamespace(one=lambda: (len(self.queries), self.digest))
+
+
+@pytest.fixture()
+def cache(monkeypatch) -> FingerprintCache:
+    cache = FingerprintCache(ttl=5)
+    monkeypatch.setattr(etags, "fingerprint_cache", cache)
+    return cache
+
+
+async def test_fingerprint_cached(cache: FingerprintCache):
+    db = FakeFingerprintDB()
+    columns = [Location.id, Location.region]
+
+    first = await query_fingerprint(db, columns)  # type: ignore
+    assert await query_fingerprint(db, columns) == first  # type: ignore
+    assert len(db.queries) == 1
+    assert (cache.misses, cache.hits) == (1, 1)
+
+    # Different filters are fingerprinted separately.
+    await query_fingerprint(db, columns, Location.country == "USA")  # type: ignore
+    await query_fingerprint(db, columns, Location.country == "Mexico")  # type: ignore
+    assert len(db.queries) == 3
+
+
+async def test_fingerprint_cache_expiry(cache: FingerprintCache, monkeypatch):
+    db = FakeFingerprintDB()
+    first = await query_fingerprint(db, [Location.id])  # type: ignore
+    now = time.monotonic()
+    monkeypatch.setattr("aspen.api.utils.etags.time.monotonic", lambda: now + 6)
+    db.digest = "def"
+    assert await query_fingerprint(db, [Location.id]) != first  # type: ignore
+    assert len(db.queries) == 2
+
+
+async def test_fingerprint_cache_disabled(monkeypatch):
+    monkeypatch.setattr(etags, "fingerprint_cache", FingerprintCache())
+    db = FakeFingerprintDB()
+    for _ in range(2):
+        await query_fingerprint(db, [Location.id])  # type: ignore
+    assert len(db.queries) == 2
@@ -0,0 +1,182 @@
+import time
+from types import SimpleNamespace
+from typing import Dict, List, Optional
+
+import pytest
+import sqlalchemy as sa
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
+
+from aspen.api.utils.location_distances import LocationCoordinateCache
+from aspen.database.models import Location
+from aspen.phylo_tree.colors import Coordinates, sort_by_distance
+from aspen.phylo_tree.walk import ExtractedLocation
+from aspen.test_infra.models.location import location_factory
+
+# All test coroutines will be treated as marked.
+pytestmark = pytest.mark.asyncio
+
+ORIGIN = ExtractedLocation("USA", "California", "San Francisco County")
+# (location, latitude, longitude), nearest to San Francisco first.
+PLACES = [
+    ("Alameda County", 37.6, -121.9),
+    ("Los Angeles County", 34.05, -118.24),
+    ("New York County", 40.71, -74.0),
+    # Apia and Suva are on either side of the antimeridian.
+    ("Apia", -13.83, -171.76),
+    ("Tokyo", 35.68, 139.69),
+    ("London", 51.5, -0.13),
+    ("Suva", -18.14, 178.44),
+]
+
+
+def place(name: str) -> ExtractedLocation:
+    return ExtractedLocation("USA", "California", name)
+
+
+def test_sort_by_distance():
+    coordinates: Dict[ExtractedLocation, Optional[Coordinates]] = {
+        place(name): (latitude, longitude)
+        for name, latitude, longitude in reversed(PLACES)
+    }
+    coordinates[place("Nowhere")] = None
+    assert sort_by_distance((37.77, -122.42), coordinates) == [
+        *(place(name) for name, _, _ in PLACES),
+        place("Nowhere"),
+    ]
+
+
+def test_sort_by_distance_without_origin():
+    coordinates: Dict[ExtractedLocation, Optional[Coordinates]] = {
+        place("Tokyo"): (35.68, 139.69),
+        place("Nowhere"): None,
+    }
+    # Nothing can be placed, so everything keeps its order.
+    assert sort_by_distance(None, coordinates) == [place("Tokyo"), place("Nowhere")]
+
+
+async def test_sort_by_distance_matches_earth_distance(async_session: AsyncSession):
+    """The in-memory sort orders locations the same way the earth_distance()
+    query it replaced did."""
+    origin = location_factory(
+        "North America", *ORIGIN, latitude=37.77, longitude=-122.42
+    )
+    locations = [
+        location_factory(
+            "North America",
+            "USA",
+            "California",
+            name,
+            latitude=latitude,
+            longitude=longitude,
+        )
+        for name, latitude, longitude in PLACES
+    ]
+    locations.append(location_factory("North America", "USA", "California", "Nowhere"))
+    async_session.add_all([origin, *locations])
+    await async_session.commit()
+
+    origin_location = aliased(Location)
+    old_query = (
+        sa.select(  # type: ignore
+            Location.location,
+            sa.func.earth_distance(
+                sa.func.ll_to_earth(Location.latitude, Location.longitude),
+                sa.func.ll_to_earth(
+                    origin_location.latitude, origin_location.longitude
+                ),
+            ).label("distance"),
+        )
+        .select_from(origin_location)  # type: ignore
+        .join(Location, Location.id.in_([location.id for location in locations]))
+        .where(origin_location.id == origin.id)
+        .order_by(sa.asc("distance"))
+    )
+    expected = [row.location for row in await async_session.execute(old_query)]
+
+    coordinates: Dict[ExtractedLocation, Optional[Coordinates]] = {}
+    for location in reversed(locations):
+        lat_long = None
+        if location.latitude is not None:
+            lat_long = (location.latitude, location.longitude)
+        coordinates[place(location.location)] = lat_long
+    assert [
+        location.location
+        for location in sort_by_distance(
+            (origin.latitude, origin.longitude), coordinates
+        )
+    ] == expected
+
+
+class FakeCoordinateDB:
+    """Answers coordinate lookups from a dict, counting the lookups."""
+
+    def __init__(self, coordinates: Dict[ExtractedLocation, Optional[Coordinates]]):
+        self.coordinates = coordinates
+        self.lookups: List[List[ExtractedLocation]] = []
+
+    async def execute(self, batch: List[ExtractedLocation]):
+        self.lookups.append(batch)
+        rows = []
+        for location in batch:
+            if location in self.coordinates:
+                latitude, longitude = self.coordinates[location] or (None, None)
+                rows.append(
+                    SimpleNamespace(
+                        **location._asdict(), latitude=latitude, longitude=longitude
+                    )
+                )
+        return rows
+
+
+@pytest.fixture()
+def fake_db(monkeypatch) -> FakeCoordinateDB:
+    # Look the locations themselves up, rather than building SQL for them.
+    monkeypatch.setattr(
+        "aspen.api.utils.location_distances.coordinate_queries",
+        lambda locations: [list(locations)],
+    )
+    return FakeCoordinateDB(
+        {place("Tokyo"): (35.68, 139.69), place("Unplaced County"): None}
+    )
+
+
+async def test_coordinate_cache_get_many(fake_db: FakeCoordinateDB):
+    cache = LocationCoordinateCache(ttl=60)
+    wanted = [place("Tokyo"), place("Unplaced County"), place("Not In The DB")]
+    expected = {place("Tokyo"): (35.68, 139.69), place("Unplaced County"): None}
+
+    assert await cache.get_many(fake_db, wanted) == expected  # type: ignore
+    assert len(fake_db.lookups) == 1
+    # Cached, including the location that isn't in the db at all.
+    assert await cache.get_many(fake_db, wanted) == expected  # type: ignore
+    assert len(fake_db.lookups) == 1
+    # Only what isn't cached is looked up.
+    fake_db.coordinates[place("London")] = (51.5, -0.13)
+    found = await cache.get_many(
+        fake_db, [place("Tokyo"), place("London")]  # type: ignore
+    )
+    assert found == {place("Tokyo"): (35.68, 139.69), place("London"): (51.5, -0.13)}
+    assert fake_db.lookups[-1] == [place("London")]
+
+
+async def test_coordinate_cache_expiry(fake_db: FakeCoordinateDB, monkeypatch):
+    cache = LocationCoordinateCache(ttl=60)
+    await cache.get_many(fake_db, [place("Tokyo")])  # type: ignore
+    now = time.monotonic()
+    monkeypatch.setattr(
+        "aspen.api.utils.location_distances.time.monotonic", lambda: now + 61
+    )
+    # Picks up coordinates filled in since (eg, by import_location_latlongs).
+    fake_db.coordinates[place("Tokyo")] = (35.69, 139.7)
+    found = await cache.get_many(fake_db, [place("Tokyo")])  # type: ignore
+    assert found == {place("Tokyo"): (35.69, 139.7)}
+    assert len(fake_db.lookups) == 2
+
+
+async def test_coordinate_cache_disabled(fake_db: FakeCoordinateDB):
+    cache = LocationCoordinateCache()
+    for _ in range(2):
+        found = await cache.get_many(fake_db, [place("Tokyo")])  # type: ignore
+        assert found == {place("Tokyo"): (35.68, 139.69)}
+    assert len(fake_db.lookups) == 2
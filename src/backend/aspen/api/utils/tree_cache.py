@@ -0,0 +1,162 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Hashable, Optional
+from typing import OrderedDict as OrderedDictType
+from typing import Tuple
+
+# (tree entity id, group id, rest of the key)
+TreeCacheKey = Tuple[int, Optional[int], Hashable]
+
+
+class ProcessedTreeCache:
+    """A bounded cache of phylo trees that have already been processed for display.
+
+    Processing a tree means downloading its json from S3, parsing it, and then
+    renaming and coloring its nodes, all of which adds up for big trees. Viewers
+    (Auspice and Galago in particular) tend to request the same tree over and
+    over, so we keep the results around.
+
+    Entries live in an in-process LRU, and optionally in a directory shared by
+    all the workers on a host, which survives restarts and is consulted when the
+    LRU misses. Keys include the S3 ETag of the tree, so rewriting a tree's json
+    never serves stale results. Callers must include everything else the result
+    depends on (id style, the requesting group and its roles) in the key.
+
+    Cached trees are shared between requests, so callers must not modify them.
+    """
+
+    def __init__(
+        self, maxsize: int = 0, ttl: float = 0, directory: Optional[str] = None
+    ):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.directory = Path(directory) if directory else None
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        # key -> (expiry, processed tree)
+        self._entries: OrderedDictType[TreeCacheKey, Tuple[float, Dict]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0 and self.maxsize > 0
+
+    def get(self, key: TreeCacheKey) -> Optional[Dict]:
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] >= time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self._entries.pop(key, None)
+        tree = self._read_from_disk(key)
+        with self._lock:
+            if tree is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+            self._remember(key, tree)
+        return tree
+
+    def set(self, key: TreeCacheKey, tree: Dict) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            self._remember(key, tree)
+        self._write_to_disk(key, tree)
+
+    def invalidate_tree(self, tree_id: int) -> None:
+        self._invalidate(lambda key: key[0] == tree_id, f"{tree_id}-*.json")
+
+    def clear(self) -> None:
+        self._invalidate(lambda key: True, "*.json")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+            }
+
+    def _remember(self, key: TreeCacheKey, tree: Dict) -> None:
+        self._entries[key] = (time.monotonic() + self.ttl, tree)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def _invalidate(self, matches, disk_pattern: str) -> None:
+        with self._lock:
+            for key in [key for key in self._entries if matches(key)]:
+                del self._entries[key]
+        if self.directory is not None and self.directory.is_dir():
+            for path in self.directory.glob(disk_pattern):
+                path.unlink(missing_ok=True)
+
+    def _disk_path(self, key: TreeCacheKey) -> Optional[Path]:
+        if self.directory is None:
+            return None
+        tree_id, group_id, rest = key
+        digest = hashlib.sha256(repr(rest).encode("utf8")).hexdigest()
+        return self.directory / f"{tree_id}-{group_id}-{digest}.json"
+
+    def _read_from_disk(self, key: TreeCacheKey) -> Optional[Dict]:
+        path = self._disk_path(key)
+        if path is None:
+            return None
+        try:
+            if path.stat().st_mtime + self.ttl < time.time():
+                path.unlink(missing_ok=True)
+                return None
+            with path.open("rb") as fh:
+                return json.load(fh)
+        except (OSError, ValueError):
+            return None
+
+    def _write_to_disk(self, key: TreeCacheKey, tree: Dict) -> None:
+        path = self._disk_path(key)
+        if path is None:
+            return
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            # Write to a temp file and move it into place, so other workers
+            # never read a half-written tree.
+            fd, tmp_name = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "w") as fh:
+                    json.dump(tree, fh)
+                os.replace(tmp_name, path)
+            finally:
+                if os.path.exists(tmp_name):
+                    os.unlink(tmp_name)
+        except OSError:
+            # The disk tier is only an optimization.
+            pass
+
+
+# Disabled until the API configures it at startup.
+phylo_tree_cache = ProcessedTreeCache()
+
+
+def configure_phylo_tree_cache(
+    maxsize: int, ttl: float, directory: Optional[str] = None
+) -> ProcessedTreeCache:
+    phylo_tree_cache.maxsize = maxsize
+    phylo_tree_cache.ttl = ttl
+    phylo_tree_cache.directory = Path(directory) if directory else None
+    with phylo_tree_cache._lock:
+        phylo_tree_cache._entries.clear()
+        phylo_tree_cache.hits = phylo_tree_cache.disk_hits = phylo_tree_cache.misses = 0
+    return phylo_tree_cache
@@ -3,6 +3,8 @@ from typing import Any, Iterable, Mapping, Set
 
 from fastapi.responses import StreamingResponse
 
+from aspen.api.utils.chunked_output import chunk_output, DEFAULT_CHUNK_SIZE
+
 CONTENT_TYPE = {
     "\t": "text/tsv",
     ",": "text/csv",
@@ -25,15 +27,20 @@ class SimpleStringWriter:
 class FieldSeparatedStreamer:
     fields: Iterable[str] = []
     secondary_fields: Iterable[Iterable[str]] = []
+    # Rows are sent in chunks of about this many bytes.
+    chunk_size: int = DEFAULT_CHUNK_SIZE
 
     def __init__(self, delimiter: str, filename: str, data):
         self.delimiter = delimiter
         self.filename = filename
         self.data = data
 
-    def get_response(self):
-        generator = self.stream()
+    def get_response(self, gzip: bool = False):
+        generator = self.stream(compress=gzip)
         resp = StreamingResponse(generator, media_type="application/binary")
+        if gzip:
+            resp.headers["Content-Encoding"] = "gzip"
+            resp.headers["Vary"] = "Accept-Encoding"
         resp.headers["Content-Disposition"] = f"attachment; filename={self.filename}"
         resp.headers["Access-Control-Expose-Headers"] = "Content-Disposition"
         resp.headers["Content-Type"] = CONTENT_TYPE[self.delimiter]
@@ -42,7 +49,10 @@ class FieldSeparatedStreamer:
     def generate_row(self):
         raise NotImplementedError("Must override generate_row")
 
-    def stream(self):
+    def stream(self, compress: bool = False):
+        return chunk_output(self.rows(), self.chunk_size, compress)
+
+    def rows(self):
         stringfh = SimpleStringWriter()
         csvwriter = csv.DictWriter(stringfh, self.fields, delimiter=self.delimiter)
         csvwriter.writeheader()
@@ -27,6 +27,7 @@ from datetime import datetime, timedelta, timezone
 from fastapi import APIRouter, Depends
 from sqlalchemy.ext.asyncio import AsyncSession
 from starlette.requests import Request
+from starlette.responses import Response
 
 from aspen.api.authn import (
     AuthContext,
@@ -50,7 +51,12 @@ from aspen.api.schemas.auspice import (
     GenerateAuspiceMagicLinkResponse,
 )
 from aspen.api.settings import APISettings
-from aspen.api.utils import process_phylo_tree, verify_and_access_phylo_tree
+from aspen.api.utils import (
+    get_tree_etag,
+    process_phylo_tree,
+    verify_and_access_phylo_tree,
+)
+from aspen.api.utils.etags import etag_matches, not_modified
 from aspen.database.models import Group, Pathogen, User
 from aspen.database.models.pathogens import PathogenRepoConfig
 from aspen.util.split import SplitClient
@@ -110,6 +116,8 @@ async def generate_auspice_string(
 @router.get("/access/{magic_link}")
 async def auspice_view(
     magic_link: str,
+    request: Request,
+    response: Response,
     payload: AuspicePayload = Depends(magic_link_payload),
     az: AuthZSession = Depends(get_authz_session),
     db: AsyncSession = Depends(get_db),
@@ -119,9 +127,17 @@ async def auspice_view(
 ):
     # Load tree
     phylo_tree_id = payload["tree_id"]
-    tree_json = await process_phylo_tree(
+    # Viewers reload the same tree a lot, let them reuse what they have.
+    tree_etag = await get_tree_etag(
         db, az, phylo_tree_id, pathogen, pathogen_repo_config
     )
+    if tree_etag is not None:
+        if etag_matches(request, tree_etag.etag):
+            return not_modified(tree_etag.etag)
+        response.headers["ETag"] = tree_etag.etag
+    tree_json = await process_phylo_tree(
+        db, az, phylo_tree_id, pathogen, pathogen_repo_config, tree_etag=tree_etag
+    )
 
     # Return the tree
     return tree_json
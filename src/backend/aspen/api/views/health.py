@@ -1,6 +1,12 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends
 
+from aspen.api.deps import get_engine, get_settings
+from aspen.api.schemas.health import DBPoolStats
 from aspen.api.schemas.health import Health as healthschema
+from aspen.api.schemas.health import PhyloTreeCacheStats
+from aspen.api.settings import APISettings
+from aspen.api.utils.tree_cache import phylo_tree_cache
+from aspen.database.connection import get_pool_stats, SqlAlchemyInterface
 
 router = APIRouter()
 
@@ -8,3 +14,21 @@ router = APIRouter()
 @router.get("/", response_model=healthschema)
 async def get_health() -> healthschema:
     return healthschema.parse_obj({"healthy": True})
+
+
+@router.get("/db_pool", response_model=DBPoolStats)
+async def get_db_pool_stats(
+    engine: SqlAlchemyInterface = Depends(get_engine),
+    settings: APISettings = Depends(get_settings),
+) -> DBPoolStats:
+    # Stats are per worker process, so multiply by the gunicorn worker count to
+    # get the number of connections the whole service can hold open.
+    stats = get_pool_stats(engine)
+    stats["max_overflow"] = settings.DB_MAX_OVERFLOW
+    return DBPoolStats.parse_obj(stats)
+
+
+@router.get("/phylo_tree_cache", response_model=PhyloTreeCacheStats)
+async def get_phylo_tree_cache_stats() -> PhyloTreeCacheStats:
+    # Like the pool stats, these are for this worker process only.
+    return PhyloTreeCacheStats.parse_obj(phylo_tree_cache.stats())
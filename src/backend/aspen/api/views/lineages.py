@@ -3,17 +3,32 @@ import re
 import sqlalchemy as sa
 from fastapi import APIRouter, Depends
 from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.requests import Request
+from starlette.responses import Response
 
 from aspen.api.deps import get_db
 from aspen.api.schemas.lineages import PathogenLineagesResponse
+from aspen.api.utils.etags import (
+    etag_matches,
+    make_etag,
+    not_modified,
+    query_fingerprint,
+)
 from aspen.database.models import Pathogen, PathogenLineage
 from aspen.util.lineage import NEXTSTRAIN_LINEAGE_MAP, WHO_LINEAGE_MAP
 
 router = APIRouter()
 
+# Our lineage lists also depend on these, which only change when we deploy.
+LINEAGE_MAPS_VERSION = make_etag(
+    sorted(NEXTSTRAIN_LINEAGE_MAP.items()), sorted(WHO_LINEAGE_MAP.keys())
+)
+
 
 @router.get("/pango", response_model=PathogenLineagesResponse)
-async def list_pango_lineages(db: AsyncSession = Depends(get_db)):
+async def list_pango_lineages(
+    request: Request, response: Response, db: AsyncSession = Depends(get_db)
+):
     """Gets all the Pango lineages.
 
     Note that the returned result is very simple: pretty  much just a list of
@@ -23,6 +38,18 @@ async def list_pango_lineages(db: AsyncSession = Depends(get_db)):
     so that's all we pull and return.
     """
     # This is specifically a *pangolin* lineages endpoint, so hardcode an SC2 filter
+    sc2_id = sa.select(Pathogen.id).where(Pathogen.slug == "SC2").scalar_subquery()  # type: ignore
+    etag = make_etag(
+        "pango_lineages",
+        LINEAGE_MAPS_VERSION,
+        await query_fingerprint(
+            db, [PathogenLineage.lineage], PathogenLineage.pathogen_id == sc2_id
+        ),
+    )
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    response.headers["ETag"] = etag
+
     all_lineages_query = sa.select(PathogenLineage.lineage).join(Pathogen).where(Pathogen.slug == "SC2")  # type: ignore
     result = await db.execute(all_lineages_query)
     all_lineages = set(result.scalars().all())
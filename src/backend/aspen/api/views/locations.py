@@ -8,6 +8,7 @@ from sqlalchemy import asc
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.sql.expression import and_, BinaryExpression
 from starlette.requests import Request
+from starlette.responses import Response
 
 from aspen.api.authn import get_auth_user
 from aspen.api.deps import get_db, get_settings
@@ -17,6 +18,12 @@ from aspen.api.schemas.locations import (
     LocationSearchRequest,
 )
 from aspen.api.settings import APISettings
+from aspen.api.utils.etags import (
+    etag_matches,
+    make_etag,
+    not_modified,
+    query_fingerprint,
+)
 from aspen.database.models import Location, User
 
 router = APIRouter()
@@ -36,6 +43,7 @@ class LocationDepthEnum(str, Enum):
 @router.get("/", response_model=LocationListResponse)
 async def list_locations(
     request: Request,
+    response: Response,
     db: AsyncSession = Depends(get_db),
     settings: APISettings = Depends(get_settings),
     user: User = Depends(get_auth_user),
@@ -49,16 +57,38 @@ async def list_locations(
         LOCATION_DEPTH.index(max_location_depth) + 1 :
     ]
     # Add null filters to our query
-    for col in required_null_columns:
-        all_locations_query = all_locations_query.where(
-            getattr(Location, col) == None  # noqa: E711
-        )
-    result = await db.execute(all_locations_query)
-    response = []
+    null_filters = [
+        getattr(Location, col) == None for col in required_null_columns  # noqa: E711
+    ]
+    for null_filter in null_filters:
+        all_locations_query = all_locations_query.where(null_filter)
+
+    # Only the columns in LocationResponse matter to our clients.
+    etag = make_etag(
+        "locations",
+        max_location_depth.value,
+        await query_fingerprint(
+            db,
+            [
+                Location.id,
+                Location.region,
+                Location.country,
+                Location.division,
+                Location.location,
+            ],
+            sa.and_(True, *null_filters),
+        ),
+    )
+    if etag_matches(request, etag):
+        return not_modified(etag)  # type: ignore
+    response.headers["ETag"] = etag
+
+    result = await db.execute(all_locations_query.order_by(Location.id))
+    locations = []
     for row in result.scalars():
-        response.append(LocationResponse.from_orm(row))
+        locations.append(LocationResponse.from_orm(row))
 
-    return LocationListResponse.parse_obj({"locations": response})
+    return LocationListResponse.parse_obj({"locations": locations})
 
 
 # The idea in this route is that,
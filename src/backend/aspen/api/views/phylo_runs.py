@@ -1,12 +1,14 @@
 import datetime
-from typing import Iterable, List, MutableSequence, Set
+from typing import Iterable, List, MutableSequence, Set, Union
 
 import sentry_sdk
 import sqlalchemy as sa
 from fastapi import APIRouter, Depends
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import joinedload
+from sqlalchemy.orm import joinedload, selectinload
 from sqlalchemy.orm.exc import NoResultFound
+from starlette.requests import Request
 
 from aspen.api.authn import get_auth_user
 from aspen.api.authz import AuthZSession, get_authz_session, require_group_privilege
@@ -33,6 +35,13 @@ from aspen.api.utils import (
     get_missing_and_found_sample_ids,
     samples_by_identifiers,
 )
+from aspen.api.utils.ndjson import (
+    accepts_ndjson,
+    NDJSON_MEDIA_TYPE,
+    ndjson_response,
+    stream_ndjson_rows,
+)
+from aspen.api.utils.tree_cache import phylo_tree_cache
 from aspen.database.models import (
     AlignedRepositoryData,
     Group,
@@ -183,17 +192,26 @@ async def kick_off_phylo_run(
     return PhyloRunResponse.from_orm(workflow)
 
 
-async def get_serializable_runs(
-    db: AsyncSession, az: AuthZSession, pathogen, privilege="read", run_id=None
+async def serializable_runs_query(
+    az: AuthZSession, pathogen: Pathogen, privilege: str = "read"
 ):
+    """The runs `privilege` lets us see, with everything PhyloRunResponse needs.
+    Outputs are selectin loaded (not joined) so that the query can be streamed.
+    """
     query = await az.authorized_query(privilege, PhyloRun)
     query = query.options(
-        joinedload(PhyloRun.outputs.of_type(PhyloTree)),  # type: ignore
+        selectinload(PhyloRun.outputs.of_type(PhyloTree)),  # type: ignore
         joinedload(PhyloRun.user),  # For Pydantic serialization
         joinedload(PhyloRun.group),  # For Pydantic serialization
         joinedload(PhyloRun.contextual_repository),  # For Pydantic serialization
     )
-    query = query.filter(PhyloRun.pathogen == pathogen)  # noqa: E711
+    return query.filter(PhyloRun.pathogen == pathogen)  # noqa: E711
+
+
+async def get_serializable_runs(
+    db: AsyncSession, az: AuthZSession, pathogen, privilege="read", run_id=None
+):
+    query = await serializable_runs_query(az, pathogen, privilege)
     if run_id:
         query = query.filter(PhyloRun.id == run_id)
     res = await db.execute(query)
@@ -209,12 +227,23 @@ async def get_serializable_runs(
     return res.unique().scalars().all()
 
 
-@router.get("/", responses={200: {"model": PhyloRunsListResponse}})
+@router.get(
+    "/",
+    responses={
+        200: {"model": PhyloRunsListResponse, "content": {NDJSON_MEDIA_TYPE: {}}}
+    },
+)
 async def list_runs(
+    request: Request,
     db: AsyncSession = Depends(get_db),
     az: AuthZSession = Depends(get_authz_session),
     pathogen: Pathogen = Depends(get_pathogen),
-) -> PhyloRunsListResponse:
+) -> Union[PhyloRunsListResponse, StreamingResponse]:
+
+    if accepts_ndjson(request):
+        # Stream one PhyloRunResponse per line.
+        query = await serializable_runs_query(az, pathogen)
+        return ndjson_response(stream_ndjson_rows(db, query, PhyloRunResponse.from_orm))
 
     phylo_runs: Iterable[PhyloRun] = await get_serializable_runs(
         db, az, pathogen, "read"
@@ -238,10 +267,14 @@ async def delete_run(
     item = await get_serializable_runs(db, az, pathogen, "write", item_id)
     item_db_id = item.id
 
+    output_ids = []
     for output in item.outputs:
+        output_ids.append(output.entity_id)
         await db.delete(output)
     await db.delete(item)
     await db.commit()
+    for output_id in output_ids:
+        phylo_tree_cache.invalidate_tree(output_id)
     return PhyloRunDeleteResponse(id=item_db_id)
 
 
@@ -260,11 +293,15 @@ async def update_phylo_tree_and_run(
     phylo_run.name = phylo_run_update_request.name
 
     # if there are any associated PhyloTrees update those names as well:
+    renamed_tree_ids = []
     if phylo_run.outputs:
         for output in phylo_run.outputs:
             if isinstance(output, PhyloTree):
                 output.name = phylo_run_update_request.name
+                renamed_tree_ids.append(output.entity_id)
 
     await db.commit()
+    for tree_id in renamed_tree_ids:
+        phylo_tree_cache.invalidate_tree(tree_id)
 
     return PhyloRunResponse.from_orm(phylo_run)
@@ -1,15 +1,25 @@
 import re
+import zlib
+from typing import AsyncIterator
 
 import sqlalchemy as sa
 from fastapi import APIRouter, Depends
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import aliased, contains_eager
 from starlette.requests import Request
 
 from aspen.api.authz import AuthZSession, get_authz_session
 from aspen.api.deps import get_db, get_pathogen, get_pathogen_repo_config, get_splitio
-from aspen.api.utils import extract_accessions, MetadataTSVStreamer, process_phylo_tree
+from aspen.api.utils import (
+    get_public_tree_location,
+    get_tree_accessions,
+    get_tree_etag,
+    MetadataTSVStreamer,
+    process_phylo_tree,
+)
+from aspen.api.utils.etags import etag_matches, make_etag, not_modified
+from aspen.aws import s3_gateway
 from aspen.database.models import (
     Pathogen,
     PhyloRun,
@@ -23,6 +33,13 @@ from aspen.util.split import SplitClient
 router = APIRouter()
 
 
+async def _gunzip_chunks(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    decompressor = zlib.decompressobj(wbits=16 + zlib.MAX_WBITS)
+    async for chunk in chunks:
+        yield decompressor.decompress(chunk)
+    yield decompressor.flush()
+
+
 @router.get("/{item_id}/download")
 async def get_single_phylo_tree(
     item_id: int,
@@ -32,8 +49,52 @@ async def get_single_phylo_tree(
     pathogen: Pathogen = Depends(get_pathogen),
     splitio: SplitClient = Depends(get_splitio),
     pathogen_repo_config: PathogenRepoConfig = Depends(get_pathogen_repo_config),
-) -> JSONResponse:
+) -> Response:
     # get public repository for a given pathogen
+    id_style = request.query_params.get("id_style")
+    headers = {
+        "Content-Type": "application/json",
+        "Content-Disposition": f"attachment; filename={item_id}.json",
+    }
+
+    if id_style == "public":
+        # Public trees look the same to everyone, so we render them when they're
+        # saved and can send the stored bytes along without parsing them.
+        public_tree = await get_public_tree_location(
+            db, az, item_id, pathogen, pathogen_repo_config
+        )
+        if public_tree is not None:
+            s3 = s3_gateway()
+            # The gzipped and gunzipped bodies are different representations,
+            # so they can't share a strong ETag.
+            gzip = "gzip" in request.headers.get("Accept-Encoding", "")
+            encoding = "gzip" if gzip else "identity"
+            if request.headers.get("If-None-Match"):
+                etag = make_etag(
+                    "public_tree",
+                    (await s3.head_object(*public_tree))["ETag"],
+                    encoding,
+                )
+                if etag_matches(request, etag):
+                    return not_modified(etag)
+            s3_stream = await s3.open_object(*public_tree)
+            headers["ETag"] = make_etag("public_tree", s3_stream.etag, encoding)
+            headers["Vary"] = "Accept-Encoding"
+            if gzip:
+                headers["Content-Encoding"] = "gzip"
+                headers["Content-Length"] = str(s3_stream.content_length)
+                body = s3_stream.iter_chunks()
+            else:
+                body = _gunzip_chunks(s3_stream.iter_chunks())
+            return StreamingResponse(body, headers=headers)
+
+    tree_etag = await get_tree_etag(
+        db, az, item_id, pathogen, pathogen_repo_config, id_style
+    )
+    if tree_etag is not None:
+        if etag_matches(request, tree_etag.etag):
+            return not_modified(tree_etag.etag)
+        headers["ETag"] = tree_etag.etag
 
     phylo_tree_data = await process_phylo_tree(
         db,
@@ -41,12 +102,9 @@ async def get_single_phylo_tree(
         item_id,
         pathogen,
         pathogen_repo_config,
-        request.query_params.get("id_style"),
+        id_style,
+        tree_etag,
     )
-    headers = {
-        "Content-Type": "application/json",
-        "Content-Disposition": f"attachment; filename={item_id}.json",
-    }
     return JSONResponse(content=phylo_tree_data, headers=headers)
 
 
@@ -85,7 +143,7 @@ async def _get_selected_samples(
         set(prefix_regex.sub("", item) for item in phylo_run.gisaid_ids)
     )
     # AuthZ note: We're not adding an additional sample access or public/private
-    # identifier check here since the process_phylo_tree method already does that
+    # identifier check here since the get_tree_accessions method already does that
     # filtering, and this data is only used to match any identifiers that are
     # *already* on the tree.
 
@@ -108,7 +166,7 @@ async def get_tree_metadata(
     splitio: SplitClient = Depends(get_splitio),
     pathogen_repo_config: PathogenRepoConfig = Depends(get_pathogen_repo_config),
 ):
-    phylo_tree_data = await process_phylo_tree(
+    accessions = await get_tree_accessions(
         db,
         az,
         item_id,
@@ -116,7 +174,6 @@ async def get_tree_metadata(
         pathogen_repo_config,
         request.query_params.get("id_style"),
     )
-    accessions = extract_accessions([], phylo_tree_data["tree"])
 
     selected_samples = await _get_selected_samples(
         db, item_id, pathogen, pathogen_repo_config
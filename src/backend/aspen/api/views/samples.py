@@ -1,39 +1,41 @@
 import datetime
-import threading
-from typing import Any, List, Mapping, MutableSequence, Optional, Set, Type, Union
+from typing import List, Mapping, MutableSequence, Optional, Set, Type, Union
 
 import sentry_sdk
 import sqlalchemy as sa
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Query
+from fastapi.responses import StreamingResponse
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncResult, AsyncSession
 from sqlalchemy.orm import joinedload, selectinload
 from sqlalchemy.orm.exc import NoResultFound
+from starlette.requests import Request
 
 from aspen.api.authn import AuthContext, get_auth_context, get_auth_user
 from aspen.api.authz import AuthZSession, get_authz_session, require_group_privilege
 from aspen.api.deps import (
     get_db,
+    get_job_dispatcher,
     get_pathogen,
     get_pathogen_repo_config,
     get_public_repository,
-    get_settings,
     get_splitio,
 )
 from aspen.api.error import http_exceptions as ex
 from aspen.api.schemas.samples import (
     CreateSampleRequest,
+    sample_response_projection,
     SampleBulkDeleteRequest,
     SampleBulkDeleteResponse,
     SampleDeleteResponse,
     SampleResponse,
+    SamplesPageResponse,
     SamplesResponse,
     SubmissionTemplateRequest,
     UpdateSamplesRequest,
     ValidateIDsRequest,
     ValidateIDsResponse,
 )
-from aspen.api.settings import APISettings
 from aspen.api.utils import (
     check_duplicate_samples,
     check_duplicate_samples_in_request,
@@ -48,48 +50,77 @@ from aspen.api.utils import (
     sample_info_to_gisaid_rows,
     samples_by_identifiers,
 )
+from aspen.api.utils.bulk_samples import create_uploaded_samples, get_locations_by_id
+from aspen.api.utils.chunked_output import accepts_gzip
+from aspen.api.utils.job_dispatcher import enqueue_ondemand_job, JobDispatcher
+from aspen.api.utils.ndjson import (
+    accepts_ndjson,
+    NDJSON_MEDIA_TYPE,
+    ndjson_response,
+    stream_ndjson_rows,
+)
 from aspen.api.utils.pathogens import get_pathogen_repo_config_for_pathogen
+from aspen.api.utils.sample_listing import (
+    encode_cursor,
+    filter_samples,
+    paginate_samples,
+    prepare_sample_for_response,
+    sample_load_options,
+)
+from aspen.api.utils.tree_cache import phylo_tree_cache
 from aspen.database.models import (
     Group,
     Location,
+    OnDemandJobType,
     Pathogen,
     PathogenRepoConfig,
     PublicRepository,
     Sample,
-    UploadedPathogenGenome,
     User,
 )
 from aspen.util.split import SplitClient
-from aspen.util.swipe import LineageQcJob, PangolinJob
 
 router = APIRouter()
 
 GISAID_REJECTION_TIME = datetime.timedelta(days=4)
 
 
-@router.get("/", response_model=SamplesResponse)
+@router.get(
+    "/",
+    response_model=SamplesResponse,
+    responses={200: {"content": {NDJSON_MEDIA_TYPE: {}}}},
+)
 async def list_samples(
+    request: Request,
     db: AsyncSession = Depends(get_db),
     az: AuthZSession = Depends(get_authz_session),
     ac: AuthContext = Depends(get_auth_context),
     pathogen: Pathogen = Depends(get_pathogen),
-) -> SamplesResponse:
+) -> Union[SamplesResponse, StreamingResponse]:
 
     # load the samples.
     user_visible_samples_query = await az.authorized_query("read", Sample)
     user_visible_samples_query = user_visible_samples_query.options(  # type: ignore
-        selectinload(Sample.uploaded_pathogen_genome),
-        selectinload(Sample.submitting_group),
-        selectinload(Sample.uploaded_by),
-        selectinload(Sample.collection_location),
-        selectinload(Sample.accessions),
-        selectinload(Sample.pathogen),
-        selectinload(Sample.lineages),
-        selectinload(Sample.qc_metrics),
+        *sample_load_options()
     )
     user_visible_samples_query = user_visible_samples_query.filter(
         Sample.pathogen_id == pathogen.id
     )
+
+    # Clients that ask for ndjson get one SampleResponse per line, serialized
+    # as rows come back from the db instead of all at once.
+    if accepts_ndjson(request):
+        group_id: int = ac.group.id  # type: ignore
+
+        def serialize(sample: Sample) -> SampleResponse:
+            return SampleResponse.from_orm(
+                prepare_sample_for_response(sample, group_id)
+            )
+
+        return ndjson_response(
+            stream_ndjson_rows(db, user_visible_samples_query, serialize)
+        )
+
     user_visible_samples_result = await db.execute(user_visible_samples_query)
     user_visible_samples: List[Sample] = (
         user_visible_samples_result.unique().scalars().all()
@@ -100,18 +131,79 @@ async def list_samples(
     tot_rows = 0
     for sample in user_visible_samples:
         tot_rows += 1
-        sample.gisaid = determine_gisaid_status(
-            sample,
-        )
-        sample.show_private_identifier = False
-        # TODO - convert this to an oso check.
-        if sample.submitting_group_id == ac.group.id:  # type: ignore
-            sample.show_private_identifier = True
+        prepare_sample_for_response(sample, ac.group.id)  # type: ignore
         sampleinfo = SampleResponse.from_orm(sample)
         result.samples.append(sampleinfo)
     return result
 
 
+@router.get("/page", response_model=SamplesPageResponse)
+async def list_samples_page(
+    db: AsyncSession = Depends(get_db),
+    az: AuthZSession = Depends(get_authz_session),
+    ac: AuthContext = Depends(get_auth_context),
+    pathogen: Pathogen = Depends(get_pathogen),
+    limit: int = Query(500, ge=1, le=5000),
+    cursor: Optional[str] = None,
+    sort_by: str = "id",
+    sort_direction: str = Query("asc", regex="^(asc|desc)$"),
+    fields: Optional[str] = Query(
+        None, description="Comma separated list of fields to return for each sample"
+    ),
+    collection_date_start: Optional[datetime.date] = None,
+    collection_date_end: Optional[datetime.date] = None,
+    upload_date_start: Optional[datetime.datetime] = None,
+    upload_date_end: Optional[datetime.datetime] = None,
+    lineage: Optional[List[str]] = Query(None),
+    qc_status: Optional[List[str]] = Query(None),
+) -> SamplesPageResponse:
+    """A page of samples, for groups with too many samples to list all at once.
+
+    Pages are keyset paginated: pass the `next_cursor` from one page to get the
+    next one. Keep the sort and filter params the same while paging.
+    """
+    if fields:
+        requested_fields = {field.strip() for field in fields.split(",")}
+        unknown_fields = requested_fields - SampleResponse.__fields__.keys()
+        if unknown_fields:
+            raise ex.BadRequestException(
+                f"Unknown sample fields: {', '.join(sorted(unknown_fields))}"
+            )
+        # We always need ids to build cursors.
+        requested_fields.add("id")
+    else:
+        requested_fields = set(SampleResponse.__fields__.keys())
+    response_model = sample_response_projection(frozenset(requested_fields))
+
+    query = await az.authorized_query("read", Sample)
+    query = query.options(*sample_load_options(requested_fields)).filter(  # type: ignore
+        Sample.pathogen_id == pathogen.id
+    )
+    query = filter_samples(
+        query,
+        collection_date_start=collection_date_start,
+        collection_date_end=collection_date_end,
+        upload_date_start=upload_date_start,
+        upload_date_end=upload_date_end,
+        lineages=lineage,
+        qc_statuses=qc_status,
+    )
+    query = paginate_samples(query, sort_by, sort_direction == "desc", limit, cursor)
+    rows = (await db.execute(query)).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last_sample, last_sort_key = rows[-1]
+        next_cursor = encode_cursor(last_sort_key, last_sample.id)
+
+    samples = []
+    for sample, _ in rows:
+        prepare_sample_for_response(sample, ac.group.id, requested_fields)  # type: ignore
+        samples.append(response_model.from_orm(sample).dict())
+    return SamplesPageResponse(samples=samples, next_cursor=next_cursor)
+
+
 async def get_write_samples_by_ids(
     db: AsyncSession, az: AuthZSession, sample_ids: List[int]
 ) -> AsyncResult:
@@ -150,6 +242,10 @@ async def delete_samples(
         await db.delete(sample)
 
     await db.commit()
+    # Processed trees translate public identifiers using our samples. Cached
+    # trees are keyed on them where we can (see _tree_cache_key), so this only
+    # gets this worker's cache up to date sooner.
+    phylo_tree_cache.clear()
     return SampleBulkDeleteResponse(ids=db_ids)
 
 
@@ -169,6 +265,7 @@ async def delete_sample(
     sample_db_id = sample.id
     await db.delete(sample)
     await db.commit()
+    phylo_tree_cache.clear()
     return SampleDeleteResponse(id=sample_db_id)
 
 
@@ -227,6 +324,10 @@ async def update_samples(
         raise ex.BadRequestException(
             "All private and public identifiers must be unique"
         )
+    # Processed trees translate public identifiers using our samples. Cached
+    # trees are keyed on them where we can (see _tree_cache_key), so this only
+    # gets this worker's cache up to date sooner.
+    phylo_tree_cache.clear()
 
     return res
 
@@ -283,7 +384,7 @@ async def create_samples(
     create_samples_request: List[CreateSampleRequest],
     splitio: SplitClient = Depends(get_splitio),
     db: AsyncSession = Depends(get_db),
-    settings: APISettings = Depends(get_settings),
+    job_dispatcher: JobDispatcher = Depends(get_job_dispatcher),
     user: User = Depends(get_auth_user),
     group: Group = Depends(require_group_privilege("create_sample")),
     pathogen: Pathogen = Depends(get_pathogen),
@@ -310,48 +411,31 @@ async def create_samples(
             f"Error inserting data, private_identifiers {already_exists['existing_private_ids']} or public_identifiers: {already_exists['existing_public_ids']} already exist in our database, please remove these samples before proceeding with upload.",
         )
 
-    created_samples = []
+    locations: Mapping[int, Location] = await get_locations_by_id(
+        db, (row.sample.location_id for row in create_samples_request)
+    )
+    invalid_location_samples: List[str] = []
     for row in create_samples_request:
-        sample_input = row.sample
-        pathogen_genome_input = row.pathogen_genome
-
-        valid_location: Optional[Location] = await Location.get_by_id(
-            db, sample_input.location_id
-        )
-        if not valid_location:
+        if row.sample.location_id not in locations:
             sentry_sdk.capture_message(
-                f"No valid location for id {sample_input.location_id}"
+                f"No valid location for id {row.sample.location_id}"
             )
-            raise ex.BadRequestException("Invalid location id for sample")
-
-        sample_args: Mapping[str, Any] = {
-            "submitting_group": group,
-            "uploaded_by": user,
-            "sample_collected_by": group.name,
-            "sample_collector_contact_address": group.address,
-            "organism": sample_input.organism,
-            "private_identifier": sample_input.private_identifier,
-            "collection_date": sample_input.collection_date,
-            "private": sample_input.private,
-            "public_identifier": sample_input.public_identifier,
-            "authors": sample_input.authors or [group.name],
-            "collection_location": valid_location,
-            "pathogen": pathogen,
-        }
-
-        sample: Sample = Sample(**sample_args)
-        sample.generate_public_identifier(pathogen_repo_config.prefix)
-        uploaded_pathogen_genome: UploadedPathogenGenome = UploadedPathogenGenome(
-            sample=sample,
-            sequence=pathogen_genome_input.sequence,
-            sequencing_date=pathogen_genome_input.sequencing_date,
+            invalid_location_samples.append(row.sample.private_identifier)
+    if invalid_location_samples:
+        raise ex.BadRequestException(
+            f"Invalid location id for samples: {invalid_location_samples}"
         )
-        db.add(sample)
-        db.add(uploaded_pathogen_genome)
-        created_samples.append(sample)
 
     # Write all of our rows to the DB inside our transaction
-    await db.flush()
+    created_sample_ids: List[int] = await create_uploaded_samples(
+        db,
+        group,
+        user,
+        pathogen,
+        pathogen_repo_config.prefix,
+        locations,
+        create_samples_request,
+    )
 
     # Read the samples back from the DB with all fields populated.
     new_samples_query = (
@@ -365,7 +449,8 @@ async def create_samples(
             selectinload(Sample.qc_metrics),
             selectinload(Sample.lineages),
         )
-        .filter(Sample.id.in_([sample.id for sample in created_samples]))
+        .filter(Sample.id.in_(created_sample_ids))
+        .order_by(Sample.id)
         .execution_options(populate_existing=True)
     )
     res = await db.execute(new_samples_query)
@@ -383,26 +468,22 @@ async def create_samples(
         sampleinfo = SampleResponse.from_orm(sample)
         result.samples.append(sampleinfo)
 
-    await db.commit()
-
-    # Asynchronously kick off various on-demand jobs via threads before return
+    # Queue up on-demand jobs for the new samples alongside them. The job
+    # dispatcher starts them once they've been committed, merged with any other
+    # uploads for this group and pathogen that come in around the same time.
 
     # pangolin should only be called for SC2 samples
     # SC2 samples still will get qc_metrics from nextclade job (LingeageQCJob)
     if preferred_lineage_caller == "Pangolin":
-        _pangolin_job = PangolinJob(settings)
-        pangolin_job = threading.Thread(
-            target=_pangolin_job.run,
-            args=(group, pangolin_sample_ids),
+        enqueue_ondemand_job(
+            db, group, pathogen, OnDemandJobType.PANGOLIN, pangolin_sample_ids
         )
-        pangolin_job.start()
-
-    _lineage_qc_job = LineageQcJob(settings)
-    lineage_qc_job = threading.Thread(
-        target=_lineage_qc_job.run,
-        args=(group, pathogen.slug, lineage_qc_sample_ids),
+    enqueue_ondemand_job(
+        db, group, pathogen, OnDemandJobType.LINEAGE_QC, lineage_qc_sample_ids
     )
-    lineage_qc_job.start()
+
+    await db.commit()
+    job_dispatcher.notify()
 
     return result
 
@@ -416,6 +497,7 @@ def get_submission_template_filename(public_repository_name):
 @router.post("/submission_template")
 async def fill_submission_template(
     request: SubmissionTemplateRequest,
+    http_request: Request,
     db: AsyncSession = Depends(get_db),
     az: AuthZSession = Depends(get_authz_session),
     ac: AuthContext = Depends(get_auth_context),
@@ -478,4 +560,4 @@ async def fill_submission_template(
         tsv_streamer = GenBankSubmissionFormTSVStreamer
 
     file_streamer = tsv_streamer(filename, metadata_rows)
-    return file_streamer.get_response()
+    return file_streamer.get_response(gzip=accepts_gzip(http_request))
@@ -1,25 +1,37 @@
-import os
+import re
 from datetime import datetime
-from uuid import uuid4
 
-import boto3
-import smart_open
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, BackgroundTasks, Depends
 from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.requests import Request
 
 import aspen.api.error.http_exceptions as ex
 from aspen.api.authn import AuthContext, get_auth_context
 from aspen.api.authz import AuthZSession, get_authz_session
-from aspen.api.deps import get_db, get_pathogen, get_settings
+from aspen.api.deps import get_db, get_engine, get_pathogen, get_settings
 from aspen.api.schemas.sequences import (
     FastaURLRequest,
     FastaURLResponse,
     SequenceRequest,
 )
 from aspen.api.settings import APISettings
+from aspen.api.utils.chunked_output import accepts_gzip
 from aspen.api.utils.fasta_streamer import FastaStreamer
+from aspen.api.utils.fasta_uploads import (
+    fasta_upload_exists,
+    fasta_upload_id,
+    fasta_upload_key,
+    get_fasta_upload_status,
+    run_fasta_upload,
+    start_fasta_upload,
+    UPLOAD_PENDING,
+    UPLOAD_READY,
+    write_fasta_upload,
+)
 from aspen.api.utils.pathogens import get_pathogen_repo_config_for_pathogen
+from aspen.aws import s3_gateway
+from aspen.database.connection import SqlAlchemyInterface
 from aspen.database.models import Pathogen
 
 router = APIRouter()
@@ -37,6 +49,7 @@ def get_fasta_filename(public_repository_name, group_name):
 @router.post("/")
 async def prepare_sequences_download(
     request: SequenceRequest,
+    http_request: Request,
     db: AsyncSession = Depends(get_db),
     az: AuthZSession = Depends(get_authz_session),
     ac: AuthContext = Depends(get_auth_context),
@@ -61,16 +74,23 @@ async def prepare_sequences_download(
             "no prefix found for given pathogen_slug and public_repository combination"
         )
 
+    gzip = accepts_gzip(http_request)
+
     async def stream_samples():
         sample_ids = request.sample_ids
-        streamer = FastaStreamer(db, az, ac, pathogen, set(sample_ids), prefix=prefix)
-        async for line in streamer.stream():
-            yield line
+        streamer = FastaStreamer(
+            db, az, ac, pathogen, set(sample_ids), prefix=prefix, compress=gzip
+        )
+        async for chunk in streamer.stream():
+            yield chunk
 
     # Detach all ORM objects (makes them read-only!) from the DB session for our generator.
     db.expunge_all()
     generator = stream_samples()
     resp = StreamingResponse(generator, media_type="application/binary")
+    if gzip:
+        resp.headers["Content-Encoding"] = "gzip"
+        resp.headers["Vary"] = "Accept-Encoding"
     # Access-Control-Expose-Headers needed for FE to read Content-Disposition to get filename
     resp.headers["Access-Control-Expose-Headers"] = "Content-Disposition"
     resp.headers["Content-Disposition"] = f"attachment; filename={fasta_filename}"
@@ -78,43 +98,65 @@ async def prepare_sequences_download(
 
 
 # Writes sample sequence(s) to a FASTA file and uploads it to S3,
-# returning a signed url to the S3 object.
+# returning a signed url to the S3 object. Files are reused for identical
+# requests, and can be written in the background for large sample sets.
 @router.post("/getfastaurl")
 async def getfastaurl(
     request: FastaURLRequest,
+    background_tasks: BackgroundTasks,
     db: AsyncSession = Depends(get_db),
+    engine: SqlAlchemyInterface = Depends(get_engine),
     settings: APISettings = Depends(get_settings),
     az: AuthZSession = Depends(get_authz_session),
     ac: AuthContext = Depends(get_auth_context),
     pathogen: Pathogen = Depends(get_pathogen),
 ) -> FastaURLResponse:
-    sample_ids = request.samples
+    sample_ids = set(request.samples)
     downstream_consumer = request.downstream_consumer
 
     s3_bucket = settings.EXTERNAL_AUSPICE_BUCKET
-    s3_resource = boto3.resource(
-        "s3",
-        endpoint_url=os.getenv("BOTO_ENDPOINT_URL") or None,
-        config=boto3.session.Config(signature_version="s3v4"),
+    upload_id = await fasta_upload_id(
+        db, az, ac, pathogen, sample_ids, downstream_consumer
     )
-    s3_client = s3_resource.meta.client
-    uuid = uuid4()
-    s3_key = f"fasta-url-files/{ac.group.name}/{uuid}.fasta"  # type: ignore
-    s3_write_fh = smart_open.open(
-        f"s3://{s3_bucket}/{s3_key}", "w", transport_params=dict(client=s3_client)
-    )
-    # Write selected samples to s3
-    streamer = FastaStreamer(
-        db, az, ac, pathogen, set(sample_ids), downstream_consumer=downstream_consumer
-    )
-    async for line in streamer.stream():
-        s3_write_fh.write(line)
-    s3_write_fh.close()
-
-    presigned_url = s3_client.generate_presigned_url(
-        "get_object",
-        Params={"Bucket": s3_bucket, "Key": s3_key},
-        ExpiresIn=3600,
+    s3_key = fasta_upload_key(ac.group.name, upload_id)  # type: ignore
+    status = UPLOAD_READY
+    if not await fasta_upload_exists(s3_bucket, s3_key):
+        if request.background:
+            status = UPLOAD_PENDING
+            if await start_fasta_upload(s3_bucket, s3_key):
+                background_tasks.add_task(
+                    run_fasta_upload,
+                    engine,
+                    ac,
+                    pathogen,
+                    sample_ids,
+                    downstream_consumer,
+                    s3_bucket,
+                    s3_key,
+                )
+        else:
+            await write_fasta_upload(
+                db, az, ac, pathogen, sample_ids, downstream_consumer, s3_bucket, s3_key
+            )
+
+    presigned_url = s3_gateway().generate_presigned_url(
+        s3_bucket, s3_key, expires_in=3600
     )
+    return FastaURLResponse(url=presigned_url, upload_id=upload_id, status=status)
+
 
-    return FastaURLResponse(url=presigned_url)
+@router.get("/getfastaurl/{upload_id}")
+async def getfastaurl_status(
+    upload_id: str,
+    settings: APISettings = Depends(get_settings),
+    ac: AuthContext = Depends(get_auth_context),
+) -> FastaURLResponse:
+    if not re.fullmatch("[0-9a-f]{64}", upload_id):
+        raise ex.BadRequestException("Invalid upload id")
+    s3_bucket = settings.EXTERNAL_AUSPICE_BUCKET
+    s3_key = fasta_upload_key(ac.group.name, upload_id)  # type: ignore
+    status = await get_fasta_upload_status(s3_bucket, s3_key)
+    presigned_url = s3_gateway().generate_presigned_url(
+        s3_bucket, s3_key, expires_in=3600
+    )
+    return FastaURLResponse(url=presigned_url, upload_id=upload_id, status=status)
@@ -7,7 +7,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import joinedload
 
 from aspen.api.authn import get_auth_context, get_user_roles, setup_userinfo
-from aspen.api.authz import AuthZSession, get_authz_session
+from aspen.api.authz import AuthZSession, get_authz_session, get_oso
 from aspen.database.models import Group, GroupRole, PhyloRun, PhyloTree, Sample, User
 from aspen.database.models.base import idbase
 from aspen.test_infra.models.location import location_factory
@@ -336,3 +336,33 @@ async def test_groups_write(
     ]
     matrix = [[azs[i], results[i]] for i in range(len(results))]
     await check_matrix(Group, "write", async_session, matrix)
+
+
+async def test_policy_shared_across_sessions(
+    async_session: AsyncSession,
+    groups: List[Group],
+    appdata: List[PhyloTree],
+    azs: List[AuthZSession],
+):
+    # Every AuthZSession evaluates against the same pre-loaded policy, and
+    # records how long each evaluation took.
+    assert await get_oso() is await get_oso()
+    for az in azs:
+        await az.authorized_query("read", Sample)
+        assert [timing[:2] for timing in az.timings] == [("read", "Sample")]
+        assert az.total_time > 0
+
+
+async def test_authorized_query_memoized(
+    async_session: AsyncSession,
+    groups: List[Group],
+    appdata: List[PhyloTree],
+    azs: List[AuthZSession],
+):
+    az = azs[1]
+    first = await az.authorized_query("read", Sample)
+    assert await az.authorized_query("read", Sample) is first
+    assert await az.authorized_query("read_private", Sample) is not first
+    # Policy only gets evaluated once per privilege/model pair.
+    assert len(az.timings) == 2
+    assert az.cache_hits == 1
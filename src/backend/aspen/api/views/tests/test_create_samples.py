@@ -7,7 +7,13 @@ from httpx import AsyncClient
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import joinedload
 
-from aspen.database.models import PathogenGenome, Sample, UploadedPathogenGenome
+from aspen.database.models import (
+    OnDemandJobType,
+    PathogenGenome,
+    PendingOnDemandJob,
+    Sample,
+    UploadedPathogenGenome,
+)
 from aspen.test_infra.models.location import location_factory
 from aspen.test_infra.models.pathogen import pathogen_factory
 from aspen.test_infra.models.pathogen_repo_config import (
@@ -727,3 +733,185 @@ async def test_samples_create_view_fail_missing_required_fields(
             },
         ]
     }
+
+
+async def test_samples_create_view_multiple_insert_batches(
+    async_session: AsyncSession,
+    http_client: AsyncClient,
+    split_client: SplitClient,
+    monkeypatch,
+):
+    # Write the upload a couple of rows at a time, to check that every row
+    # makes it in and samples and genomes still line up across batches.
+    monkeypatch.setattr("aspen.workflows.shared_utils.database.INSERT_BATCH_SIZE", 2)
+    group = group_factory()
+    user = await userrole_factory(async_session, group)
+    pathogen, default_repo_config = setup_gisaid_and_genbank_repo_configs(
+        async_session, split_client=split_client
+    )
+    location = location_factory(
+        "North America", "USA", "California", "Santa Barbara County"
+    )
+    async_session.add(group)
+    async_session.add(pathogen)
+    async_session.add(location)
+    await async_session.commit()
+    test_date = datetime.datetime.now()
+
+    data = [
+        {
+            "sample": {
+                "private_identifier": f"private_{i}",
+                "public_identifier": f"public_{i}" if i % 2 else "",
+                "collection_date": format_date(test_date),
+                "location_id": location.id,
+                "private": True,
+            },
+            "pathogen_genome": {
+                "sequence": "N" * i + VALID_SEQUENCE,
+                "sequencing_date": format_date(test_date),
+            },
+        }
+        for i in range(5)
+    ]
+    auth_headers = {"user_id": user.auth0_user_id}
+    res = await http_client.post(
+        f"/v2/orgs/{group.id}/pathogens/{pathogen.slug}/samples/",
+        json=data,
+        headers=auth_headers,
+    )
+    assert res.status_code == 200
+    assert [row["private_identifier"] for row in res.json()["samples"]] == [
+        f"private_{i}" for i in range(5)
+    ]
+    await async_session.close()
+    async_session.begin()
+
+    samples_res = await async_session.execute(
+        sa.select(Sample)  # type: ignore
+        .options(joinedload(Sample.uploaded_pathogen_genome))
+        .order_by(Sample.id)
+    )
+    samples = samples_res.scalars().unique().all()
+    prefix = default_repo_config.prefix
+    assert [sample.public_identifier for sample in samples] == [
+        f"{prefix}/USA/groupname-{samples[0].id}/{test_date.year}",
+        "public_1",
+        f"{prefix}/USA/groupname-{samples[2].id}/{test_date.year}",
+        "public_3",
+        f"{prefix}/USA/groupname-{samples[4].id}/{test_date.year}",
+    ]
+    for i, sample in enumerate(samples):
+        genome = sample.uploaded_pathogen_genome
+        assert genome.num_missing_alleles == i
+        assert genome.num_unambiguous_sites == 1000
+        assert genome.stripped_sequence_length == 1000
+
+
+async def test_samples_create_view_fail_invalid_location(
+    async_session: AsyncSession,
+    http_client: AsyncClient,
+    split_client: SplitClient,
+):
+    group = group_factory()
+    user = await userrole_factory(async_session, group)
+    pathogen, _ = setup_gisaid_and_genbank_repo_configs(
+        async_session, split_client=split_client
+    )
+    location = location_factory(
+        "North America", "USA", "California", "Santa Barbara County"
+    )
+    async_session.add(group)
+    async_session.add(pathogen)
+    async_session.add(location)
+    await async_session.commit()
+
+    data = [
+        {
+            "sample": {
+                "private_identifier": private_identifier,
+                "collection_date": format_date(datetime.datetime.now()),
+                "location_id": location_id,
+                "private": True,
+            },
+            "pathogen_genome": {
+                "sequence": VALID_SEQUENCE,
+                "sequencing_date": "2020-01-01",
+            },
+        }
+        for private_identifier, location_id in [
+            ("private", location.id),
+            ("private1", location.id + 100),
+            ("private2", location.id + 200),
+        ]
+    ]
+    auth_headers = {"user_id": user.auth0_user_id}
+    res = await http_client.post(
+        f"/v2/orgs/{group.id}/pathogens/{pathogen.slug}/samples/",
+        json=data,
+        headers=auth_headers,
+    )
+    assert res.status_code == 400
+    assert res.json() == {
+        "error": "Invalid location id for samples: ['private1', 'private2']"
+    }
+    await async_session.close()
+    async_session.begin()
+    samples_res = await async_session.execute(sa.select(Sample))  # type: ignore
+    assert samples_res.scalars().all() == []
+
+
+async def test_samples_create_view_queues_ondemand_jobs(
+    async_session: AsyncSession,
+    http_client: AsyncClient,
+    split_client: SplitClient,
+):
+    group = group_factory()
+    user = await userrole_factory(async_session, group)
+    pathogen, _ = setup_gisaid_and_genbank_repo_configs(
+        async_session, split_client=split_client
+    )
+    location = location_factory(
+        "North America", "USA", "California", "Santa Barbara County"
+    )
+    async_session.add(group)
+    async_session.add(pathogen)
+    async_session.add(location)
+    await async_session.commit()
+
+    data = [
+        {
+            "sample": {
+                "private_identifier": f"private_{i}",
+                "collection_date": format_date(datetime.datetime.now()),
+                "location_id": location.id,
+                "private": True,
+            },
+            "pathogen_genome": {
+                "sequence": VALID_SEQUENCE,
+                "sequencing_date": "2020-01-01",
+            },
+        }
+        for i in range(2)
+    ]
+    auth_headers = {"user_id": user.auth0_user_id}
+    res = await http_client.post(
+        f"/v2/orgs/{group.id}/pathogens/{pathogen.slug}/samples/",
+        json=data,
+        headers=auth_headers,
+    )
+    assert res.status_code == 200
+    sample_ids = [sample["id"] for sample in res.json()["samples"]]
+    await async_session.close()
+    async_session.begin()
+
+    # The jobs are left for the dispatcher to start.
+    jobs_res = await async_session.execute(
+        sa.select(PendingOnDemandJob)  # type: ignore
+    )
+    jobs = jobs_res.scalars().all()
+    assert len(jobs) == 1
+    assert jobs[0].group_id == group.id
+    assert jobs[0].pathogen_id == pathogen.id
+    assert jobs[0].job_type == OnDemandJobType.LINEAGE_QC
+    assert jobs[0].sample_ids == sample_ids
@@ -1,3 +1,4 @@
+import gzip
 import json
 from copy import deepcopy
 from typing import Dict
@@ -8,7 +9,9 @@ from botocore.client import ClientError
 from httpx import AsyncClient
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from aspen.api.utils import phylo
 from aspen.api.utils.pathogens import get_pathogen_repo_config_for_pathogen
+from aspen.api.utils.tree_cache import configure_phylo_tree_cache
 from aspen.api.views.tests.data.phylo_tree_data import TEST_TREE
 from aspen.api.views.tests.test_list_phylo_runs import make_all_test_data
 from aspen.api.views.tests.test_update_phylo_run_and_tree import make_shared_test_data
@@ -17,7 +20,9 @@ from aspen.api.views.tests.utils.phylo_tree_utils import (
     align_json_with_model,
     create_id_mapped_tree,
 )
-from aspen.database.models import Group, Location, User
+from aspen.database.models import Group, Location, PhyloTree, User
+from aspen.phylo_tree.node_index import NodeIndexBuilder
+from aspen.phylo_tree.walk import walk_tree
 from aspen.test_infra.models.location import location_factory
 from aspen.test_infra.models.usergroup import group_factory, userrole_factory
 from aspen.util.split import SplitClient
@@ -66,6 +71,57 @@ async def test_phylo_tree_can_see(
     assert returned_tree["tree"] == matching_mapped_json["tree"]
 
 
+async def test_phylo_tree_download_cached(
+    async_session: AsyncSession,
+    http_client: AsyncClient,
+    mock_s3_resource: boto3.resource,
+    split_client: SplitClient,
+):
+    user, group, samples, phylo_run, phylo_tree, pathogen = await make_shared_test_data(
+        async_session
+    )
+
+    try:
+        mock_s3_resource.meta.client.head_bucket(Bucket=phylo_tree.s3_bucket)
+    except ClientError:
+        mock_s3_resource.create_bucket(Bucket=phylo_tree.s3_bucket)
+
+    matching_tree_json: Dict = align_json_with_model(deepcopy(TEST_TREE), phylo_tree)
+    mock_s3_resource.Bucket(phylo_tree.s3_bucket).Object(phylo_tree.s3_key).put(
+        Body=json.dumps(matching_tree_json)
+    )
+    pathogen_repo_config = await get_pathogen_repo_config_for_pathogen(
+        pathogen, "GISAID", async_session
+    )
+    matching_mapped_json: Dict = create_id_mapped_tree(
+        align_json_with_model(deepcopy(TEST_TREE), phylo_tree),
+        pathogen_repo_config.prefix,
+    )
+
+    auth_headers = {"name": user.name, "user_id": user.auth0_user_id}
+    split_client.get_pathogen_treatment.return_value = "GISAID"
+    url = f"/v2/orgs/{group.id}/pathogens/{phylo_tree.pathogen.slug}/phylo_trees/{phylo_tree.entity_id}/download"
+    cache = configure_phylo_tree_cache(maxsize=4, ttl=60)
+    try:
+        first = await http_client.get(url, headers=auth_headers)
+        second = await http_client.get(url, headers=auth_headers)
+        assert cache.misses == 1
+        assert cache.hits == 1
+        assert first.json()["tree"] == matching_mapped_json["tree"]
+        assert second.json() == first.json()
+
+        # Rewriting the tree in S3 changes its ETag, so we don't serve stale data.
+        matching_tree_json["meta"]["title"] = "updated"
+        mock_s3_resource.Bucket(phylo_tree.s3_bucket).Object(phylo_tree.s3_key).put(
+            Body=json.dumps(matching_tree_json)
+        )
+        third = await http_client.get(url, headers=auth_headers)
+        assert cache.misses == 2
+        assert third.json()["meta"]["title"] == "updated"
+    finally:
+        configure_phylo_tree_cache(maxsize=0, ttl=0)
+
+
 async def test_phylo_tree_id_style_public(
     async_session: AsyncSession,
     http_client: AsyncClient,
@@ -104,6 +160,326 @@ async def test_phylo_tree_id_style_public(
     assert returned_tree["tree"] == prefixed_tree["tree"]
 
 
+async def save_public_rendering(
+    async_session: AsyncSession,
+    mock_s3_resource: boto3.resource,
+    phylo_tree: PhyloTree,
+    group: Group,
+    rendered_tree: Dict,
+) -> None:
+    """Stores `rendered_tree` the way the nextstrain save workflow would."""
+    tree_location = await async_session.get(Location, group.default_tree_location_id)
+    phylo_tree.public_tree_s3_key = f"{phylo_tree.s3_key}.public.json.gz"
+    phylo_tree.public_tree_location_id = tree_location.id
+    phylo_tree.public_tree_latitude = tree_location.latitude
+    phylo_tree.public_tree_longitude = tree_location.longitude
+    mock_s3_resource.Bucket(phylo_tree.s3_bucket).Object(
+        phylo_tree.public_tree_s3_key
+    ).put(Body=gzip.compress(json.dumps(rendered_tree).encode("utf-8")))
+    await async_session.commit()
+
+
+async def test_phylo_tree_id_style_public_prerendered(
+    async_session: AsyncSession,
+    http_client: AsyncClient,
+    mock_s3_resource: boto3.resource,
+    split_client: SplitClient,
+):
+    user, group, samples, phylo_run, phylo_tree, pathogen = await make_shared_test_data(
+        async_session
+    )
+
+    try:
+        mock_s3_resource.meta.client.head_bucket(Bucket=phylo_tree.s3_bucket)
+    except ClientError:
+        mock_s3_resource.create_bucket(Bucket=phylo_tree.s3_bucket)
+
+    # The raw tree isn't needed when we have a rendered one.
+    rendered_tree = {"meta": {"colorings": []}, "tree": {"name": "rendered"}}
+    await save_public_rendering(
+        async_session, mock_s3_resource, phylo_tree, group, rendered_tree
+    )
+
+    auth_headers = {"name": user.name, "user_id": user.auth0_user_id}
+    split_client.get_pathogen_treatment.return_value = (
+        phylo_run.contextual_repository.name
+    )
+    url = f"/v2/orgs/{group.id}/pathogens/{phylo_tree.pathogen.slug}/phylo_trees/{phylo_tree.entity_id}/download?id_style=public"
+    result = await http_client.get(
+        url, headers={**auth_headers, "Accept-Encoding": "gzip"}
+    )
+    assert result.status_code == 200
+    assert result.headers["Content-Encoding"] == "gzip"
+    assert result.json() == rendered_tree
+    gzip_etag = result.headers["ETag"]
+
+    result = await http_client.get(
+        url, headers={**auth_headers, "Accept-Encoding": "identity"}
+    )
+    assert result.status_code == 200
+    assert "Content-Encoding" not in result.headers
+    assert result.json() == rendered_tree
+    # The gzipped and gunzipped bodies are different representations.
+    assert result.headers["ETag"] != gzip_etag
+
+    result = await http_client.get(
+        url,
+        headers={
+            **auth_headers,
+            "Accept-Encoding": "identity",
+            "If-None-Match": result.headers["ETag"],
+        },
+    )
+    assert result.status_code == 304
+    result = await http_client.get(
+        url,
+        headers={
+            **auth_headers,
+            "Accept-Encoding": "identity",
+            "If-None-Match": gzip_etag,
+        },
+    )
+    assert result.status_code == 200
+
+
+async def test_phylo_tree_id_style_public_prerendered_stale(
+    async_session: AsyncSession,
+    http_client: AsyncClient,
+    mock_s3_resource: boto3.resource,
+    split_client: SplitClient,
+):
+    user, group, samples, phylo_run, phylo_tree, pathogen = await make_shared_test_data(
+        async_session
+    )
+
+    try:
+        mock_s3_resource.meta.client.head_bucket(Bucket=phylo_tree.s3_bucket)
+    except ClientError:
+        mock_s3_resource.create_bucket(Bucket=phylo_tree.s3_bucket)
+
+    mock_s3_resource.Bucket(phylo_tree.s3_bucket).Object(phylo_tree.s3_key).put(
+        Body=json.dumps(TEST_TREE)
+    )
+    rendered_tree = {"meta": {"colorings": []}, "tree": {"name": "rendered"}}
+    await save_public_rendering(
+        async_session, mock_s3_resource, phylo_tree, group, rendered_tree
+    )
+
+    auth_headers = {"name": user.name, "user_id": user.auth0_user_id}
+    split_client.get_pathogen_treatment.return_value = (
+        phylo_run.contextual_repository.name
+    )
+    url = f"/v2/orgs/{group.id}/pathogens/{phylo_tree.pathogen.slug}/phylo_trees/{phylo_tree.entity_id}/download?id_style=public"
+    pathogen_repo_config = await get_pathogen_repo_config_for_pathogen(
+        pathogen, phylo_run.contextual_repository.name, async_session
+    )
+    prefixed_tree = add_prefixes(TEST_TREE, pathogen_repo_config.prefix)
+
+    # Moving the tree location's coordinates makes the rendering stale.
+    tree_location = await async_session.get(Location, group.default_tree_location_id)
+    tree_location.latitude = (tree_location.latitude or 0) + 1
+    await async_session.commit()
+    result = await http_client.get(url, headers=auth_headers)
+    assert result.status_code == 200
+    assert result.json()["tree"] == prefixed_tree["tree"]
+
+    # So does picking a different tree location.
+    await save_public_rendering(
+        async_session, mock_s3_resource, phylo_tree, group, rendered_tree
+    )
+    location = location_factory("North America", "USA", "California", "Alameda County")
+    async_session.add(location)
+    await async_session.flush()
+    group.default_tree_location_id = location.id
+    await async_session.commit()
+    result = await http_client.get(url, headers=auth_headers)
+    assert result.status_code == 200
+    assert result.json()["tree"] == prefixed_tree["tree"]
+
+
+async def test_phylo_tree_not_modified(
+    async_session: AsyncSession,
+    http_client: AsyncClient,
+    mock_s3_resource: boto3.resource,
+    split_client: SplitClient,
+):
+    user, group, samples, phylo_run, phylo_tree, pathogen = await make_shared_test_data(
+        async_session
+    )
+
+    try:
+        mock_s3_resource.meta.client.head_bucket(Bucket=phylo_tree.s3_bucket)
+    except ClientError:
+        mock_s3_resource.create_bucket(Bucket=phylo_tree.s3_bucket)
+
+    matching_tree_json: Dict = align_json_with_model(deepcopy(TEST_TREE), phylo_tree)
+    mock_s3_resource.Bucket(phylo_tree.s3_bucket).Object(phylo_tree.s3_key).put(
+        Body=json.dumps(matching_tree_json)
+    )
+    # ETags are computed from the node index, so they only work for indexed trees.
+    node_index = NodeIndexBuilder()
+    walk_tree(deepcopy(matching_tree_json["tree"]), node_index)
+    phylo_tree.node_index = node_index.to_json()
+    await async_session.commit()
+
+    auth_headers = {"name": user.name, "user_id": user.auth0_user_id}
+    split_client.get_pathogen_treatment.return_value = "GISAID"
+    url = f"/v2/orgs/{group.id}/pathogens/{phylo_tree.pathogen.slug}/phylo_trees/{phylo_tree.entity_id}/download"
+    first = await http_client.get(url, headers=auth_headers)
+    etag = first.headers["ETag"]
+
+    second = await http_client.get(url, headers={**auth_headers, "If-None-Match": etag})
+    assert second.status_code == 304
+
+    # The tree shows private ids, so changing one changes the tree.
+    samples[0].private_identifier = "renamed_private_id"
+    await async_session.commit()
+    third = await http_client.get(url, headers={**auth_headers, "If-None-Match": etag})
+    assert third.status_code == 200
+    assert third.headers["ETag"] != etag
+    assert third.json()["tree"] != first.json()["tree"]
+
+
+async def test_phylo_tree_cache_keyed_on_etag(
+    async_session: AsyncSession,
+    http_client: AsyncClient,
+    mock_s3_resource: boto3.resource,
+    split_client: SplitClient,
+):
+    user, group, samples, phylo_run, phylo_tree, pathogen = await make_shared_test_data(
+        async_session
+    )
+
+    try:
+        mock_s3_resource.meta.client.head_bucket(Bucket=phylo_tree.s3_bucket)
+    except ClientError:
+        mock_s3_resource.create_bucket(Bucket=phylo_tree.s3_bucket)
+
+    matching_tree_json: Dict = align_json_with_model(deepcopy(TEST_TREE), phylo_tree)
+    mock_s3_resource.Bucket(phylo_tree.s3_bucket).Object(phylo_tree.s3_key).put(
+        Body=json.dumps(matching_tree_json)
+    )
+    node_index = NodeIndexBuilder()
+    walk_tree(deepcopy(matching_tree_json["tree"]), node_index)
+    phylo_tree.node_index = node_index.to_json()
+    await async_session.commit()
+
+    auth_headers = {"name": user.name, "user_id": user.auth0_user_id}
+    split_client.get_pathogen_treatment.return_value = "GISAID"
+    url = f"/v2/orgs/{group.id}/pathogens/{phylo_tree.pathogen.slug}/phylo_trees/{phylo_tree.entity_id}/download"
+    cache = configure_phylo_tree_cache(maxsize=4, ttl=60)
+    try:
+        first = await http_client.get(url, headers=auth_headers)
+        await http_client.get(url, headers=auth_headers)
+        assert (cache.misses, cache.hits) == (1, 1)
+
+        # A change made by some other worker, which couldn't have cleared our
+        # cache, still gets us a freshly processed tree under the new ETag.
+        samples[0].private_identifier = "renamed_private_id"
+        await async_session.commit()
+        second = await http_client.get(url, headers=auth_headers)
+        assert cache.misses == 2
+        assert second.headers["ETag"] != first.headers["ETag"]
+        assert second.json()["tree"] != first.json()["tree"]
+    finally:
+        configure_phylo_tree_cache(maxsize=0, ttl=0)
+
+
+async def test_phylo_tree_cache_tree_location(
+    async_session: AsyncSession,
+    http_client: AsyncClient,
+    mock_s3_resource: boto3.resource,
+    split_client: SplitClient,
+):
+    user, group, samples, phylo_run, phylo_tree, pathogen = await make_shared_test_data(
+        async_session
+    )
+
+    try:
+        mock_s3_resource.meta.client.head_bucket(Bucket=phylo_tree.s3_bucket)
+    except ClientError:
+        mock_s3_resource.create_bucket(Bucket=phylo_tree.s3_bucket)
+
+    matching_tree_json: Dict = align_json_with_model(deepcopy(TEST_TREE), phylo_tree)
+    mock_s3_resource.Bucket(phylo_tree.s3_bucket).Object(phylo_tree.s3_key).put(
+        Body=json.dumps(matching_tree_json)
+    )
+
+    auth_headers = {"name": user.name, "user_id": user.auth0_user_id}
+    split_client.get_pathogen_treatment.return_value = "GISAID"
+    url = f"/v2/orgs/{group.id}/pathogens/{phylo_tree.pathogen.slug}/phylo_trees/{phylo_tree.entity_id}/download"
+    cache = configure_phylo_tree_cache(maxsize=4, ttl=60)
+    try:
+        await http_client.get(url, headers=auth_headers)
+        # Trees without a node index are still keyed on the group's tree
+        # location, which their colors are sorted by.
+        location = location_factory(
+            "North America", "USA", "California", "Alameda County"
+        )
+        async_session.add(location)
+        await async_session.flush()
+        group.default_tree_location_id = location.id
+        await async_session.commit()
+        await http_client.get(url, headers=auth_headers)
+        assert (cache.misses, cache.hits) == (2, 0)
+    finally:
+        configure_phylo_tree_cache(maxsize=0, ttl=0)
+
+
+async def test_phylo_tree_etag_lookups_not_repeated(
+    async_session: AsyncSession,
+    http_client: AsyncClient,
+    mock_s3_resource: boto3.resource,
+    split_client: SplitClient,
+    monkeypatch,
+):
+    user, group, samples, phylo_run, phylo_tree, pathogen = await make_shared_test_data(
+        async_session
+    )
+
+    try:
+        mock_s3_resource.meta.client.head_bucket(Bucket=phylo_tree.s3_bucket)
+    except ClientError:
+        mock_s3_resource.create_bucket(Bucket=phylo_tree.s3_bucket)
+
+    matching_tree_json: Dict = align_json_with_model(deepcopy(TEST_TREE), phylo_tree)
+    mock_s3_resource.Bucket(phylo_tree.s3_bucket).Object(phylo_tree.s3_key).put(
+        Body=json.dumps(matching_tree_json)
+    )
+    node_index = NodeIndexBuilder()
+    walk_tree(deepcopy(matching_tree_json["tree"]), node_index)
+    phylo_tree.node_index = node_index.to_json()
+    await async_session.commit()
+    pathogen_repo_config = await get_pathogen_repo_config_for_pathogen(
+        pathogen, "GISAID", async_session
+    )
+    matching_mapped_json: Dict = create_id_mapped_tree(
+        align_json_with_model(deepcopy(TEST_TREE), phylo_tree),
+        pathogen_repo_config.prefix,
+    )
+
+    calls: Dict[str, int] = {}
+    for name in ["verify_and_access_phylo_tree", "get_identifier_map"]:
+        original = getattr(phylo, name)
+
+        async def counted(*args, name=name, original=original, **kwargs):
+            calls[name] = calls.get(name, 0) + 1
+            return await original(*args, **kwargs)
+
+        monkeypatch.setattr(phylo, name, counted)
+
+    auth_headers = {"name": user.name, "user_id": user.auth0_user_id}
+    split_client.get_pathogen_treatment.return_value = "GISAID"
+    url = f"/v2/orgs/{group.id}/pathogens/{phylo_tree.pathogen.slug}/phylo_trees/{phylo_tree.entity_id}/download"
+    result = await http_client.get(url, headers=auth_headers)
+    assert result.status_code == 200
+    assert "ETag" in result.headers
+    assert result.json()["tree"] == matching_mapped_json["tree"]
+    # Computing the ETag loads the tree and its identifiers, and the tree
+    # itself is processed with what it loaded.
+    assert calls == {"verify_and_access_phylo_tree": 1, "get_identifier_map": 1}
+
+
 async def test_phylo_tree_no_can_see(
     async_session: AsyncSession,
     http_client: AsyncClient,
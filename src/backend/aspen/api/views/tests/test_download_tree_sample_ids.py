@@ -10,6 +10,8 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from aspen.api.utils.pathogens import get_pathogen_repo_config_for_pathogen
 from aspen.api.views.tests.test_update_phylo_run_and_tree import make_shared_test_data
 from aspen.database.models import Group, PhyloTree, Sample
+from aspen.phylo_tree.node_index import NodeIndexBuilder
+from aspen.phylo_tree.walk import walk_tree
 from aspen.test_infra.models.location import location_factory
 from aspen.test_infra.models.pathogen import random_pathogen_factory
 from aspen.test_infra.models.pathogen_repo_config import (
@@ -210,6 +212,38 @@ async def test_tree_metadata_download(
     )
 
 
+async def test_tree_metadata_download_from_node_index(
+    mock_s3_resource: boto3.resource,
+    async_session: AsyncSession,
+    http_client: AsyncClient,
+    split_client: SplitClient,
+):
+    """
+    Test that trees with a node index don't need to be downloaded from s3
+    """
+    user, group, phylo_tree, samples, pathogen = await create_phylotree(
+        mock_s3_resource, async_session
+    )
+    s3_object = mock_s3_resource.Bucket(phylo_tree.s3_bucket).Object(phylo_tree.s3_key)
+    node_index = NodeIndexBuilder()
+    walk_tree(json.loads(s3_object.get()["Body"].read())["tree"], node_index)
+    phylo_tree.node_index = node_index.to_json()
+    await async_session.commit()
+    s3_object.delete()
+    split_client.get_pathogen_treatment.return_value = "GISAID"
+
+    auth_headers = {"name": user.name, "user_id": user.auth0_user_id}
+    res = await http_client.get(
+        f"/v2/orgs/{group.id}/pathogens/{phylo_tree.pathogen.slug}/phylo_trees/{phylo_tree.entity_id}/sample_ids",
+        headers=auth_headers,
+    )
+    expected_document = "Sample Identifier\tSelected\r\n" "root_identifier_1	no\r\n"
+    for sample in samples:
+        expected_document += f"{sample.private_identifier}	no\r\n"
+    assert res.status_code == 200
+    assert str(res.content, encoding="UTF-8") == expected_document
+
+
 async def create_unique_user(db: AsyncSession, group: Group, username: str):
     user = await userrole_factory(
         db, group, name=username, auth0_user_id=username, email=username
@@ -1,5 +1,8 @@
 import pytest
 from httpx import AsyncClient
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from aspen.test_infra.models.usergroup import group_factory, userrole_factory
 
 pytestmark = pytest.mark.asyncio
 
@@ -8,3 +11,27 @@ async def test_healthcheck(http_client: AsyncClient) -> None:
     response = await http_client.get("/v2/health", follow_redirects=True)
     assert response.status_code == 200
     assert response.json() == {"healthy": True}
+
+
+async def test_db_pool_stats(
+    http_client: AsyncClient, async_session: AsyncSession
+) -> None:
+    group = group_factory()
+    user = await userrole_factory(async_session, group)
+    async_session.add(group)
+    await async_session.commit()
+    # Requests check their connections out of the app's pool, and return them.
+    for _ in range(3):
+        response = await http_client.get(
+            "/v2/users/me", headers={"user_id": user.auth0_user_id}
+        )
+        assert response.status_code == 200
+
+    response = await http_client.get("/v2/health/db_pool")
+    assert response.status_code == 200
+    stats = response.json()
+    assert stats["pool_class"] == "AsyncAdaptedQueuePool"
+    assert stats["size"] == 5
+    assert stats["checked_out"] == 0
+    # The requests' connections are back in the pool, ready for reuse.
+    assert stats["checked_in"] >= 1
@@ -3,6 +3,7 @@ from typing import Collection, Tuple
 import pytest
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from aspen.api.utils.etags import fingerprint_cache
 from aspen.database.models import Group, Pathogen, PathogenLineage, User
 from aspen.test_infra.models.pathogen import pathogen_factory, random_pathogen_factory
 from aspen.test_infra.models.usergroup import group_factory, userrole_factory
@@ -57,3 +58,41 @@ async def test_pango_lineages_list(
     expected = ["Delta", "F*", "F.1", "G.1*", "G.1.1", "H.2.3*", "H.2.3.4", "Omicron"]
 
     assert results == expected
+
+
+async def test_pango_lineages_not_modified(
+    async_session,
+    http_client,
+):
+    group: Group = group_factory()
+    user: User = await userrole_factory(async_session, group)
+    sc2, _, _, _ = make_all_test_data(async_session)
+
+    async_session.add(group)
+    await async_session.commit()
+
+    auth_headers = {"user_id": str(user.auth0_user_id)}
+    fingerprint_cache.clear()
+    res = await http_client.get("/v2/lineages/pango", headers=auth_headers)
+    etag = res.headers["ETag"]
+
+    hits = fingerprint_cache.hits
+    res = await http_client.get(
+        "/v2/lineages/pango", headers={**auth_headers, "If-None-Match": etag}
+    )
+    assert res.status_code == 304
+    assert res.headers["ETag"] == etag
+    assert res.content == b""
+    # We didn't read the lineages table again to find that out.
+    assert fingerprint_cache.hits == hits + 1
+
+    # New lineages mean a new list, once the cached fingerprint expires.
+    async_session.add(PathogenLineage(pathogen=sc2, lineage="L.1"))
+    await async_session.commit()
+    fingerprint_cache.clear()
+    res = await http_client.get(
+        "/v2/lineages/pango", headers={**auth_headers, "If-None-Match": etag}
+    )
+    assert res.status_code == 200
+    assert res.headers["ETag"] != etag
+    assert "L.1" in res.json()["lineages"]
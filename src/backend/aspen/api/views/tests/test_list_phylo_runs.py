@@ -1,3 +1,4 @@
+import json
 import random
 from typing import Collection, Sequence, Tuple
 
@@ -176,6 +177,40 @@ async def test_phylo_tree_view(
     await check_results(http_client, user, group, pathogen, trees)
 
 
+async def test_phylo_runs_ndjson(
+    async_session,
+    http_client,
+    n_samples=5,
+    n_trees=3,
+):
+    group: Group = group_factory()
+    user: User = await userrole_factory(async_session, group)
+    location: Location = location_factory(
+        "North America", "USA", "California", "Santa Barbara County"
+    )
+    pathogen, _, _, _, _ = make_all_test_data(
+        async_session, group, user, location, n_samples, n_trees
+    )
+
+    async_session.add(group)
+    await async_session.commit()
+
+    url = f"/v2/orgs/{group.id}/pathogens/{pathogen.slug}/phylo_runs/"
+    auth_headers = {"user_id": str(user.auth0_user_id)}
+    res = await http_client.get(url, headers=auth_headers)
+    expected = res.json()["phylo_runs"]
+
+    res = await http_client.get(
+        url, headers={**auth_headers, "Accept": "application/x-ndjson"}
+    )
+    assert res.status_code == 200
+    assert res.headers["content-type"] == "application/x-ndjson"
+    streamed = [json.loads(line) for line in res.text.splitlines()]
+    assert sorted(streamed, key=lambda run: run["id"]) == sorted(
+        expected, key=lambda run: run["id"]
+    )
+
+
 async def test_in_progress_and_failed_trees(
     async_session,
     http_client,
@@ -4,6 +4,7 @@ import pytest
 from httpx import AsyncClient
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from aspen.api.utils.etags import fingerprint_cache
 from aspen.test_infra.models.location import location_factory
 from aspen.test_infra.models.usergroup import user_factory
 
@@ -110,3 +111,40 @@ async def test_list_locations_with_depth(
     await check_response("division", regions + countries + divisions)
     await check_response("country", regions + countries)
     await check_response("region", regions)
+
+
+async def test_list_locations_not_modified(
+    async_session: AsyncSession,
+    http_client: AsyncClient,
+):
+    async_session.add(location_factory("North America", "USA", "California", None))
+    user = user_factory(None)
+    async_session.add(user)
+    await async_session.commit()
+
+    auth_headers = {"user_id": user.auth0_user_id}
+    fingerprint_cache.clear()
+    response_obj = await http_client.get("/v2/locations/", headers=auth_headers)
+    etag = response_obj.headers["ETag"]
+
+    response_obj = await http_client.get(
+        "/v2/locations/", headers={**auth_headers, "If-None-Match": etag}
+    )
+    assert response_obj.status_code == 304
+
+    # Other depths get their own ETags.
+    response_obj = await http_client.get(
+        "/v2/locations/?max_location_depth=country",
+        headers={**auth_headers, "If-None-Match": etag},
+    )
+    assert response_obj.status_code == 200
+
+    # New locations show up once the cached fingerprint expires.
+    async_session.add(location_factory("North America", "USA", "Oregon", None))
+    await async_session.commit()
+    fingerprint_cache.clear()
+    response_obj = await http_client.get(
+        "/v2/locations/", headers={**auth_headers, "If-None-Match": etag}
+    )
+    assert response_obj.status_code == 200
+    assert len(response_obj.json()["locations"]) == 2
@@ -0,0 +1,289 @@
+import datetime
+from types import SimpleNamespace
+from typing import Any, List
+
+import pytest
+import sqlalchemy as sa
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from aspen.api.utils.job_dispatcher import (
+    batch_pending_jobs,
+    enqueue_ondemand_job,
+    JobDispatcher,
+    merge_sample_ids,
+)
+from aspen.database.connection import SqlAlchemyInterface
+from aspen.database.models import OnDemandJobType, PendingOnDemandJob
+from aspen.test_infra.models.pathogen import random_pathogen_factory
+from aspen.test_infra.models.usergroup import group_factory
+from aspen.util.swipe import LocalStepFunctionsClient
+
+# All test coroutines will be treated as marked.
+pytestmark = pytest.mark.asyncio
+
+SFN_PARAMETERS = {
+    "Input": {"Run": {"docker_image_id": "test"}},
+    "OutputPrefix": "s3://test/ondemand",
+    "RUN_WDL_URI": "s3://test/run.wdl",
+    "RunEC2Memory": 1,
+    "RunEC2Vcpu": 1,
+    "RunSPOTMemory": 1,
+    "RunSPOTVcpu": 1,
+    "StateMachineArn": "arn:aws:states:us-west-2:0:stateMachine:test",
+}
+SETTINGS = SimpleNamespace(
+    AWS_REGION="us-west-2",
+    GENEPI_CONFIG_SECRET_NAME="genepi-config",
+    REMOTE_DEV_PREFIX="",
+    AWS_PANGOLIN_SFN_PARAMETERS=SFN_PARAMETERS,
+    AWS_LINEAGE_QC_SFN_PARAMETERS=SFN_PARAMETERS,
+)
+
+
+class FailingStepFunctionsClient:
+    def start_execution(self, **kwargs):
+        raise RuntimeError("Step Functions is down")
+
+
+def make_dispatcher(
+    interface: SqlAlchemyInterface, sfn_client: Any, window: float = 60, **kwargs
+) -> JobDispatcher:
+    return JobDispatcher(
+        interface,
+        SETTINGS,  # type: ignore
+        window=window,
+        max_delay=600,
+        poll_interval=60,
+        sfn_client=sfn_client,
+        **kwargs,
+    )
+
+
+async def backdate_pending_jobs(db: AsyncSession, seconds: float) -> None:
+    await db.execute(
+        sa.update(PendingOnDemandJob).values(
+            created_at=sa.func.now() - datetime.timedelta(seconds=seconds)
+        )
+    )
+    await db.commit()
+
+
+async def pending_jobs(db: AsyncSession) -> List[PendingOnDemandJob]:
+    # Refresh the rows we queued in this session, the dispatcher changes them.
+    res = await db.execute(
+        sa.select(PendingOnDemandJob).execution_options(  # type: ignore
+            populate_existing=True
+        )
+    )
+    return res.scalars().all()
+
+
+def test_merge_sample_ids():
+    assert merge_sample_ids([[3, 1], [1, 2], [], [3, 4]]) == [3, 1, 2, 4]
+
+
+def test_batch_pending_jobs():
+    rows = [
+        SimpleNamespace(id=1, sample_ids=[1, 2]),
+        SimpleNamespace(id=2, sample_ids=[2, 3]),
+        SimpleNamespace(id=3, sample_ids=[4, 5]),
+        SimpleNamespace(id=4, sample_ids=[6, 7, 8, 9, 10, 11, 12]),
+        SimpleNamespace(id=5, sample_ids=[1]),
+    ]
+    batches = [
+        ([row.id for row in batch_rows], jobs)
+        for batch_rows, jobs in batch_pending_jobs(rows, 3)
+    ]
+    assert batches == [
+        # Repeated ids don't count against the limit.
+        ([1, 2], [[1, 2, 3]]),
+        ([3], [[4, 5]]),
+        # A row that's too big by itself is split across several jobs.
+        ([4], [[6, 7, 8], [9, 10, 11], [12]]),
+        ([5], [[1]]),
+    ]
+
+
+async def test_dispatch_merges_pending_jobs(
+    async_session: AsyncSession,
+    async_sqlalchemy_interface: SqlAlchemyInterface,
+):
+    group = group_factory()
+    pathogen = random_pathogen_factory()
+    async_session.add_all([group, pathogen])
+    await async_session.commit()
+    job_type = OnDemandJobType.LINEAGE_QC
+    enqueue_ondemand_job(async_session, group, pathogen, job_type, [1, 2])
+    enqueue_ondemand_job(async_session, group, pathogen, job_type, [2, 3])
+    enqueue_ondemand_job(
+        async_session, group, pathogen, OnDemandJobType.PANGOLIN, ["a", "b"]
+    )
+    await async_session.commit()
+
+    client = LocalStepFunctionsClient()
+    dispatcher = make_dispatcher(async_sqlalchemy_interface, client)
+    # Nothing's started until the window has passed.
+    assert await dispatcher.dispatch_ready() == 0
+    assert client.executions == []
+
+    await backdate_pending_jobs(async_session, 120)
+    assert await dispatcher.dispatch_ready() == 2
+    runs = sorted(
+        (execution["input"]["Input"]["Run"] for execution in client.executions),
+        key=lambda run: "samples" in run,
+    )
+    assert runs[0]["sample_ids"] == [1, 2, 3]
+    assert runs[0]["pathogen_slug"] == pathogen.slug
+    assert runs[1]["samples"] == ["a", "b"]
+    assert await pending_jobs(async_session) == []
+    await dispatcher.stop()
+
+
+async def test_dispatch_max_delay(
+    async_session: AsyncSession,
+    async_sqlalchemy_interface: SqlAlchemyInterface,
+):
+    group = group_factory()
+    pathogen = random_pathogen_factory()
+    async_session.add_all([group, pathogen])
+    await async_session.commit()
+    job_type = OnDemandJobType.LINEAGE_QC
+    enqueue_ondemand_job(async_session, group, pathogen, job_type, [1])
+    await async_session.commit()
+    await backdate_pending_jobs(async_session, 1200)
+    # Uploads keep coming in, but the oldest has waited long enough.
+    enqueue_ondemand_job(async_session, group, pathogen, job_type, [2])
+    await async_session.commit()
+
+    client = LocalStepFunctionsClient()
+    dispatcher = make_dispatcher(async_sqlalchemy_interface, client)
+    assert await dispatcher.dispatch_ready() == 1
+    assert len(client.executions) == 1
+    assert client.executions[0]["input"]["Input"]["Run"]["sample_ids"] == [1, 2]
+    await dispatcher.stop()
+
+
+async def test_dispatch_keeps_jobs_that_fail_to_start(
+    async_session: AsyncSession,
+    async_sqlalchemy_interface: SqlAlchemyInterface,
+):
+    group = group_factory()
+    pathogen = random_pathogen_factory()
+    async_session.add_all([group, pathogen])
+    await async_session.commit()
+    enqueue_ondemand_job(
+        async_session, group, pathogen, OnDemandJobType.LINEAGE_QC, [1, 2]
+    )
+    await async_session.commit()
+
+    dispatcher = make_dispatcher(
+        async_sqlalchemy_interface,
+        FailingStepFunctionsClient(),
+        window=0,
+        retry_delay=0,
+    )
+    assert await dispatcher.dispatch_ready() == 0
+    [pending] = await pending_jobs(async_session)
+    assert pending.attempts == 1
+    await dispatcher.stop()
+
+    # They're picked up again on a later pass.
+    client = LocalStepFunctionsClient()
+    dispatcher = make_dispatcher(async_sqlalchemy_interface, client, window=0)
+    assert await dispatcher.dispatch_ready() == 1
+    assert client.executions[0]["input"]["Input"]["Run"]["sample_ids"] == [1, 2]
+    assert await pending_jobs(async_session) == []
+    await dispatcher.stop()
+
+
+async def test_dispatch_splits_big_backlogs(
+    async_session: AsyncSession,
+    async_sqlalchemy_interface: SqlAlchemyInterface,
+):
+    group = group_factory()
+    pathogen = random_pathogen_factory()
+    async_session.add_all([group, pathogen])
+    await async_session.commit()
+    job_type = OnDemandJobType.LINEAGE_QC
+    enqueue_ondemand_job(async_session, group, pathogen, job_type, [1, 2])
+    enqueue_ondemand_job(async_session, group, pathogen, job_type, [3, 4, 5])
+    await async_session.commit()
+
+    client = LocalStepFunctionsClient()
+    dispatcher = make_dispatcher(
+        async_sqlalchemy_interface, client, window=0, max_samples=3
+    )
+    assert await dispatcher.dispatch_ready() == 2
+    assert [
+        execution["input"]["Input"]["Run"]["sample_ids"]
+        for execution in client.executions
+    ] == [[1, 2], [3, 4, 5]]
+    assert await pending_jobs(async_session) == []
+    await dispatcher.stop()
+
+
+async def test_dispatch_backs_off_failed_jobs(
+    async_session: AsyncSession,
+    async_sqlalchemy_interface: SqlAlchemyInterface,
+):
+    group = group_factory()
+    pathogen = random_pathogen_factory()
+    async_session.add_all([group, pathogen])
+    await async_session.commit()
+    job_type = OnDemandJobType.LINEAGE_QC
+    enqueue_ondemand_job(async_session, group, pathogen, job_type, [1, 2])
+    await async_session.commit()
+
+    dispatcher = make_dispatcher(
+        async_sqlalchemy_interface, FailingStepFunctionsClient(), window=0
+    )
+    assert await dispatcher.dispatch_ready() == 0
+    await dispatcher.stop()
+
+    # The failed samples wait out their retry delay, and don't hold up samples
+    # uploaded since.
+    enqueue_ondemand_job(async_session, group, pathogen, job_type, [3])
+    await async_session.commit()
+    client = LocalStepFunctionsClient()
+    dispatcher = make_dispatcher(async_sqlalchemy_interface, client, window=0)
+    assert await dispatcher.dispatch_ready() == 1
+    assert client.executions[0]["input"]["Input"]["Run"]["sample_ids"] == [3]
+    [pending] = await pending_jobs(async_session)
+    assert pending.sample_ids == [1, 2]
+    assert pending.retry_at is not None
+    await dispatcher.stop()
+
+
+async def test_dispatch_sets_aside_failing_jobs(
+    async_session: AsyncSession,
+    async_sqlalchemy_interface: SqlAlchemyInterface,
+):
+    group = group_factory()
+    pathogen = random_pathogen_factory()
+    async_session.add_all([group, pathogen])
+    await async_session.commit()
+    enqueue_ondemand_job(
+        async_session, group, pathogen, OnDemandJobType.LINEAGE_QC, [1, 2]
+    )
+    await async_session.commit()
+
+    dispatcher = make_dispatcher(
+        async_sqlalchemy_interface,
+        FailingStepFunctionsClient(),
+        window=0,
+        retry_delay=0,
+        max_attempts=2,
+    )
+    for _ in range(3):
+        assert await dispatcher.dispatch_ready() == 0
+    await dispatcher.stop()
+
+    [pending] = await pending_jobs(async_session)
+    assert pending.attempts == 2
+    assert pending.failed_at is not None
+    # Set aside for good, even once Step Functions works again.
+    client = LocalStepFunctionsClient()
+    dispatcher = make_dispatcher(async_sqlalchemy_interface, client, window=0)
+    assert await dispatcher.dispatch_ready() == 0
+    assert client.executions == []
+    await dispatcher.stop()
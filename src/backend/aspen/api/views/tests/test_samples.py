@@ -400,6 +400,129 @@ async def test_samples_list_no_qc_status(
     assert res.text == '{"error":"Invalid pathogen slug"}'
 
 
+async def test_samples_list_ndjson(
+    async_session: AsyncSession,
+    http_client: AsyncClient,
+):
+    group = group_factory()
+    user = await userrole_factory(async_session, group)
+    location = location_factory(
+        "North America", "USA", "California", "Santa Barbara County"
+    )
+    sc2 = pathogen_factory("SC2", "SARS-Cov-2")
+    for i in range(3):
+        sample = sample_factory(
+            group,
+            user,
+            location,
+            private_identifier=f"private{i}",
+            public_identifier=f"public{i}",
+            pathogen=sc2,
+        )
+        uploaded_pathogen_genome_factory(sample)
+        sample_qc_metrics_factory(sample)
+        sample_lineage_factory(sample)
+    async_session.add(group)
+    await async_session.commit()
+
+    url = f"/v2/orgs/{group.id}/pathogens/SC2/samples/"
+    auth_headers = {"user_id": user.auth0_user_id}
+    res = await http_client.get(url, headers=auth_headers)
+    expected = res.json()["samples"]
+
+    # Each line of the streamed response is the same as one element of the
+    # regular response.
+    res = await http_client.get(
+        url, headers={**auth_headers, "Accept": "application/x-ndjson"}
+    )
+    assert res.status_code == 200
+    assert res.headers["content-type"] == "application/x-ndjson"
+    streamed = [json.loads(line) for line in res.text.splitlines()]
+    assert len(streamed) == 3
+    assert sorted(streamed, key=lambda sample: sample["id"]) == sorted(
+        expected, key=lambda sample: sample["id"]
+    )
+
+
+async def test_samples_page(
+    async_session: AsyncSession,
+    http_client: AsyncClient,
+):
+    group = group_factory()
+    user = await userrole_factory(async_session, group)
+    location = location_factory(
+        "North America", "USA", "California", "Santa Barbara County"
+    )
+    sc2 = pathogen_factory("SC2", "SARS-Cov-2")
+    samples: List[Sample] = []
+    for i in range(5):
+        sample = sample_factory(
+            group,
+            user,
+            location,
+            private_identifier=f"private{i}",
+            public_identifier=f"public{i}",
+            collection_date=datetime.date(2022, 1, 5 - i),
+            pathogen=sc2,
+        )
+        uploaded_pathogen_genome_factory(sample)
+        sample_qc_metrics_factory(sample, qc_status="good" if i % 2 else "bad")
+        sample_lineage_factory(sample, lineage=f"B.1.{i}")
+        samples.append(sample)
+    async_session.add(group)
+    await async_session.commit()
+
+    auth_headers = {"user_id": user.auth0_user_id}
+    url = f"/v2/orgs/{group.id}/pathogens/SC2/samples/page"
+
+    # Page through every sample, oldest collection date first.
+    seen: List[int] = []
+    cursor = None
+    pages = 0
+    while True:
+        params: Any = {"limit": 2, "sort_by": "collection_date"}
+        if cursor:
+            params["cursor"] = cursor
+        res = await http_client.get(url, headers=auth_headers, params=params)
+        assert res.status_code == 200
+        page = res.json()
+        seen.extend(sample["id"] for sample in page["samples"])
+        pages += 1
+        cursor = page["next_cursor"]
+        if not cursor:
+            break
+    assert pages == 3
+    assert seen == [sample.id for sample in reversed(samples)]
+
+    # Filters and field projection.
+    res = await http_client.get(
+        url,
+        headers=auth_headers,
+        params={
+            "qc_status": "good",
+            "sort_by": "lineage",
+            "sort_direction": "desc",
+            "fields": "public_identifier,lineages",
+        },
+    )
+    assert res.status_code == 200
+    page = res.json()
+    assert page["next_cursor"] is None
+    assert [sample["public_identifier"] for sample in page["samples"]] == [
+        "public3",
+        "public1",
+    ]
+    assert set(page["samples"][0].keys()) == {"id", "public_identifier", "lineages"}
+    assert page["samples"][0]["lineages"][0]["lineage"] == "B.1.3"
+
+    res = await http_client.get(
+        url, headers=auth_headers, params={"fields": "not_a_field"}
+    )
+    assert res.status_code == 400
+    res = await http_client.get(url, headers=auth_headers, params={"cursor": "garbage"})
+    assert res.status_code == 400
+
+
 async def test_samples_view_gisaid_rejected(
     async_session: AsyncSession,
     http_client: AsyncClient,
@@ -1,11 +1,15 @@
 import re
+import time
 from typing import TypedDict
 
 import pytest
+from fastapi import FastAPI
 from httpx import AsyncClient
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from aspen.api.utils.fasta_uploads import fasta_upload_key, FASTA_UPLOAD_TIMEOUT
 from aspen.api.views.sequences import get_fasta_filename
+from aspen.aws import s3_gateway
 from aspen.database.models import Sample
 from aspen.test_infra.models.location import location_factory
 from aspen.test_infra.models.pathogen import random_pathogen_factory
@@ -87,6 +91,43 @@ async def test_prepare_sequences_download_gisaid(
     assert sample.private_identifier in file_contents
 
 
+async def test_prepare_sequences_download_gzip(
+    async_session: AsyncSession,
+    http_client: AsyncClient,
+    split_client: SplitClient,
+):
+    """
+    Test that sequence downloads are gzipped for clients that accept it, and only for them
+    """
+    group, user, sample, pathogen = await setup_sequences_download_test_data(
+        async_session, split_client
+    )
+
+    auth_headers = {"name": user.name, "user_id": user.auth0_user_id}
+    data = {
+        "sample_ids": [sample.public_identifier],
+    }
+    url = f"/v2/orgs/{group.id}/pathogens/{pathogen.slug}/sequences/"
+    res = await http_client.post(
+        url, headers={**auth_headers, "Accept-Encoding": "gzip"}, json=data
+    )
+    assert res.status_code == 200
+    assert res.headers["Content-Encoding"] == "gzip"
+    # httpx decompresses the response for us.
+    file_contents = str(res.content, encoding="UTF-8")
+    assert file_contents == (
+        f">{sample.private_identifier}\n"
+        f"{sample.uploaded_pathogen_genome.sequence}\n"
+    )
+
+    res = await http_client.post(
+        url, headers={**auth_headers, "Accept-Encoding": "identity"}, json=data
+    )
+    assert res.status_code == 200
+    assert "Content-Encoding" not in res.headers
+    assert str(res.content, encoding="UTF-8") == file_contents
+
+
 async def test_prepare_sequences_download_genbank(
     async_session: AsyncSession,
     http_client: AsyncClient,
@@ -512,3 +553,103 @@ async def test_getfastaurl_usher(
             file[0] == f">{re.sub(USHER_UNSAFE_CHARS, '_', sample.private_identifier)}"
         )
         assert file[1] == sample.uploaded_pathogen_genome.sequence
+
+
+async def test_getfastaurl_background(
+    async_session: AsyncSession,
+    http_client: AsyncClient,
+    split_client: SplitClient,
+):
+    """
+    Test that background uploads can be polled for, and that identical requests reuse the same file
+    """
+
+    group, user, sample, pathogen = await setup_sequences_download_test_data(
+        async_session, split_client
+    )
+
+    auth_headers = {"name": user.name, "user_id": user.auth0_user_id}
+    data = {
+        "samples": [sample.public_identifier],
+        "background": True,
+    }
+    base_url = f"/v2/orgs/{group.id}/pathogens/{pathogen.slug}/sequences/getfastaurl"
+    res = await http_client.post(base_url, headers=auth_headers, json=data)
+    assert res.status_code == 200
+    res_json = res.json()
+    assert res_json["status"] in ("pending", "ready")
+    upload_id = res_json["upload_id"]
+
+    # The test client waits for background tasks, so the upload is done by now.
+    res = await http_client.get(f"{base_url}/{upload_id}", headers=auth_headers)
+    assert res.status_code == 200
+    res_json = res.json()
+    assert res_json["status"] == "ready"
+    assert res_json["upload_id"] == upload_id
+
+    async with AsyncClient() as http_external:
+        s3_res = await http_external.get(res_json["url"])
+        assert s3_res.status_code == 200
+        file = str(s3_res.content, "utf-8").split("\n")
+        assert file[0] == f">{sample.private_identifier}"
+        assert file[1] == sample.uploaded_pathogen_genome.sequence
+
+    # Asking again reuses the existing file.
+    res = await http_client.post(
+        base_url, headers=auth_headers, json={"samples": [sample.public_identifier]}
+    )
+    assert res.status_code == 200
+    assert res.json()["status"] == "ready"
+    assert res.json()["upload_id"] == upload_id
+
+    # Files for other consumers are written separately.
+    data["downstream_consumer"] = "USHER"
+    res = await http_client.post(base_url, headers=auth_headers, json=data)
+    assert res.status_code == 200
+    assert res.json()["upload_id"] != upload_id
+
+    res = await http_client.get(f"{base_url}/not-an-upload-id", headers=auth_headers)
+    assert res.status_code == 400
+
+
+async def test_getfastaurl_background_pending_elsewhere(
+    async_session: AsyncSession,
+    api: FastAPI,
+    http_client: AsyncClient,
+    split_client: SplitClient,
+):
+    """
+    Test that uploads another worker is writing aren't started again, unless that worker seems to have died
+    """
+
+    group, user, sample, pathogen = await setup_sequences_download_test_data(
+        async_session, split_client
+    )
+
+    auth_headers = {"name": user.name, "user_id": user.auth0_user_id}
+    data = {"samples": [sample.public_identifier], "background": True}
+    base_url = f"/v2/orgs/{group.id}/pathogens/{pathogen.slug}/sequences/getfastaurl"
+    res = await http_client.post(base_url, headers=auth_headers, json=data)
+    upload_id = res.json()["upload_id"]
+    bucket = api.state.aspen_settings.EXTERNAL_AUSPICE_BUCKET
+    key = fasta_upload_key(group.name, upload_id)
+    gateway = s3_gateway()
+
+    # Pretend the file is still being written by some other worker.
+    await gateway.delete_object(bucket, key)
+    await gateway.put_object(bucket, f"{key}.pending", str(time.time()).encode())
+    res = await http_client.post(base_url, headers=auth_headers, json=data)
+    assert res.json()["status"] == "pending"
+    res = await http_client.get(f"{base_url}/{upload_id}", headers=auth_headers)
+    assert res.json()["status"] == "pending"
+
+    # That worker has taken far too long, so it must have died.
+    started_at = time.time() - FASTA_UPLOAD_TIMEOUT - 1
+    await gateway.put_object(bucket, f"{key}.pending", str(started_at).encode())
+    res = await http_client.get(f"{base_url}/{upload_id}", headers=auth_headers)
+    assert res.json()["status"] == "failed"
+    # Asking again starts it over.
+    res = await http_client.post(base_url, headers=auth_headers, json=data)
+    assert res.json()["status"] == "pending"
+    res = await http_client.get(f"{base_url}/{upload_id}", headers=auth_headers)
+    assert res.json()["status"] == "ready"
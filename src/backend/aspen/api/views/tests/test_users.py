@@ -8,6 +8,8 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from aspen.api.views.tests.data.auth0_mock_responses import DEFAULT_AUTH0_USER
 from aspen.auth.auth0_management import Auth0Client
+from aspen.auth.context_cache import bump_auth_version, configure_auth_context_cache
+from aspen.auth.role_manager import RoleManager
 from aspen.database.models import User
 from aspen.test_infra.models.usergroup import group_factory, userrole_factory
 
@@ -42,6 +44,40 @@ async def test_users_me(http_client: AsyncClient, async_session: AsyncSession) -
     assert len(resp_data["analytics_id"]) == 20
 
 
+async def test_users_me_cached_roles(
+    http_client: AsyncClient, async_session: AsyncSession
+) -> None:
+    group = group_factory()
+    other_group = group_factory(name="othergroup")
+    user = await userrole_factory(async_session, group)
+    async_session.add_all([group, other_group])
+    await async_session.commit()
+
+    cache = configure_auth_context_cache(maxsize=16, ttl=600)
+    try:
+        headers = {"user_id": user.auth0_user_id}
+        response = await http_client.get("/v2/users/me", headers=headers)
+        assert [row["id"] for row in response.json()["groups"]] == [group.id]
+        response = await http_client.get("/v2/users/me", headers=headers)
+        assert cache.hits > 0
+
+        # Another process (eg, the sync_auth0 cli) adds the user to a group.
+        async_session.add(
+            await RoleManager.generate_user_role(
+                async_session, user, other_group, "member"
+            )
+        )
+        await async_session.execute(bump_auth_version(user.id))
+        await async_session.commit()
+
+        response = await http_client.get("/v2/users/me", headers=headers)
+        assert sorted(row["id"] for row in response.json()["groups"]) == sorted(
+            [group.id, other_group.id]
+        )
+    finally:
+        configure_auth_context_cache(maxsize=1024, ttl=0)
+
+
 async def test_users_view_put_pass(
     auth0_apiclient: Auth0Client,
     http_client: AsyncClient,
@@ -16,6 +16,7 @@ from aspen.api.schemas.usergroup import (
     UserUpdateRequest,
 )
 from aspen.auth.auth0_management import Auth0Client
+from aspen.auth.context_cache import bump_auth_version
 from aspen.database.models import User
 
 router = APIRouter()
@@ -57,6 +58,7 @@ async def update_user_info(
             if attribute in auth0_attributes:
                 auth0_update_items[attribute] = value
 
+    await db.execute(bump_auth_version(user.id))
     await db.commit()
 
     if user.auth0_user_id and len(auth0_update_items) > 0:
@@ -0,0 +1,111 @@
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Optional
+from typing import OrderedDict as OrderedDictType
+from typing import Tuple
+
+import sqlalchemy as sa
+
+from aspen.database.models import User
+
+CacheEntries = OrderedDictType[Tuple[str, Optional[int]], Tuple[float, int, bytes]]
+
+
+class AuthContextCache:
+    """A small in-process LRU cache with a TTL for resolved auth state.
+
+    Authenticating a request costs a few joined queries (user + user roles, and
+    then the roles granted to the user's group) before any endpoint work starts.
+    This keeps the results around for a short while, keyed by
+    (auth0 user id, group id).
+
+    Values are stored as detached, pickled snapshots, so a cached ORM object is
+    never shared between two requests' db sessions. Callers are expected to
+    `merge(..., load=False)` anything they pull out of here into their own
+    session.
+
+    Every entry is stamped with the user's `auth_version` at the time it was
+    loaded, and is only returned for that same version. Anything that changes a
+    user's memberships or roles bumps it (see bump_auth_version), which makes
+    the user's entries stale in every API process at once. Changes to
+    GroupRoles made outside the API need to bump the versions of the grantee
+    group's members the same way, or wait out the TTL.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        # (auth0 user id, group id) -> (expiry, auth_version, snapshot)
+        self._entries: CacheEntries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0 and self.maxsize > 0
+
+    def get(
+        self,
+        auth0_user_id: str,
+        group_id: Optional[int],
+        auth_version: Optional[int],
+    ) -> Any:
+        if not self.enabled:
+            return None
+        key = (auth0_user_id, group_id)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic() or entry[1] != auth_version:
+                self._entries.pop(key, None)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        return pickle.loads(entry[2])
+
+    def set(
+        self,
+        auth0_user_id: str,
+        group_id: Optional[int],
+        auth_version: int,
+        value: Any,
+    ) -> None:
+        if not self.enabled:
+            return
+        key = (auth0_user_id, group_id)
+        snapshot = pickle.dumps(value)
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, auth_version, snapshot)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+def bump_auth_version(user_id: int) -> sa.sql.Update:
+    """An UPDATE that makes everything cached for the user stale, in every
+    process. Run it in the same transaction as the change."""
+    return (
+        sa.update(User)  # type: ignore
+        .where(User.id == user_id)
+        .values(auth_version=User.auth_version + 1)
+        # Nothing reads the new version back in the session that bumped it.
+        .execution_options(synchronize_session=False)
+    )
+
+
+# Disabled until the API configures it at startup.
+auth_context_cache = AuthContextCache()
+
+
+def configure_auth_context_cache(maxsize: int, ttl: float) -> AuthContextCache:
+    auth_context_cache.maxsize = maxsize
+    auth_context_cache.ttl = ttl
+    auth_context_cache.clear()
+    return auth_context_cache
@@ -1,4 +1,6 @@
+import threading
 import time
+from typing import Dict, Tuple
 
 import requests
 from auth0.v3.authentication.token_verifier import (
@@ -8,19 +10,33 @@ from auth0.v3.authentication.token_verifier import (
 )
 from auth0.v3.exceptions import TokenValidationError
 
+# How long we keep a verifier (and the JWKS it has fetched) around before
+# rebuilding it from scratch.
+VERIFIER_CACHE_TTL = 3600
+# A token with a `kid` we haven't seen forces a JWKS refetch, in case auth0 has
+# rotated its signing keys. Don't let a stream of bogus tokens turn that into a
+# request to auth0 for every API call.
+MIN_JWKS_REFRESH_INTERVAL = 30
+
+
+class CachingJwksFetcher(JwksFetcher):
+    def __init__(self, jwks_url, cache_ttl=JwksFetcher.CACHE_TTL, verify=True):
+        super().__init__(jwks_url, cache_ttl)
+        self._verify = verify
+        self._lock = threading.Lock()
 
-class InsecureJwksFetcher(JwksFetcher):
     def _fetch_jwks(self, force=False):
         has_expired = self._cache_date + self._cache_ttl < time.time()
+        if force and self._cache_date + MIN_JWKS_REFRESH_INTERVAL > time.time():
+            force = False
 
         if not force and not has_expired:
             # Return from cache
             self._cache_is_fresh = False
             return self._cache_value
 
-        # Invalidate cache and fetch fresh data
-        self._cache_value = {}
-        response = requests.get(self._jwks_url, verify=False)
+        # Fetch fresh data, but keep serving the old keys if auth0 is unavailable.
+        response = requests.get(self._jwks_url, verify=self._verify)
 
         if response.ok:
             # Update cache
@@ -30,6 +46,59 @@ class InsecureJwksFetcher(JwksFetcher):
             self._cache_date = time.time()
         return self._cache_value
 
+    def get_key(self, key_id):
+        # Verifiers are shared between request threads, so only let one of them
+        # refresh our keys at a time.
+        with self._lock:
+            return super().get_key(key_id)
+
+
+class InsecureJwksFetcher(CachingJwksFetcher):
+    def __init__(self, jwks_url, cache_ttl=JwksFetcher.CACHE_TTL):
+        super().__init__(jwks_url, cache_ttl, verify=False)
+
+
+_verifier_cache: Dict[str, Tuple[float, AsymmetricSignatureVerifier]] = {}
+_verifier_cache_lock = threading.Lock()
+
+
+def get_jwks_config(domain: str) -> Tuple[str, str]:
+    """Returns the (jwks_url, issuer) pair for an auth domain."""
+    # TODO, this should probably be a part of aspen config.
+    if "genepinet.localdev" in domain:
+        return (
+            f"https://{domain}/.well-known/openid-configuration/jwks",
+            f"https://{domain}",
+        )
+    return f"https://{domain}/.well-known/jwks.json", f"https://{domain}/"
+
+
+def get_signature_verifier(domain: str) -> AsymmetricSignatureVerifier:
+    """Returns a cached signature verifier for a domain.
+
+    Each verifier holds on to the JWKS it has fetched, so reusing them means we
+    only hit the network when the keys expire or rotate, instead of on every
+    request that carries a bearer token.
+    """
+    with _verifier_cache_lock:
+        cached = _verifier_cache.get(domain)
+        if cached and cached[0] > time.time():
+            return cached[1]
+        jwks_url, _ = get_jwks_config(domain)
+        # Adapted from https://github.com/auth0/auth0-python#id-token-validation
+        sv = AsymmetricSignatureVerifier(jwks_url)
+        if "genepinet.localdev" in domain:
+            sv._fetcher = InsecureJwksFetcher(jwks_url)
+        else:
+            sv._fetcher = CachingJwksFetcher(jwks_url)
+        _verifier_cache[domain] = (time.time() + VERIFIER_CACHE_TTL, sv)
+        return sv
+
+
+def clear_verifier_cache() -> None:
+    with _verifier_cache_lock:
+        _verifier_cache.clear()
+
 
 def validate_auth_header(auth_header, domain, client_id):
     parts = auth_header.split()
@@ -43,17 +112,8 @@ def validate_auth_header(auth_header, domain, client_id):
 
     id_token = parts[1]
 
-    # TODO, this should probably be a part of aspen config.
-    if "genepinet.localdev" in domain:
-        jwks_url = f"https://{domain}/.well-known/openid-configuration/jwks"
-        issuer = f"https://{domain}"
-        # Adapted from https://github.com/auth0/auth0-python#id-token-validation
-        sv = AsymmetricSignatureVerifier(jwks_url)
-        sv._fetcher = InsecureJwksFetcher(jwks_url)
-    else:
-        jwks_url = f"https://{domain}/.well-known/jwks.json"
-        issuer = f"https://{domain}/"
-        sv = AsymmetricSignatureVerifier(jwks_url)
+    _, issuer = get_jwks_config(domain)
+    sv = get_signature_verifier(domain)
 
     payload = sv.verify_signature(id_token)
     tv = TokenVerifier(signature_verifier=sv, issuer=issuer, audience=client_id)
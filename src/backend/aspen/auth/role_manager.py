@@ -7,6 +7,7 @@ from sqlalchemy.orm import contains_eager
 from sqlalchemy.orm.exc import NoResultFound
 
 from aspen.auth.auth0_management import Auth0Client
+from aspen.auth.context_cache import bump_auth_version
 from aspen.database.models import Group, GroupRole, Role, User, UserRole
 
 
@@ -102,3 +103,6 @@ class RoleManager:
                 )
                 continue
             db.add(await cls.generate_user_role(db, user, db_group, role_name))
+
+        if roles_to_delete or roles_to_add:
+            await db.execute(bump_auth_version(user.id))
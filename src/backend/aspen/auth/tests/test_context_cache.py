@@ -0,0 +1,54 @@
+import time
+
+from aspen.auth.context_cache import AuthContextCache
+
+
+def test_disabled_by_default():
+    cache = AuthContextCache()
+    cache.set("auth0|user", 1, 0, ["admin"])
+    assert cache.get("auth0|user", 1, 0) is None
+
+
+def test_returns_copies():
+    cache = AuthContextCache(ttl=60)
+    roles = [{"group_id": 2, "role": "viewer"}]
+    cache.set("auth0|user", 1, 0, roles)
+    cached = cache.get("auth0|user", 1, 0)
+    assert cached == roles
+    assert cached is not roles
+    assert cache.hits == 1
+
+
+def test_expiry(monkeypatch):
+    cache = AuthContextCache(ttl=60)
+    cache.set("auth0|user", 1, 0, "context")
+    now = time.monotonic()
+    monkeypatch.setattr("aspen.auth.context_cache.time.monotonic", lambda: now + 61)
+    assert cache.get("auth0|user", 1, 0) is None
+    assert cache.misses == 1
+
+
+def test_lru_eviction():
+    cache = AuthContextCache(maxsize=2, ttl=60)
+    cache.set("auth0|a", None, 0, "a")
+    cache.set("auth0|b", None, 0, "b")
+    cache.get("auth0|a", None, 0)
+    cache.set("auth0|c", None, 0, "c")
+    assert cache.get("auth0|a", None, 0) == "a"
+    assert cache.get("auth0|b", None, 0) is None
+    assert cache.get("auth0|c", None, 0) == "c"
+
+
+def test_auth_version():
+    cache = AuthContextCache(ttl=60)
+    cache.set("auth0|a", None, 3, "user a")
+    cache.set("auth0|a", 1, 3, "roles a/1")
+    cache.set("auth0|b", 1, 7, "roles b/1")
+
+    # Once a's roles change (anywhere), their entries are no good.
+    assert cache.get("auth0|a", None, 4) is None
+    assert cache.get("auth0|a", 1, 4) is None
+    assert cache.get("auth0|b", 1, 7) == "roles b/1"
+    # Users that aren't in the db at all never match.
+    cache.set("auth0|c", None, 0, "user c")
+    assert cache.get("auth0|c", None, None) is None
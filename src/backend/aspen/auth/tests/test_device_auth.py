@@ -0,0 +1,111 @@
+import json
+import time
+from typing import Any, Dict, List
+
+import jwt
+import pytest
+from auth0.v3.exceptions import TokenValidationError
+from cryptography.hazmat.primitives.asymmetric import rsa
+
+from aspen.auth import device_auth
+
+DOMAIN = "genepi.example.auth0.com"
+CLIENT_ID = "test-client-id"
+
+
+class JwksStub:
+    """Stands in for auth0's /.well-known/jwks.json endpoint."""
+
+    def __init__(self):
+        self.keys: Dict[str, Any] = {}
+        self.requests: List[str] = []
+
+    def add_key(self, kid: str):
+        private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        self.keys[kid] = private_key
+        return private_key
+
+    def get(self, url, verify=True):
+        self.requests.append(url)
+        jwks = {"keys": []}
+        for kid, private_key in self.keys.items():
+            jwk = json.loads(
+                jwt.algorithms.RSAAlgorithm.to_jwk(private_key.public_key())
+            )
+            jwk.update({"kid": kid, "alg": "RS256", "use": "sig"})
+            jwks["keys"].append(jwk)
+        return JwksResponse(jwks)
+
+    def make_auth_header(self, kid: str, sub: str = "auth0|user") -> str:
+        now = int(time.time())
+        token = jwt.encode(
+            {
+                "iss": f"https://{DOMAIN}/",
+                "sub": sub,
+                "aud": CLIENT_ID,
+                "iat": now,
+                "exp": now + 3600,
+            },
+            self.keys[kid],
+            algorithm="RS256",
+            headers={"kid": kid},
+        )
+        return f"Bearer {token}"
+
+
+class JwksResponse:
+    ok = True
+
+    def __init__(self, jwks):
+        self._jwks = jwks
+
+    def json(self):
+        return self._jwks
+
+
+@pytest.fixture()
+def jwks_stub(monkeypatch) -> JwksStub:
+    stub = JwksStub()
+    monkeypatch.setattr(device_auth.requests, "get", stub.get)
+    device_auth.clear_verifier_cache()
+    yield stub
+    device_auth.clear_verifier_cache()
+
+
+def test_jwks_fetched_once(jwks_stub: JwksStub):
+    jwks_stub.add_key("key1")
+    for _ in range(5):
+        payload = device_auth.validate_auth_header(
+            jwks_stub.make_auth_header("key1"), DOMAIN, CLIENT_ID
+        )
+        assert payload["sub"] == "auth0|user"
+    assert jwks_stub.requests == [f"https://{DOMAIN}/.well-known/jwks.json"]
+
+
+def test_jwks_refetched_on_key_rotation(jwks_stub: JwksStub, monkeypatch):
+    monkeypatch.setattr(device_auth, "MIN_JWKS_REFRESH_INTERVAL", 0)
+    jwks_stub.add_key("key1")
+    device_auth.validate_auth_header(
+        jwks_stub.make_auth_header("key1"), DOMAIN, CLIENT_ID
+    )
+    jwks_stub.add_key("key2")
+    payload = device_auth.validate_auth_header(
+        jwks_stub.make_auth_header("key2", sub="auth0|other"), DOMAIN, CLIENT_ID
+    )
+    assert payload["sub"] == "auth0|other"
+    assert len(jwks_stub.requests) == 2
+
+
+def test_unknown_kid_refresh_is_throttled(jwks_stub: JwksStub):
+    jwks_stub.add_key("key1")
+    device_auth.validate_auth_header(
+        jwks_stub.make_auth_header("key1"), DOMAIN, CLIENT_ID
+    )
+    rogue_stub = JwksStub()
+    rogue_stub.add_key("rogue")
+    for _ in range(3):
+        with pytest.raises(TokenValidationError):
+            device_auth.validate_auth_header(
+                rogue_stub.make_auth_header("rogue"), DOMAIN, CLIENT_ID
+            )
+    assert len(jwks_stub.requests) == 1
@@ -1,2 +1,3 @@
 from aspen.aws._region import region  # noqa: F401
+from aspen.aws._s3_gateway import s3_gateway, S3Gateway  # noqa: F401
 from aspen.aws._session import session  # noqa: F401
@@ -0,0 +1,237 @@
+"""Async access to S3 for the API.
+
+boto3 is blocking, so calling it directly from an `async def` handler stalls the
+event loop (and every other request) for as long as a transfer takes. The
+gateway runs boto3 calls in worker threads instead, and shares one client (and
+so one connection pool) between all requests rather than setting up a new
+resource every time.
+"""
+import asyncio
+import functools
+import os
+import threading
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple, Union
+
+from botocore.config import Config
+
+from aspen.aws._session import session
+
+# boto3's default pool of 10 connections is easy to exhaust with a few tree
+# downloads and fasta uploads running at once.
+MAX_POOL_CONNECTIONS = 50
+# How much we read from S3 at a time when streaming an object.
+STREAM_CHUNK_SIZE = 1024 * 1024
+# S3 wants multipart upload parts to be at least 5MB, except for the last one.
+MIN_PART_SIZE = 5 * 1024 * 1024
+DEFAULT_PART_SIZE = 8 * 1024 * 1024
+
+# (first byte, last byte) to read, inclusive like the HTTP Range header. A last
+# byte of None reads to the end of the object.
+ByteRange = Tuple[int, Optional[int]]
+
+
+def _range_header(byte_range: Optional[ByteRange]) -> Dict[str, str]:
+    if byte_range is None:
+        return {}
+    start, end = byte_range
+    return {"Range": f"bytes={start}-{'' if end is None else end}"}
+
+
+class S3ObjectStream:
+    """The body of an S3 object, read a chunk at a time off the event loop."""
+
+    def __init__(self, response: Dict[str, Any], chunk_size: int):
+        self.etag: str = response["ETag"]
+        self.content_length: int = response["ContentLength"]
+        self.content_encoding: Optional[str] = response.get("ContentEncoding")
+        self._body = response["Body"]
+        self._chunk_size = chunk_size
+
+    async def iter_chunks(self) -> AsyncIterator[bytes]:
+        try:
+            while True:
+                chunk = await asyncio.to_thread(self._body.read, self._chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+        finally:
+            self._body.close()
+
+    async def read(self) -> bytes:
+        return b"".join([chunk async for chunk in self.iter_chunks()])
+
+
+class S3MultipartWriter:
+    """Writes an S3 object in parts as data comes in, without blocking the event
+    loop or holding the whole object in memory.
+
+    Use it as an async context manager. The object is only created if the block
+    exits cleanly, otherwise the upload is aborted.
+    """
+
+    def __init__(self, gateway: "S3Gateway", bucket: str, key: str, part_size: int):
+        if part_size < MIN_PART_SIZE:
+            raise ValueError(f"part_size must be at least {MIN_PART_SIZE} bytes")
+        self.gateway = gateway
+        self.bucket = bucket
+        self.key = key
+        self.part_size = part_size
+        self.bytes_written = 0
+        self._buffer: List[bytes] = []
+        self._buffered = 0
+        self._upload_id: Optional[str] = None
+        self._parts: List[Dict[str, Any]] = []
+
+    async def __aenter__(self) -> "S3MultipartWriter":
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            await self.close()
+        else:
+            await self.abort()
+
+    async def write(self, data: Union[str, bytes]) -> None:
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        self._buffer.append(data)
+        self._buffered += len(data)
+        self.bytes_written += len(data)
+        if self._buffered >= self.part_size:
+            await self._upload_part()
+
+    async def close(self) -> None:
+        if self._upload_id is None:
+            # Small enough for a single request.
+            await self.gateway.put_object(self.bucket, self.key, self._take_buffer())
+            return
+        if self._buffered:
+            await self._upload_part()
+        await self.gateway._call(
+            "complete_multipart_upload",
+            Bucket=self.bucket,
+            Key=self.key,
+            UploadId=self._upload_id,
+            MultipartUpload={"Parts": self._parts},
+        )
+
+    async def abort(self) -> None:
+        self._take_buffer()
+        if self._upload_id is not None:
+            await self.gateway._call(
+                "abort_multipart_upload",
+                Bucket=self.bucket,
+                Key=self.key,
+                UploadId=self._upload_id,
+            )
+
+    def _take_buffer(self) -> bytes:
+        data = b"".join(self._buffer)
+        self._buffer = []
+        self._buffered = 0
+        return data
+
+    async def _upload_part(self) -> None:
+        if self._upload_id is None:
+            response = await self.gateway._call(
+                "create_multipart_upload", Bucket=self.bucket, Key=self.key
+            )
+            self._upload_id = response["UploadId"]
+        part_number = len(self._parts) + 1
+        response = await self.gateway._call(
+            "upload_part",
+            Bucket=self.bucket,
+            Key=self.key,
+            UploadId=self._upload_id,
+            PartNumber=part_number,
+            Body=self._take_buffer(),
+        )
+        self._parts.append({"ETag": response["ETag"], "PartNumber": part_number})
+
+
+class S3Gateway:
+    """Runs S3 calls in worker threads, sharing one pooled boto3 client."""
+
+    def __init__(self, client=None):
+        self._client = client
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        # boto3 clients are thread safe once they exist, but creating them is not.
+        with self._lock:
+            if self._client is None:
+                self._client = session().client(
+                    "s3",
+                    endpoint_url=os.getenv("BOTO_ENDPOINT_URL") or None,
+                    config=Config(
+                        signature_version="s3v4",
+                        max_pool_connections=MAX_POOL_CONNECTIONS,
+                    ),
+                )
+            return self._client
+
+    async def _call(self, operation: str, **kwargs) -> Dict[str, Any]:
+        method = getattr(self.client, operation)
+        return await asyncio.to_thread(functools.partial(method, **kwargs))
+
+    async def head_object(self, bucket: str, key: str) -> Dict[str, Any]:
+        return await self._call("head_object", Bucket=bucket, Key=key)
+
+    async def get_object(
+        self, bucket: str, key: str, byte_range: Optional[ByteRange] = None
+    ) -> Dict[str, Any]:
+        """Like the client's get_object, but with the body already read."""
+
+        def get() -> Dict[str, Any]:
+            response = self.client.get_object(
+                Bucket=bucket, Key=key, **_range_header(byte_range)
+            )
+            with response["Body"] as body:
+                response["Body"] = body.read()
+            return response
+
+        return await asyncio.to_thread(get)
+
+    async def open_object(
+        self,
+        bucket: str,
+        key: str,
+        byte_range: Optional[ByteRange] = None,
+        chunk_size: int = STREAM_CHUNK_SIZE,
+    ) -> S3ObjectStream:
+        response = await self._call(
+            "get_object", Bucket=bucket, Key=key, **_range_header(byte_range)
+        )
+        return S3ObjectStream(response, chunk_size)
+
+    async def put_object(self, bucket: str, key: str, body: bytes, **kwargs) -> None:
+        await self._call("put_object", Bucket=bucket, Key=key, Body=body, **kwargs)
+
+    async def delete_object(self, bucket: str, key: str) -> None:
+        await self._call("delete_object", Bucket=bucket, Key=key)
+
+    def writer(
+        self, bucket: str, key: str, part_size: int = DEFAULT_PART_SIZE
+    ) -> S3MultipartWriter:
+        return S3MultipartWriter(self, bucket, key, part_size)
+
+    def generate_presigned_url(
+        self, bucket: str, key: str, expires_in: int = 3600
+    ) -> str:
+        # Presigning is local, no need for a thread.
+        return self.client.generate_presigned_url(
+            "get_object", Params={"Bucket": bucket, "Key": key}, ExpiresIn=expires_in
+        )
+
+
+_s3_gateway: Optional[S3Gateway] = None
+
+
+def s3_gateway() -> S3Gateway:
+    global _s3_gateway
+
+    if _s3_gateway is None:
+        _s3_gateway = S3Gateway()
+
+    return _s3_gateway
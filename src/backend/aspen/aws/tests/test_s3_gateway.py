@@ -0,0 +1,75 @@
+import uuid
+
+import boto3
+import pytest
+from botocore.client import ClientError
+
+from aspen.aws import S3Gateway
+
+# All test coroutines will be treated as marked.
+pytestmark = pytest.mark.asyncio
+
+BUCKET = "test-s3-gateway"
+
+
+def create_bucket(mock_s3_resource: boto3.resource):
+    # Create the bucket if it doesn't exist in localstack.
+    try:
+        mock_s3_resource.meta.client.head_bucket(Bucket=BUCKET)
+    except ClientError:
+        mock_s3_resource.create_bucket(Bucket=BUCKET)
+
+
+async def test_reads(mock_s3_resource: boto3.resource):
+    create_bucket(mock_s3_resource)
+    key = uuid.uuid4().hex
+    body = b"".join(f"line {i}\n".encode() for i in range(10000))
+    mock_s3_resource.Bucket(BUCKET).Object(key).put(Body=body)
+    s3 = S3Gateway()
+
+    head = await s3.head_object(BUCKET, key)
+    response = await s3.get_object(BUCKET, key)
+    assert response["Body"] == body
+    assert response["ETag"] == head["ETag"]
+
+    response = await s3.get_object(BUCKET, key, byte_range=(5, 9))
+    assert response["Body"] == body[5:10]
+
+    s3_stream = await s3.open_object(BUCKET, key, byte_range=(100, None), chunk_size=7)
+    assert s3_stream.content_length == len(body) - 100
+    chunks = [chunk async for chunk in s3_stream.iter_chunks()]
+    assert max(len(chunk) for chunk in chunks) == 7
+    assert b"".join(chunks) == body[100:]
+
+
+async def test_writes(mock_s3_resource: boto3.resource):
+    create_bucket(mock_s3_resource)
+    s3 = S3Gateway()
+    part_size = 5 * 1024 * 1024
+    line = "ACTG" * 1000 + "\n"
+
+    # Small objects are written with a single put.
+    small_key = uuid.uuid4().hex
+    async with s3.writer(BUCKET, small_key, part_size) as writer:
+        await writer.write(line)
+    assert (await s3.get_object(BUCKET, small_key))["Body"] == line.encode()
+
+    # Bigger ones are uploaded in parts.
+    big_key = uuid.uuid4().hex
+    lines = (part_size * 2) // len(line) + 10
+    async with s3.writer(BUCKET, big_key, part_size) as writer:
+        for _ in range(lines):
+            await writer.write(line)
+    assert len(writer._parts) == 3
+    response = await s3.get_object(BUCKET, big_key)
+    assert response["Body"] == line.encode() * lines
+
+    # Nothing gets written if we fail partway through.
+    failed_key = uuid.uuid4().hex
+    with pytest.raises(RuntimeError):
+        async with s3.writer(BUCKET, failed_key, part_size) as writer:
+            for _ in range(lines):
+                await writer.write(line)
+            raise RuntimeError("oops")
+    with pytest.raises(ClientError):
+        await s3.head_object(BUCKET, failed_key)
@@ -11,6 +11,7 @@ from sqlalchemy.orm import joinedload
 from sqlalchemy.orm.session import Session
 
 from aspen.auth.auth0_management import Auth0Client, Auth0Org, Auth0User
+from aspen.auth.context_cache import bump_auth_version
 from aspen.config.config import Config
 from aspen.database.connection import (
     get_db_uri,
@@ -115,6 +116,9 @@ class RoleManager:
                 self.db.add(
                     UserRole(user=user, role=self.rolemap[role_name], group=db_group)
                 )
+            if (roles_to_delete or roles_to_add) and not self.dry_run:
+                # Tell the API to stop using what it has cached for the user.
+                self.db.execute(bump_auth_version(user.id))
 
 
 class ObjectManager:
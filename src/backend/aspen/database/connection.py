@@ -3,7 +3,7 @@ from __future__ import annotations
 import logging
 import time
 from contextlib import contextmanager
-from typing import Generator, TYPE_CHECKING
+from typing import Any, Dict, Generator, TYPE_CHECKING
 
 from sqlalchemy import event
 from sqlalchemy.engine import create_engine, Engine
@@ -33,13 +33,34 @@ class SqlAlchemyInterface:
         return self._session_maker()
 
 
-def init_async_db(db_uri: str, **kwargs) -> SqlAlchemyInterface:
+def init_async_db(
+    db_uri: str, pool_size: int = 5, max_overflow: int = 5, **kwargs
+) -> SqlAlchemyInterface:
+    kwargs.setdefault("echo", False)
     engine = create_async_engine(
-        db_uri, echo=False, pool_size=5, max_overflow=5, future=True, **kwargs
+        db_uri,
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+        future=True,
+        **kwargs,
     )
     return SqlAlchemyInterface(engine, use_async=True)
 
 
+def get_pool_stats(interface: SqlAlchemyInterface) -> Dict[str, Any]:
+    """Snapshot of the connection pool backing an interface's engine."""
+    engine = interface.engine
+    # Async engines wrap a regular engine, and that's where the pool lives.
+    pool = getattr(engine, "sync_engine", engine).pool
+    return {
+        "pool_class": type(pool).__name__,
+        "size": pool.size(),
+        "checked_in": pool.checkedin(),
+        "checked_out": pool.checkedout(),
+        "overflow": pool.overflow(),
+    }
+
+
 def init_db(db_uri: str) -> SqlAlchemyInterface:
     engine = create_engine(db_uri)
     return SqlAlchemyInterface(engine)
@@ -30,6 +30,10 @@ from aspen.database.models.mutations import (  # noqa: F401
     MutationsCaller,
     SampleMutation,
 )
+from aspen.database.models.ondemand_jobs import (  # noqa: F401
+    OnDemandJobType,
+    PendingOnDemandJob,
+)
 from aspen.database.models.phylo_tree import (  # noqa: F401
     PhyloRun,
     PhyloTree,
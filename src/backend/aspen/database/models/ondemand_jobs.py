@@ -0,0 +1,66 @@
+"""Outbox for the on-demand jobs we run on newly uploaded samples."""
+from __future__ import annotations
+
+import enum
+
+import enumtables
+from sqlalchemy import Column, DateTime, ForeignKey, func, Index, Integer, text
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import relationship
+
+from aspen.database.models.base import base, idbase
+from aspen.database.models.enum import Enum
+from aspen.database.models.pathogens import Pathogen
+from aspen.database.models.usergroup import Group
+
+
+class OnDemandJobType(enum.Enum):
+    PANGOLIN = "PANGOLIN"
+    LINEAGE_QC = "LINEAGE_QC"
+
+
+_OnDemandJobTypeTable = enumtables.EnumTable(
+    OnDemandJobType, base, tablename="ondemand_job_types"
+)
+
+
+class PendingOnDemandJob(idbase):  # type: ignore
+    """Samples waiting on an on-demand job.
+
+    Rows are written in the same transaction as the samples they're for, and
+    deleted once a job covering them has been started. Rows for the same group,
+    pathogen and job type are merged into as few jobs as we can (see
+    aspen.api.utils.job_dispatcher).
+
+    Rows whose job keeps failing to start are set aside with `failed_at`, and
+    are left alone from then on. Clear it to have them tried again.
+    """
+
+    __tablename__ = "pending_ondemand_jobs"
+    __table_args__ = (
+        Index(
+            "ix_pending_ondemand_jobs_group_id_pathogen_id_job_type",
+            "group_id",
+            "pathogen_id",
+            "job_type",
+        ),
+    )
+
+    group_id = Column(Integer, ForeignKey(Group.id), nullable=False)
+    group = relationship(Group)  # type: ignore
+    pathogen_id = Column(Integer, ForeignKey(Pathogen.id), nullable=False)
+    pathogen = relationship(Pathogen)  # type: ignore
+    job_type = Column(
+        Enum(OnDemandJobType),
+        ForeignKey(_OnDemandJobTypeTable.item_id),
+        nullable=False,
+    )
+    # Public identifiers for Pangolin, sample ids for lineage QC, as each of
+    # those jobs expects.
+    sample_ids = Column(JSONB, nullable=False)
+    created_at = Column(DateTime, nullable=False, server_default=func.now())
+    # How many times starting a job for these samples has failed, and when to
+    # try again.
+    attempts = Column(Integer, nullable=False, default=0, server_default=text("0"))
+    retry_at = Column(DateTime, nullable=True)
+    failed_at = Column(DateTime, nullable=True)
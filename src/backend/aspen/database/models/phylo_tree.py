@@ -3,6 +3,7 @@ import enum
 import enumtables
 from sqlalchemy import (
     Column,
+    Float,
     ForeignKey,
     Integer,
     String,
@@ -11,11 +12,12 @@ from sqlalchemy import (
     UniqueConstraint,
 )
 from sqlalchemy.dialects.postgresql import JSONB
-from sqlalchemy.orm import backref, relationship
+from sqlalchemy.orm import backref, deferred, relationship
 
 from aspen.database.models.base import base
 from aspen.database.models.entity import Entity, EntityType
 from aspen.database.models.enum import Enum
+from aspen.database.models.locations import Location
 from aspen.database.models.pathogens import Pathogen
 from aspen.database.models.public_repositories import PublicRepository
 from aspen.database.models.sample import Sample
@@ -91,6 +93,23 @@ class PhyloTree(Entity):
     # TODO evaluate setting a default {} once in use.
     resolved_template_args = Column(JSONB, nullable=True)
 
+    # Node names, accessions and locations on the tree, collected when the tree
+    # was saved (see aspen.phylo_tree.node_index). Lets us answer questions about
+    # the tree without downloading it from S3. NULL for trees saved before this
+    # column was added.
+    node_index = deferred(Column(JSONB, nullable=True), raiseload=True)
+
+    # A gzipped copy of the tree as we serve it for id_style=public, rendered
+    # when the tree was saved. Lives in `s3_bucket`. NULL for trees saved before
+    # this column was added, or if we couldn't render one.
+    public_tree_s3_key = Column(String, nullable=True)
+    # The group's default tree location when the public rendering was made, which
+    # its colors are ordered by. The rendering is stale once the group's
+    # location, or that location's coordinates, no longer match.
+    public_tree_location_id = Column(Integer, ForeignKey(Location.id), nullable=True)
+    public_tree_latitude = Column(Float, nullable=True)
+    public_tree_longitude = Column(Float, nullable=True)
+
     def __str__(self) -> str:
         return f"PhyloTree <id={self.entity_id}>"
 
@@ -2,7 +2,7 @@ from __future__ import annotations
 
 from datetime import datetime
 from re import sub
-from typing import Optional, TYPE_CHECKING
+from typing import Optional, Tuple, TYPE_CHECKING
 
 from sqlalchemy import (
     Boolean,
@@ -79,6 +79,9 @@ class Sample(idbase, DictMixin):  # type: ignore
     public_identifier = Column(
         String,
         nullable=False,
+        # Trees are labeled with public identifiers, so we look samples up by
+        # them without knowing which group submitted them.
+        index=True,
         comment="This is the public identifier we assign to this sample.",
     )
 
@@ -208,30 +211,31 @@ class Sample(idbase, DictMixin):  # type: ignore
     mutations = relationship("SampleMutation", back_populates="sample", cascade="delete, delete-orphan, merge, save-update")  # type: ignore
     qc_metrics = relationship("SampleQCMetric", back_populates="sample", cascade="delete, delete-orphan, merge, save-update")  # type: ignore
 
+    @staticmethod
+    def public_identifier_affixes(
+        prefix: str, country: str, group_prefix: str
+    ) -> Tuple[str, str]:
+        """The text that goes before and after a sample's id in the public
+        identifiers we generate for it."""
+        FORBIDDEN_NAME_CHARACTERS_REGEX = "[^a-zA-Z0-9._/-]"
+        prefix = sub(FORBIDDEN_NAME_CHARACTERS_REGEX, "", prefix)
+        country = sub(FORBIDDEN_NAME_CHARACTERS_REGEX, "", country)
+        group_prefix = sub(FORBIDDEN_NAME_CHARACTERS_REGEX, "", group_prefix)
+        current_year: str = datetime.today().strftime("%Y")
+        return f"{prefix}/{country}/{group_prefix}-", f"/{current_year}"
+
     def generate_public_identifier(self, prefix, already_exists=False):
         # If we don't have an explicit public identifier, generate one from
         # our current model context
         if self.public_identifier:
             return
 
-        FORBIDDEN_NAME_CHARACTERS_REGEX = "[^a-zA-Z0-9._/-]"
-        prefix = sub(FORBIDDEN_NAME_CHARACTERS_REGEX, "", prefix)
-        country = sub(
-            FORBIDDEN_NAME_CHARACTERS_REGEX, "", self.collection_location.country
-        )
-        print(country)
-        group_prefix = sub(
-            FORBIDDEN_NAME_CHARACTERS_REGEX, "", self.submitting_group.prefix
+        before_id, after_id = self.public_identifier_affixes(
+            prefix, self.collection_location.country, self.submitting_group.prefix
         )
-        current_year: str = datetime.today().strftime("%Y")
         if already_exists:
-            id = self.id
-            self.public_identifier = (
-                f"{prefix}/{country}/{group_prefix}-{id}/{current_year}"
-            )
+            self.public_identifier = f"{before_id}{self.id}{after_id}"
         else:
             self.public_identifier = func.concat(
-                f"{prefix}/{country}/{group_prefix}-",
-                text("currval('aspen.samples_id_seq')"),
-                f"/{current_year}",
+                before_id, text("currval('aspen.samples_id_seq')"), after_id
             )
@@ -1,32 +1,88 @@
 from __future__ import annotations
 
+import os
+from typing import Optional
+
 from sqlalchemy import (
     Column,
     Date,
     DateTime,
+    event,
     Float,
     ForeignKey,
     func,
+    inspect,
     Integer,
     String,
     UniqueConstraint,
 )
 from sqlalchemy.orm import backref, deferred, relationship
+from sqlalchemy.types import TypeDecorator
 
 from aspen.database.models.base import idbase
 from aspen.database.models.entity import Entity, EntityType
 from aspen.database.models.sample import Sample
+from aspen.util.sequences import (
+    pack_sequence,
+    sequence_statistics,
+    SequenceStatistics,
+    strip_sequence,
+    unpack_sequence,
+)
+
+# Whether new and updated sequences are written packed (see aspen.util.sequences).
+# Reads handle both formats either way.
+_pack_sequences = os.getenv("PACK_SEQUENCES", "").lower() == "true"
+
+
+def configure_sequence_packing(enabled: bool) -> None:
+    global _pack_sequences
+    _pack_sequences = enabled
+
+
+def stored_sequence(sequence: str) -> str:
+    """What we'd write to the db for `sequence`."""
+    return pack_sequence(sequence) if _pack_sequences else sequence
+
+
+class SequenceText(TypeDecorator):
+    """Text column for sequences, packed or not. Sequences always read back
+    unpacked."""
+
+    impl = String
+    cache_ok = True
+
+    def process_bind_param(self, value: Optional[str], dialect) -> Optional[str]:
+        if value is None:
+            return None
+        return stored_sequence(value)
+
+    def process_result_value(self, value: Optional[str], dialect) -> Optional[str]:
+        if value is None:
+            return None
+        return unpack_sequence(value)
+
+
+def _statistics(context) -> SequenceStatistics:
+    """Statistics for the sequence in the row being inserted. The three
+    statistics columns' defaults share one pass over the sequence."""
+    sequence = context.current_parameters["sequence"]
+    cached = getattr(context, "_sequence_statistics", None)
+    if cached is None or cached[0] is not sequence:
+        cached = (sequence, sequence_statistics(sequence))
+        context._sequence_statistics = cached
+    return cached[1]
 
 
 class PathogenGenome(Entity):
     __tablename__ = "pathogen_genomes"
 
     entity_id = Column(Integer, ForeignKey(Entity.id), primary_key=True)
-    sequence = deferred(Column(String, nullable=False), raiseload=True)
+    sequence = deferred(Column(SequenceText, nullable=False), raiseload=True)
 
     # statistics for the pathogen genome
     def calculate_num_unambiguous_sites(self):
-        return sum((1 for i in self.current_parameters["sequence"] if i in ("ACTGU")))
+        return _statistics(self).num_unambiguous_sites
 
     num_unambiguous_sites = Column(
         Integer,
@@ -36,7 +92,7 @@ class PathogenGenome(Entity):
     )
 
     def calculate_num_missing_alleles(self):
-        return sum((1 for i in self.current_parameters["sequence"] if i == "N"))
+        return _statistics(self).num_missing_alleles
 
     num_missing_alleles = Column(
         Integer,
@@ -49,9 +105,7 @@ class PathogenGenome(Entity):
     )
 
     def calculate_num_mixed(self):
-        return sum(
-            (1 for i in self.current_parameters["sequence"] if i not in ("ACTGUN-"))
-        )
+        return _statistics(self).num_mixed
 
     num_mixed = Column(
         Integer,
@@ -86,6 +140,19 @@ class UploadedPathogenGenome(PathogenGenome):
     sequencing_depth = Column(Float)
     upload_date = Column(DateTime, nullable=False, server_default=func.now())
 
+    # The sequence as it goes into FASTAs (see `get_stripped_sequence`), kept
+    # up to date with `sequence` on flush so readers don't have to strip it.
+    stripped_sequence = deferred(Column(SequenceText, nullable=True), raiseload=True)
+    stripped_sequence_length = Column(Integer, nullable=True)
+    # The stripped sequence if we have it, else the original one, for genomes
+    # that haven't been backfilled yet. Load this instead of either column.
+    fasta_sequence = deferred(
+        func.coalesce(
+            stripped_sequence.columns[0], PathogenGenome.__table__.c.sequence
+        ),
+        raiseload=True,
+    )
+
     def get_stripped_sequence(self) -> str:
         """Returns the "stripped" pathogen sequence (what we use in FASTAs).
 
@@ -96,20 +163,29 @@ class UploadedPathogenGenome(PathogenGenome):
         we pull the sequence for a pathogen, we want it as a single line with
         the >/; lines and Nn characters stripped. This encapsulates that.
 
-        NOTE that the `sequence` column currently will raise an error on load
-        (`raiseload`) to prevent accidentally lazy loading it. If you need
+        We store the stripped sequence when the genome is written, so this is
+        usually just a lookup. Genomes that haven't been backfilled yet are
+        stripped on the fly.
+
+        NOTE that the `fasta_sequence` column currently will raise an error on
+        load (`raiseload`) to prevent accidentally lazy loading it. If you need
         sequence data, you'll need to make sure the underlying query is
-        eagerly fetching that data or calling this method will raise an error
-        (just the same as trying to access `sequence` would in that case).
+        eagerly fetching that data (by undeferring `fasta_sequence`) or calling
+        this method will raise an error.
         """
-        sequence: str = "".join(
-            [
-                line
-                for line in self.sequence.splitlines()
-                if not (line.startswith(">") or line.startswith(";"))
-            ]
-        )
-        return sequence.strip("Nn")
+        if self.stripped_sequence_length is not None:
+            return self.fasta_sequence
+        return strip_sequence(self.fasta_sequence)
+
+
+@event.listens_for(UploadedPathogenGenome, "before_insert")
+@event.listens_for(UploadedPathogenGenome, "before_update")
+def _store_stripped_sequence(mapper, connection, genome: UploadedPathogenGenome):
+    if not inspect(genome).attrs.sequence.history.has_changes():
+        return
+    stripped = strip_sequence(genome.sequence)
+    genome.stripped_sequence = stripped
+    genome.stripped_sequence_length = len(stripped)
 
 
 class AlignedPathogenGenome(PathogenGenome):
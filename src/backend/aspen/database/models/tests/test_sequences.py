@@ -1,8 +1,12 @@
 import pytest
+import sqlalchemy as sa
 from sqlalchemy.exc import InvalidRequestError
 from sqlalchemy.orm import undefer
 
-from aspen.database.models.sequences import UploadedPathogenGenome
+from aspen.database.models.sequences import (
+    configure_sequence_packing,
+    UploadedPathogenGenome,
+)
 from aspen.test_infra.models.location import location_factory
 from aspen.test_infra.models.pathogen import random_pathogen_factory
 from aspen.test_infra.models.sample import sample_factory
@@ -49,3 +53,68 @@ def test_uploaded_pathogen_genome(session):
         .one()
     )
     uploaded_pathogen_genome.sequence
+
+
+def test_packed_uploaded_pathogen_genome(session):
+    group = group_factory()
+    uploaded_by_user = user_factory(group)
+    pathogen = random_pathogen_factory()
+    location = location_factory(
+        "North America", "USA", "California", "Santa Barbara County"
+    )
+    sample = sample_factory(group, uploaded_by_user, location, pathogen=pathogen)
+    configure_sequence_packing(True)
+    try:
+        uploaded_pathogen_genome = UploadedPathogenGenome(
+            sample=sample, sequence=">sample\nNNGAGAGA\nCTCTCTNN\n"
+        )
+        session.add_all((group, sample, uploaded_pathogen_genome))
+        session.flush()
+    finally:
+        configure_sequence_packing(False)
+
+    stored = session.execute(
+        sa.text("SELECT sequence FROM aspen.pathogen_genomes")
+    ).scalar_one()
+    assert stored.startswith("~z1:2:2:")
+
+    session.expire_all()
+    uploaded_pathogen_genome = (
+        session.query(UploadedPathogenGenome)
+        .options(undefer(UploadedPathogenGenome.sequence))
+        .one()
+    )
+    assert uploaded_pathogen_genome.sequence == "NNGAGAGACTCTCTNN"
+    # Statistics are still computed from the sequence we were given.
+    assert uploaded_pathogen_genome.num_missing_alleles == 4
+
+
+def test_stripped_uploaded_pathogen_genome(session):
+    group = group_factory()
+    uploaded_by_user = user_factory(group)
+    pathogen = random_pathogen_factory()
+    location = location_factory(
+        "North America", "USA", "California", "Santa Barbara County"
+    )
+    sample = sample_factory(group, uploaded_by_user, location, pathogen=pathogen)
+    uploaded_pathogen_genome = UploadedPathogenGenome(
+        sample=sample, sequence=">sample\nNNGAGAGA\nCTCTCTNN\n"
+    )
+    session.add_all((group, sample, uploaded_pathogen_genome))
+    session.flush()
+    assert uploaded_pathogen_genome.stripped_sequence == "GAGAGACTCTCT"
+    assert uploaded_pathogen_genome.stripped_sequence_length == 12
+
+    # Changing the sequence restrips it.
+    uploaded_pathogen_genome.sequence = "nnACGT\n"
+    session.flush()
+    assert uploaded_pathogen_genome.stripped_sequence_length == 4
+
+    session.expire_all()
+    uploaded_pathogen_genome = (
+        session.query(UploadedPathogenGenome)
+        .options(undefer(UploadedPathogenGenome.fasta_sequence))
+        .one()
+    )
+    assert uploaded_pathogen_genome.fasta_sequence == "ACGT"
+    assert uploaded_pathogen_genome.get_stripped_sequence() == "ACGT"
@@ -107,6 +107,9 @@ class User(idbase, DictMixin):  # type: ignore
         String, unique=True, nullable=False, default=generate_random_id
     )
     gisaid_submitter_id = Column(String, nullable=True, default=None)
+    # Bumped whenever the user's memberships or roles change, so that every API
+    # process drops the auth state it has cached for them.
+    auth_version = Column(Integer, nullable=False, default=0, server_default=text("0"))
 
     def __repr__(self):
         return f"User <{self.name}>"
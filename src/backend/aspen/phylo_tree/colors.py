@@ -0,0 +1,259 @@
+# flake8: noqa: E711
+# Doing a double-equals comparison to None is critical for the statements
+# that use it to compile to the intended SQL, which is why tell flake8 to
+# ignore rule E711 at the top of this file
+"""Location colorings for Auspice trees.
+
+We give the 16 locations nearest to a tree's location (at each of the country,
+division and location levels) their own color in the viewer. The coloring only
+depends on the tree, the tree's location, and the coordinates of the locations
+on the tree, so the API and the tree build can both apply it.
+"""
+import math
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+import sqlalchemy as sa
+from sqlalchemy.orm import Session
+
+from aspen.database.models import Location
+from aspen.phylo_tree.walk import ExtractedLocation, LOCATION_KEYS
+
+# 16 colors
+NEXTSTRAIN_COLOR_SCALE = [
+    "#277F8E",
+    "#084A9F",
+    "#4187E0",
+    "#B2D3FD",
+    "#DFC6FF",
+    "#9069C2",
+    "#440278",
+    "#BD3232",
+    "#ED5151",
+    "#FF9999",
+    "#FF8A24",
+    "#FFDABA",
+    "#A76738",
+    "#FDE725",
+    "#A0DA39",
+    "#4AB569",
+]
+
+CATEGORY_NAMES = {
+    "country": "Country",
+    "division": "Admin Division",
+    "location": "Location",
+}
+
+# (latitude, longitude) in degrees
+Coordinates = Tuple[float, float]
+
+# How many locations we look up per query.
+LOCATION_LOOKUP_BATCH_SIZE = 500
+
+
+def category_locations(
+    extracted_locations: Set[ExtractedLocation], category: str
+) -> Set[ExtractedLocation]:
+    """The locations on a tree at the level of `category`."""
+    if category == "country":
+        # Make sure we only have country-level locations in our set.
+        return {
+            ExtractedLocation(country=loc.country, division=None, location=None)
+            for loc in extracted_locations
+        }
+    if category == "division":
+        # Make sure we only have division-level locations in our set.
+        return {
+            ExtractedLocation(country=loc.country, division=loc.division, location=None)
+            for loc in extracted_locations
+            if loc.division is not None
+        }
+    return {
+        ExtractedLocation(
+            country=loc.country, division=loc.division, location=loc.location
+        )
+        for loc in extracted_locations
+        if loc.location is not None
+    }
+
+
+def all_category_locations(
+    extracted_locations: Set[ExtractedLocation],
+) -> Set[ExtractedLocation]:
+    """Every location we need coordinates for to color a tree."""
+    locations: Set[ExtractedLocation] = set()
+    for key in LOCATION_KEYS:
+        locations |= category_locations(extracted_locations, key)
+    return locations
+
+
+def coordinate_queries(locations: List[ExtractedLocation]) -> Iterator[sa.sql.Select]:
+    """Queries for the coordinates of `locations`, in batches."""
+    for offset in range(0, len(locations), LOCATION_LOOKUP_BATCH_SIZE):
+        batch = locations[offset : offset + LOCATION_LOOKUP_BATCH_SIZE]
+        # Filters look like this:
+        #  location.country = 'USA' AND location.division = 'CA' AND location.location = 'San Francisco'
+        # Or for division-level locations for example:
+        #  location.country = 'USA' AND location.division = 'CA' AND location.location IS NULL
+        yield sa.select(  # type: ignore
+            Location.country,
+            Location.division,
+            Location.location,
+            Location.latitude,
+            Location.longitude,
+        ).where(
+            sa.or_(
+                *[
+                    sa.and_(
+                        Location.country == location.country,
+                        Location.division == location.division,
+                        Location.location == location.location,
+                    )
+                    for location in batch
+                ]
+            )
+        )
+
+
+def add_coordinate_rows(
+    loaded: Dict[ExtractedLocation, Optional[Coordinates]], rows: Iterable
+) -> None:
+    """Adds the results of a `coordinate_queries` query to `loaded`."""
+    for row in rows:
+        location = ExtractedLocation(row.country, row.division, row.location)
+        coordinates = None
+        if row.latitude is not None and row.longitude is not None:
+            coordinates = (row.latitude, row.longitude)
+        # Locations are unique per region, so a triple can show up more
+        # than once. Prefer a row we have coordinates for.
+        if loaded.get(location) is None:
+            loaded[location] = coordinates
+
+
+def load_coordinates(
+    session: Session, locations: Iterable[ExtractedLocation]
+) -> Dict[ExtractedLocation, Optional[Coordinates]]:
+    """Returns coordinates (or None, if they're unknown) for each of `locations`
+    that exists in our db."""
+    loaded: Dict[ExtractedLocation, Optional[Coordinates]] = {}
+    for query in coordinate_queries(list(locations)):
+        add_coordinate_rows(loaded, session.execute(query))
+    return loaded
+
+
+def _central_angle(origin: Coordinates, destination: Coordinates) -> float:
+    """Great circle distance between two points on a unit sphere (haversine)."""
+    lat1, lon1 = map(math.radians, origin)
+    lat2, lon2 = map(math.radians, destination)
+    a = (
+        math.sin((lat2 - lat1) / 2) ** 2
+        + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    )
+    return 2 * math.asin(min(1.0, math.sqrt(a)))
+
+
+def sort_by_distance(
+    origin: Optional[Coordinates],
+    coordinates: Dict[ExtractedLocation, Optional[Coordinates]],
+) -> List[ExtractedLocation]:
+    """Sorts locations nearest first. Locations we can't place go last, the same
+    as NULL distances would in an ascending postgres sort."""
+
+    def distance(location: ExtractedLocation) -> float:
+        destination = coordinates[location]
+        if origin is None or destination is None:
+            return math.inf
+        return _central_angle(origin, destination)
+
+    return sorted(coordinates, key=distance)
+
+
+# set which locations will be given color labels in the nextstrain viewer
+# keep in mind that the color categories are very simple and are not
+# interconnected with one another.
+def set_colors_for_location_category(
+    tree_json: dict,
+    tree_location: Location,
+    extracted_locations: Set[ExtractedLocation],
+    coordinates: Dict[ExtractedLocation, Optional[Coordinates]],
+    category: str,
+) -> dict:
+    # information stored in tree_json["meta"]["colorings"], which is an
+    # array of objects. we grab the index of the one for "{category}"
+    category_defines_index = None
+    for index, defines in enumerate(tree_json["meta"]["colorings"]):
+        if defines["key"] == category:
+            category_defines_index = index
+
+    sample_locations = category_locations(extracted_locations, category)
+    # If we didn't find any locations on the tree, we probably have bigger problems
+    if not sample_locations:
+        return tree_json
+
+    origin: Optional[Coordinates] = None
+    if tree_location.latitude is not None and tree_location.longitude is not None:
+        origin = (tree_location.latitude, tree_location.longitude)
+    sorted_locations = [
+        getattr(location, category)
+        for location in sort_by_distance(
+            origin,
+            {
+                location: coordinates[location]
+                for location in sample_locations
+                if location in coordinates
+            },
+        )[:16]
+    ]
+
+    # Add the locations we found location data for
+    # If we still have fewer than 16, add whatever is left from the set we collected
+    # in the tree, even if we don't have spatial data on them.
+    location_strings = [getattr(tree_location, category)]
+    location_strings.extend(
+        [location for location in sorted_locations if location not in location_strings]
+    )
+    if len(location_strings) < 16:
+        remaining_category_locs_in_tree = set(
+            [
+                getattr(loc, category)
+                for loc in extracted_locations
+                if getattr(loc, category) not in location_strings
+                and getattr(loc, category) is not None
+            ]
+        )
+        location_strings.extend(
+            list(remaining_category_locs_in_tree)[: 16 - len(location_strings)]
+        )
+
+    colorings_entry = list(zip(location_strings, NEXTSTRAIN_COLOR_SCALE))
+
+    if category_defines_index is not None:
+        tree_json["meta"]["colorings"][category_defines_index][
+            "scale"
+        ] = colorings_entry
+    else:
+        tree_json["meta"]["colorings"].append(
+            {
+                "key": category,
+                "title": CATEGORY_NAMES[category],
+                "type": "categorical",
+                "scale": colorings_entry,
+            }
+        )
+
+    return tree_json
+
+
+def set_colors(
+    tree_json: dict,
+    tree_location: Location,
+    extracted_locations: Set[ExtractedLocation],
+    coordinates: Dict[ExtractedLocation, Optional[Coordinates]],
+) -> dict:
+    """Sets the location colorings on a tree. `coordinates` should cover
+    `all_category_locations(extracted_locations)`."""
+    for key in LOCATION_KEYS:
+        tree_json = set_colors_for_location_category(
+            tree_json, tree_location, extracted_locations, coordinates, key
+        )
+    return tree_json
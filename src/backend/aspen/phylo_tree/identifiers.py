@@ -1,11 +1,10 @@
 from typing import Set
 
+from aspen.phylo_tree.walk import NameCollector, walk_tree
+
 
 def get_names_from_tree(tree) -> Set[str]:
-    results: Set[str] = set()
+    collector = NameCollector()
     for node in tree:
-        results.add(node["name"])
-        if "children" in node:
-            results.update(get_names_from_tree(node["children"]))
-
-    return results
+        walk_tree(node, collector)
+    return collector.names
@@ -0,0 +1,94 @@
+"""A compact summary of the nodes on a tree, saved alongside the tree itself.
+
+Answering some questions about a tree (which samples are on it, which
+identifiers show up in its sample id download) doesn't need the whole Auspice
+json, just node names, their external accessions, and the locations found on
+the tree. We collect these when a tree is saved so the API doesn't have to
+download and walk the tree again every time it's asked.
+
+The index looks like:
+
+    {
+        "version": 1,
+        # [name, external accession] for each node, in tree order. Generic
+        # (NODE_*) names are stored as null.
+        "nodes": [["hCoV-19/USA/CA-1234/2022", "EPI_ISL_1234"], ...],
+        # distinct [country, division, location] triples found on the tree
+        "locations": [["USA", "California", null], ...],
+    }
+"""
+from typing import Any, Dict, List, Mapping, Optional, Set, Tuple
+
+from aspen.phylo_tree.walk import (
+    AccessionCollector,
+    ExtractedLocation,
+    LocationCollector,
+    NodeRenamer,
+    TreeVisitor,
+)
+
+NODE_INDEX_VERSION = 1
+
+
+class NodeIndexBuilder(TreeVisitor):
+    """Builds a node index while walking a tree."""
+
+    def __init__(self):
+        self.nodes: List[Tuple[Optional[str], Optional[str]]] = []
+        self.locations = LocationCollector()
+
+    def visit(self, node: dict) -> None:
+        name = node.get("name")
+        if name is not None and AccessionCollector.GENERIC_NAME.match(name):
+            name = None
+        accession = (
+            node.get("node_attrs", {}).get("external_accession", {}).get("value")
+        )
+        if name is not None or accession is not None:
+            self.nodes.append((name, accession))
+        self.locations.visit(node)
+
+    def to_json(self) -> Dict[str, Any]:
+        return {
+            "version": NODE_INDEX_VERSION,
+            "nodes": [list(node) for node in self.nodes],
+            "locations": [
+                list(location)
+                for location in sorted(
+                    self.locations.locations,
+                    key=lambda loc: tuple(value or "" for value in loc),
+                )
+            ],
+        }
+
+
+def is_usable(node_index: Optional[Dict[str, Any]]) -> bool:
+    """Whether we can answer questions from this index, or need the tree."""
+    return node_index is not None and node_index.get("version") == NODE_INDEX_VERSION
+
+
+def get_index_names(node_index: Dict[str, Any]) -> Set[str]:
+    """The (non-generic) node names on the tree."""
+    return {name for name, _ in node_index["nodes"] if name is not None}
+
+
+def get_index_locations(node_index: Dict[str, Any]) -> Set[ExtractedLocation]:
+    return {ExtractedLocation(*location) for location in node_index["locations"]}
+
+
+def get_index_accessions(
+    node_index: Dict[str, Any], prefix: str, name_map: Mapping[str, str]
+) -> List[str]:
+    """The accessions `extract_accessions` would find on the tree after its
+    nodes were renamed with `NodeRenamer(prefix, name_map)`."""
+    renamer = NodeRenamer(prefix, name_map)
+    accessions = AccessionCollector()
+    for name, accession in node_index["nodes"]:
+        node: Dict[str, Any] = {}
+        if accession is not None:
+            node["node_attrs"] = {"external_accession": {"value": accession}}
+        if name is not None:
+            node["name"] = name
+            renamer.visit(node)
+        accessions.visit(node)
+    return accessions.accessions
@@ -0,0 +1,36 @@
+import copy
+
+from aspen.phylo_tree.node_index import (
+    get_index_accessions,
+    get_index_locations,
+    get_index_names,
+    NodeIndexBuilder,
+)
+from aspen.phylo_tree.tests.utils.tree_utils import make_synthetic_tree, PREFIX
+from aspen.phylo_tree.walk import (
+    AccessionCollector,
+    LocationCollector,
+    NameCollector,
+    NodeRenamer,
+    walk_tree,
+)
+
+
+def test_node_index_matches_tree():
+    tree = make_synthetic_tree(200)
+    name_map = {"USA/SAMPLE-3/2022": "private-3", "Canada/SAMPLE-8/2022": "private-8"}
+
+    builder = NodeIndexBuilder()
+    names, locations = NameCollector(), LocationCollector()
+    walk_tree(tree, builder, names, locations)
+    node_index = builder.to_json()
+
+    renamed_tree = copy.deepcopy(tree)
+    accessions = AccessionCollector()
+    walk_tree(renamed_tree, NodeRenamer(PREFIX, name_map), accessions)
+
+    assert get_index_names(node_index) == {
+        name for name in names.names if not name.startswith("NODE_")
+    }
+    assert get_index_locations(node_index) == locations.locations
+    assert get_index_accessions(node_index, PREFIX, name_map) == accessions.accessions
@@ -0,0 +1,64 @@
+import copy
+import sys
+
+import pytest
+
+from aspen.phylo_tree.tests.utils.tree_utils import (
+    make_ladder_tree,
+    make_synthetic_tree,
+    PREFIX,
+    recursive_accessions,
+    recursive_locations,
+    recursive_names,
+    recursive_rename,
+)
+from aspen.phylo_tree.walk import (
+    AccessionCollector,
+    iter_nodes,
+    LocationCollector,
+    NameCollector,
+    NodeRenamer,
+    TreeVisitor,
+    walk_tree,
+)
+
+
+def test_tree_visitor_is_abstract():
+    with pytest.raises(TypeError):
+        TreeVisitor()  # type: ignore
+
+
+def test_single_pass_matches_separate_walks():
+    tree = make_synthetic_tree(500)
+    name_map = {"USA/SAMPLE-3/2022": "private-3", "Canada/SAMPLE-8/2022": "private-8"}
+
+    expected_tree = copy.deepcopy(tree)
+    expected_names = recursive_names([expected_tree])
+    expected_locations = recursive_locations(expected_tree)
+    recursive_rename(PREFIX, expected_tree, name_map, "GISAID_ID")
+    expected_accessions = recursive_accessions([], expected_tree)
+
+    names, locations = NameCollector(), LocationCollector()
+    accessions = AccessionCollector()
+    walk_tree(
+        tree,
+        names,
+        locations,
+        NodeRenamer(PREFIX, name_map, "GISAID_ID"),
+        accessions,
+    )
+
+    assert names.names == expected_names
+    assert locations.locations == expected_locations
+    assert tree == expected_tree
+    # Accessions come out in the same order as the recursive walk.
+    assert accessions.accessions == expected_accessions
+
+
+def test_deep_trees():
+    depth = sys.getrecursionlimit() * 5
+    tree = make_ladder_tree(depth)
+    names = NameCollector()
+    walk_tree(tree, names, NodeRenamer(PREFIX, {}))
+    assert len(names.names) == 2 * depth - 1
+    assert sum(1 for node in iter_nodes(tree) if node["name"].startswith(PREFIX)) == 0
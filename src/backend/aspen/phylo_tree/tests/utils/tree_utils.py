@@ -0,0 +1,106 @@
+"""Synthetic Auspice trees for exercising tree walks."""
+import random
+import re
+from typing import Dict, List, Set
+
+from aspen.phylo_tree.walk import ExtractedLocation, LOCATION_KEYS
+
+PREFIX = "hCoV-19"
+COUNTRIES = ["USA", "Mexico", "Canada"]
+DIVISIONS = ["California", "Oregon", "Washington", "Nevada"]
+LOCATIONS = ["Alameda County", "Marin County", "Santa Clara County", None]
+
+
+def make_synthetic_tree(num_leaves: int, seed: int = 0) -> Dict:
+    """Builds a random binary Auspice-like tree with `num_leaves` leaves."""
+    rng = random.Random(seed)
+    nodes: List[Dict] = []
+    for i in range(num_leaves):
+        country = rng.choice(COUNTRIES)
+        node_attrs: Dict = {
+            "country": {"value": country},
+            "division": {"value": rng.choice(DIVISIONS)},
+        }
+        location = rng.choice(LOCATIONS)
+        if location:
+            node_attrs["location"] = {"value": location}
+        if i % 3 == 0:
+            node_attrs["external_accession"] = {"value": f"EPI_ISL_{i}"}
+        nodes.append(
+            {"name": f"{PREFIX}/{country}/SAMPLE-{i}/2022", "node_attrs": node_attrs}
+        )
+    # Join random pairs of subtrees until only the root is left.
+    internal = 0
+    while len(nodes) > 1:
+        children = []
+        for _ in range(2):
+            i = rng.randrange(len(nodes))
+            nodes[i], nodes[-1] = nodes[-1], nodes[i]
+            children.append(nodes.pop())
+        nodes.append({"name": f"NODE_{internal}", "children": children})
+        internal += 1
+    return nodes[0]
+
+
+def make_ladder_tree(depth: int) -> Dict:
+    """Builds a maximally unbalanced tree, `depth` levels deep."""
+    root: Dict = {"name": "NODE_0", "children": []}
+    node = root
+    for i in range(1, depth):
+        child: Dict = {"name": f"NODE_{i}", "children": []}
+        node["children"] = [{"name": f"{PREFIX}/SAMPLE-{i}"}, child]
+        node = child
+    return root
+
+
+# The recursive, one-walk-per-task implementations the visitors replaced. The
+# visitors must produce exactly what these did, and should beat them (see
+# scripts/benchmarks/phylo_tree_walk.py).
+
+
+def recursive_rename(prefix, node, name_map, save_key=None):
+    tree_identifier = node["name"]
+    if tree_identifier.lower().startswith(prefix.lower()):
+        tree_identifier = tree_identifier[len(f"{prefix}/") :]
+    renamed_value = name_map.get(tree_identifier, None)
+    node["name"] = tree_identifier
+    if renamed_value is not None:
+        if save_key is not None:
+            node[save_key] = node["name"]
+        node["name"] = renamed_value
+    for child in node.get("children", []):
+        recursive_rename(prefix, child, name_map, save_key)
+    return node
+
+
+def recursive_locations(node) -> Set[ExtractedLocation]:
+    locations = set()
+    extracted_location_list = [
+        node.get("node_attrs", {}).get(key, {}).get("value", None)
+        for key in LOCATION_KEYS
+    ]
+    locations.add(ExtractedLocation(*extracted_location_list))
+    for child in node.get("children", []):
+        locations |= recursive_locations(child)
+    return locations
+
+
+def recursive_accessions(accessions_list, node):
+    node_attributes = node.get("node_attrs", {})
+    if "external_accession" in node_attributes:
+        accessions_list.append(node_attributes["external_accession"]["value"])
+    if "name" in node:
+        if not re.match("NODE_", node["name"]):
+            accessions_list.append(node["name"])
+    for child in node.get("children", []):
+        recursive_accessions(accessions_list, child)
+    return accessions_list
+
+
+def recursive_names(tree) -> Set[str]:
+    results: Set[str] = set()
+    for node in tree:
+        results.add(node["name"])
+        if "children" in node:
+            results.update(recursive_names(node["children"]))
+    return results
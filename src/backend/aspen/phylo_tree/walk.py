@@ -0,0 +1,112 @@
+import re
+from abc import ABC, abstractmethod
+from collections import namedtuple
+from typing import Iterator, List, Mapping, Optional, Set
+
+ExtractedLocation = namedtuple("ExtractedLocation", ("country", "division", "location"))
+LOCATION_KEYS = ExtractedLocation._fields
+
+
+class TreeVisitor(ABC):
+    """Base class for things that want to look at every node of a tree.
+
+    Pass any number of visitors to `walk_tree` to have all of them visit the
+    tree's nodes in a single traversal.
+    """
+
+    @abstractmethod
+    def visit(self, node: dict) -> None:
+        ...
+
+
+def iter_nodes(root: dict) -> Iterator[dict]:
+    """Yields every node of an Auspice tree, parents before their children.
+
+    Uses an explicit stack instead of recursion, so very deep (eg, ladder-like)
+    trees can't hit python's recursion limit. Siblings are yielded in order.
+    """
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        yield node
+        children = node.get("children")
+        if children:
+            stack.extend(reversed(children))
+
+
+def walk_tree(root: dict, *visitors: TreeVisitor) -> None:
+    """Has each visitor visit every node of the tree, in one traversal."""
+    for node in iter_nodes(root):
+        for visitor in visitors:
+            visitor.visit(node)
+
+
+class NameCollector(TreeVisitor):
+    """Collects the name of every node."""
+
+    def __init__(self):
+        self.names: Set[str] = set()
+
+    def visit(self, node: dict) -> None:
+        self.names.add(node["name"])
+
+
+class LocationCollector(TreeVisitor):
+    """Collects the distinct (country, division, location) found on nodes."""
+
+    def __init__(self):
+        self.locations: Set[ExtractedLocation] = set()
+
+    def visit(self, node: dict) -> None:
+        node_attrs = node.get("node_attrs", {})
+        self.locations.add(
+            ExtractedLocation(
+                *[node_attrs.get(key, {}).get("value", None) for key in LOCATION_KEYS]
+            )
+        )
+
+
+class AccessionCollector(TreeVisitor):
+    """Collects external accessions and (non-generic) node names, in tree order."""
+
+    # NODE_ is some sort of generic name and not useful
+    GENERIC_NAME = re.compile("NODE_")
+
+    def __init__(self, accessions: Optional[List[str]] = None):
+        self.accessions: List[str] = accessions if accessions is not None else []
+
+    def visit(self, node: dict) -> None:
+        node_attributes = node.get("node_attrs", {})
+        if "external_accession" in node_attributes:
+            self.accessions.append(node_attributes["external_accession"]["value"])
+        if "name" in node and not self.GENERIC_NAME.match(node["name"]):
+            self.accessions.append(node["name"])
+
+
+class NodeRenamer(TreeVisitor):
+    """Strips the pathogen prefix from node names, then renames any nodes that
+    appear in `name_map`. If `save_key` is provided, the original (prefix
+    stripped) name of a renamed node is saved under that key."""
+
+    def __init__(
+        self, prefix: str, name_map: Mapping[str, str], save_key: Optional[str] = None
+    ):
+        self.prefix = prefix
+        self.lower_prefix = prefix.lower()
+        self.name_map = name_map
+        self.save_key = save_key
+
+    def visit(self, node: dict) -> None:
+        # Strip the gisaid prefix from our tree identifier if it's present
+        tree_identifier = node["name"]
+        if tree_identifier.lower().startswith(self.lower_prefix):
+            tree_identifier = tree_identifier[len(self.prefix) + 1 :]
+        node["name"] = tree_identifier
+
+        renamed_value = self.name_map.get(tree_identifier, None)
+        if renamed_value is not None:
+            # we found the replacement value! first, save the old value if the
+            # caller requested.
+            if self.save_key is not None:
+                node[self.save_key] = tree_identifier
+            node["name"] = renamed_value
@@ -0,0 +1,118 @@
+"""Helpers for the genome sequences we keep in pathogen_genomes.sequence.
+
+Sequences are stored as the user (or Nextclade) gave them to us: FASTA text,
+possibly with > / ; header lines and wrapped over many lines. Readers
+want them normalized into a single line, which is all that most of the text is
+good for, and FASTA writers want the N padding at either end stripped too.
+Uploaded genomes keep a stripped copy alongside the original for those.
+
+Packed sequences are an opt-in, more compact way to store the same sequence:
+normalized, with the runs of N padding at either end replaced by their
+lengths, and compressed. They're still text, so packed and plain sequences can
+live in the same column, and `unpack_sequence` reads both:
+
+    ~z1:<leading Ns>:<trailing Ns>:<base64 of the zlib compressed sequence>
+"""
+import base64
+import re
+import zlib
+from typing import NamedTuple
+
+PACKED_SEQUENCE_PREFIX = "~z1:"
+_PACKED_SEQUENCE = re.compile(r"~z1:(\d+):(\d+):")
+
+# Sequences are close to random text over a handful of letters, so there's
+# little for LZ77 to find beyond runs of the same base. Run length encoding
+# plus Huffman coding compresses them about as well as level 9 deflate, ten
+# times faster.
+_COMPRESSION_LEVEL = 9
+_COMPRESSION_STRATEGY = zlib.Z_RLE
+
+
+# Maps every byte to the kind of site it is, so one translate() and a few
+# count()s (which run in C) can classify a whole sequence.
+_UNAMBIGUOUS, _MISSING, _GAP, _MIXED = range(4)
+_SITE_KINDS = bytearray([_MIXED] * 256)
+for _base in b"ACTGU":
+    _SITE_KINDS[_base] = _UNAMBIGUOUS
+_SITE_KINDS[ord("N")] = _MISSING
+_SITE_KINDS[ord("-")] = _GAP
+_SITE_KINDS = bytes(_SITE_KINDS)
+
+
+class SequenceStatistics(NamedTuple):
+    num_unambiguous_sites: int
+    num_missing_alleles: int
+    num_mixed: int
+
+
+def sequence_statistics(sequence: str) -> SequenceStatistics:
+    """Counts a sequence's unambiguous (A, C, T, G, U), missing (N) and mixed
+    sites. Anything else but gaps (-) counts as mixed, including newlines and
+    header lines if the sequence has them."""
+    kinds = sequence.encode("utf-8", "surrogatepass").translate(_SITE_KINDS)
+    unambiguous = kinds.count(_UNAMBIGUOUS)
+    missing = kinds.count(_MISSING)
+    gaps = kinds.count(_GAP)
+    # Non-ascii characters take up more than one byte, so count mixed sites
+    # in characters rather than bytes.
+    return SequenceStatistics(
+        num_unambiguous_sites=unambiguous,
+        num_missing_alleles=missing,
+        num_mixed=len(sequence) - unambiguous - missing - gaps,
+    )
+
+
+def normalize_sequence(sequence: str) -> str:
+    """Drops FASTA header / comment lines and joins the rest into one line."""
+    return "".join(
+        [
+            line
+            for line in sequence.splitlines()
+            if not (line.startswith(">") or line.startswith(";"))
+        ]
+    )
+
+
+def strip_sequence(sequence: str) -> str:
+    """The sequence as it goes into a FASTA: normalized, with the N padding at
+    either end stripped."""
+    return normalize_sequence(sequence).strip("Nn")
+
+
+def is_packed(value: str) -> bool:
+    return value.startswith(PACKED_SEQUENCE_PREFIX)
+
+
+def pack_sequence(sequence: str) -> str:
+    """Packs a sequence for storage. Packing an already packed sequence is a
+    no-op."""
+    if is_packed(sequence):
+        return sequence
+    normalized = normalize_sequence(sequence)
+    core = normalized.lstrip("N")
+    leading = len(normalized) - len(core)
+    trimmed = core.rstrip("N")
+    trailing = len(core) - len(trimmed)
+    compressor = zlib.compressobj(
+        _COMPRESSION_LEVEL,
+        zlib.DEFLATED,
+        zlib.MAX_WBITS,
+        zlib.DEF_MEM_LEVEL,
+        _COMPRESSION_STRATEGY,
+    )
+    compressed = compressor.compress(trimmed.encode("utf-8")) + compressor.flush()
+    encoded = base64.b64encode(compressed).decode("ascii")
+    return f"{PACKED_SEQUENCE_PREFIX}{leading}:{trailing}:{encoded}"
+
+
+def unpack_sequence(value: str) -> str:
+    """The normalized sequence for a packed sequence. Plain sequences are
+    returned as they are."""
+    match = _PACKED_SEQUENCE.match(value)
+    if match is None:
+        return value
+    leading, trailing = int(match.group(1)), int(match.group(2))
+    compressed = base64.b64decode(value[match.end() :])
+    core = zlib.decompress(compressed).decode("utf-8")
+    return "N" * leading + core + "N" * trailing
@@ -1,7 +1,8 @@
 import datetime
 import json
 import re
-from typing import List, Optional
+import threading
+from typing import Any, Dict, List, Optional
 
 from boto3 import Session
 
@@ -9,9 +10,35 @@ from aspen.api.settings import Settings
 from aspen.database.models import Group, PhyloRun
 
 
+class LocalStepFunctionsClient:
+    """Stands in for the boto3 Step Functions client where we don't want to
+    start real executions, e.g. in tests. It just records what it was asked
+    to start."""
+
+    def __init__(self):
+        self.executions: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+
+    def start_execution(self, stateMachineArn: str, name: str, input: str):
+        execution = {
+            "stateMachineArn": stateMachineArn,
+            "name": name,
+            "input": json.loads(input),
+        }
+        with self._lock:
+            self.executions.append(execution)
+        return {
+            "executionArn": f"{stateMachineArn}:{name}",
+            "startDate": datetime.datetime.now(),
+        }
+
+
 class SwipeJob:
-    def __init__(self, settings: Settings):
+    def __init__(self, settings: Settings, sfn_client: Any = None):
         self.settings = settings
+        # Any object with the Step Functions client's `start_execution`. We
+        # make a boto3 client for each execution if this isn't given.
+        self.sfn_client = sfn_client
 
     def get_sfn_config(self):
         raise NotImplementedError
@@ -39,11 +66,13 @@ class SwipeJob:
             "RunSPOTVcpu": sfn_params["RunSPOTVcpu"],
         }
 
-        session = Session(region_name=settings.AWS_REGION)
-        client = session.client(
-            service_name="stepfunctions",
-            endpoint_url=settings.BOTO_ENDPOINT_URL or None,
-        )
+        client = self.sfn_client
+        if client is None:
+            session = Session(region_name=settings.AWS_REGION)
+            client = session.client(
+                service_name="stepfunctions",
+                endpoint_url=settings.BOTO_ENDPOINT_URL or None,
+            )
 
         execution_name = re.sub(r"[^0-9a-zA-Z-]", r"-", execution_name)
 
@@ -0,0 +1,59 @@
+from aspen.util.sequences import (
+    is_packed,
+    normalize_sequence,
+    pack_sequence,
+    sequence_statistics,
+    strip_sequence,
+    unpack_sequence,
+)
+
+
+def test_normalize_sequence():
+    assert normalize_sequence(">sample 1\n;comment\nACGT\nNNAC\r\nGT\n") == "ACGTNNACGT"
+
+
+def test_strip_sequence():
+    assert strip_sequence(">sample 1\nnnACGT\nNNAC\rGTNN\n") == "ACGTNNACGT"
+    assert strip_sequence("NNACGTnn") == "ACGT"
+    assert strip_sequence("ACGTNNACGT") == "ACGTNNACGT"
+    assert strip_sequence(">header only") == ""
+
+
+def test_pack_sequence_round_trip():
+    sequence = "NNNNACGTRYNNNNACGTNNN"
+    packed = pack_sequence(sequence)
+    assert is_packed(packed)
+    assert packed.startswith("~z1:4:3:")
+    assert unpack_sequence(packed) == sequence
+
+
+def test_pack_sequence_normalizes():
+    packed = pack_sequence(">sample 1\nNNACGT\nACGTNN\n")
+    assert unpack_sequence(packed) == "NNACGTACGTNN"
+
+
+def test_pack_sequence_edge_cases():
+    for sequence in ["", "NNNN", "acgtnn", "nnACGT"]:
+        assert unpack_sequence(pack_sequence(sequence)) == sequence
+
+
+def test_pack_sequence_is_idempotent():
+    packed = pack_sequence("ACGT" * 1000)
+    assert pack_sequence(packed) == packed
+    assert len(packed) < 4000
+
+
+def test_unpack_plain_sequence():
+    assert unpack_sequence(">sample 1\nACGT\n") == ">sample 1\nACGT\n"
+    assert not is_packed(">sample 1\nACGT\n")
+
+
+def test_sequence_statistics():
+    sequence = ">id\nACTGUNNRY-K\nacgtñ"
+    statistics = sequence_statistics(sequence)
+    # Matches the per-character definitions these replaced.
+    assert statistics.num_unambiguous_sites == sum(1 for i in sequence if i in "ACTGU")
+    assert statistics.num_missing_alleles == sum(1 for i in sequence if i == "N")
+    assert statistics.num_mixed == sum(1 for i in sequence if i not in "ACTGUN-")
+    assert statistics == (5, 2, 13)
+    assert sequence_statistics("") == (0, 0, 0)
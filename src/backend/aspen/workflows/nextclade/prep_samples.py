@@ -189,7 +189,7 @@ def cli(
             .filter(Sample.id.in_(sample_ids))
             .options(
                 joinedload(Sample.uploaded_pathogen_genome, innerjoin=True).undefer(
-                    UploadedPathogenGenome.sequence
+                    UploadedPathogenGenome.fasta_sequence
                 ),
             )
         )
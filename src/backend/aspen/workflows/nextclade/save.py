@@ -1,7 +1,10 @@
 import csv
+import hashlib
 import io
+import itertools
+import time
 from datetime import datetime
-from typing import Dict, IO, Optional, Set
+from typing import Any, Dict, IO, Iterable, List, Optional, Set, Tuple
 
 import click
 import sqlalchemy as sa
@@ -17,21 +20,41 @@ from aspen.database.connection import (
 )
 from aspen.database.models import (
     AlignedPathogenGenome,
+    Entity,
+    EntityType,
     LineageType,
     MutationsCaller,
+    Pathogen,
+    PathogenGenome,
     QCMetricCaller,
     Sample,
     SampleLineage,
     SampleMutation,
     SampleQCMetric,
 )
+from aspen.database.models.sequences import stored_sequence
+from aspen.util.sequences import sequence_statistics
 from aspen.workflows.nextclade.utils import extract_dataset_info
+from aspen.workflows.shared_utils.database import (
+    create_temp_table,
+    drop_temp_table,
+    insert_rows,
+    reserve_ids,
+    upsert_table_contents,
+)
+from aspen.workflows.shared_utils.fasta import iter_fasta_records
 
 # TODO, create an enum table for below and standard nextclade QC overallStatus
 INVALID_RESULT_STATUS = "invalid"
 
 FAILED_LINEAGE_STATUS = "FAILED"
 
+# How many CSV rows we stage at a time when saving results in bulk.
+BULK_CHUNK_SIZE = 5000
+# How many aligned genomes we write at a time when saving them in bulk. These
+# are big, so keep batches a good bit smaller than for the CSV results.
+BULK_GENOME_CHUNK_SIZE = 500
+
 
 @click.command("save")
 @click.option("nextclade_fh", "--nextclade-csv", type=click.File("r"), required=True)
@@ -52,6 +75,22 @@ FAILED_LINEAGE_STATUS = "FAILED"
     required=True,
 )
 @click.option("pathogen_slug", "--pathogen-slug", type=str, required=True)
+@click.option(
+    "bulk",
+    "--bulk/--no-bulk",
+    default=True,
+    help=(
+        "Stage CSV results in temp tables and upsert them with a few statements. "
+        "--no-bulk saves them one sample at a time instead."
+    ),
+)
+@click.option(
+    "bulk_chunk_size",
+    "--bulk-chunk-size",
+    type=int,
+    default=BULK_CHUNK_SIZE,
+    help="How many CSV rows to stage at a time in --bulk mode.",
+)
 def cli(
     nextclade_fh: io.TextIOBase,
     nextclade_aligned_fasta_fh: io.TextIOBase,
@@ -59,6 +98,8 @@ def cli(
     nextclade_version: str,
     nextclade_run_datetime: datetime,
     pathogen_slug: str,
+    bulk: bool,
+    bulk_chunk_size: int,
 ):
     """Go through results from nextclade run, save to DB for each sample."""
     print("Beginning to save Nextclade results to DB.")
@@ -74,141 +115,122 @@ def cli(
     interface: SqlAlchemyInterface = init_db(get_db_uri(Config()))
     with session_scope(interface) as session:
         nextclade_csv: csv.DictReader = csv.DictReader(nextclade_fh, delimiter=";")
-        for row in nextclade_csv:
-            entry_count_so_far += 1
-            # For entire workflow, we use sample id primary keys for names.
-            sample_id = int(row["seqName"])
-            sample_q = sa.select(Sample).where(Sample.id == sample_id)
-            sample = session.execute(sample_q).scalars().one()
-
-            is_result_valid = is_nextclade_result_valid(row)
-            # We always record QC info for any sample run, even if invalid.
-            qc_score: Optional[str] = row["qc.overallScore"]
-            qc_status = row["qc.overallStatus"]
-            if is_result_valid:
-                # If valid result, we expect it will have an aligned sequence
-                aligned_fasta_expected.add(sample_id)
-            else:
-                # If result was invalid, mark QC info accordingly
-                qc_score = None
-                qc_status = INVALID_RESULT_STATUS
-
-            existing_qc_metric_q = (
-                sa.select(SampleQCMetric)
-                .join(SampleQCMetric.sample)
-                .filter(
-                    SampleQCMetric.sample == sample,
-                    SampleQCMetric.qc_caller == QCMetricCaller.NEXTCLADE,
-                )
+        if bulk:
+            entry_count_so_far = bulk_save_results(
+                session,
+                nextclade_csv,
+                aligned_fasta_expected,
+                nextclade_version,
+                dataset_info,
+                pathogen_slug,
+                bulk_chunk_size,
             )
-            qc_metric = session.execute(existing_qc_metric_q).scalars().one_or_none()
-            if qc_metric is None:
-                qc_metric = SampleQCMetric(
-                    sample=sample,
-                    qc_caller=QCMetricCaller.NEXTCLADE,
-                    qc_score=qc_score,
-                    qc_status=qc_status,
-                    raw_qc_output={key: value for key, value in row.items()},
-                    qc_software_version=nextclade_version,
-                    reference_dataset_name=dataset_info["name"],
-                    reference_sequence_accession=dataset_info["accession"],
-                    reference_dataset_tag=dataset_info["tag"],
+        else:
+            for row in nextclade_csv:
+                entry_count_so_far += 1
+                # For entire workflow, we use sample id primary keys for names.
+                sample_id = int(row["seqName"])
+                sample_q = sa.select(Sample).where(Sample.id == sample_id)
+                sample = session.execute(sample_q).scalars().one()
+
+                is_result_valid = is_nextclade_result_valid(row)
+                if is_result_valid:
+                    # If valid result, we expect it will have an aligned sequence
+                    aligned_fasta_expected.add(sample_id)
+
+                # We always record QC info for any sample run, even if invalid.
+                qc_metric_fields = get_qc_metric_fields(
+                    row, is_result_valid, nextclade_version, dataset_info
                 )
-            else:
-                qc_metric.qc_score = qc_score
-                qc_metric.qc_status = qc_status
-                qc_metric.raw_qc_output = {key: value for key, value in row.items()}
-                qc_metric.qc_software_version = nextclade_version
-                qc_metric.reference_dataset_name = dataset_info["name"]
-                qc_metric.reference_sequence_accession = dataset_info["accession"]
-                qc_metric.reference_dataset_tag = dataset_info["tag"]
-            session.add(qc_metric)
-
-            # If run was invalid, we still set mutation, but all mutation data saved will be empty strings
-            existing_mutation_q = (
-                sa.select(SampleMutation)
-                .join(SampleMutation.sample)
-                .filter(
-                    SampleMutation.sample == sample,
-                    SampleMutation.mutations_caller == MutationsCaller.NEXTCLADE,
+                existing_qc_metric_q = (
+                    sa.select(SampleQCMetric)
+                    .join(SampleQCMetric.sample)
+                    .filter(
+                        SampleQCMetric.sample == sample,
+                        SampleQCMetric.qc_caller == QCMetricCaller.NEXTCLADE,
+                    )
                 )
-            )
-            mutation = session.execute(existing_mutation_q).scalars().one_or_none()
-
-            if mutation is None:
-                mutation = SampleMutation(
-                    sample=sample,
-                    mutations_caller=MutationsCaller.NEXTCLADE,
-                    substitutions=row["substitutions"],
-                    insertions=row["insertions"],
-                    deletions=row["deletions"],
-                    aa_substitutions=row["aaSubstitutions"],
-                    aa_insertions=row["aaInsertions"],
-                    aa_deletions=row["aaDeletions"],
-                    reference_sequence_accession=dataset_info["accession"],
+                qc_metric = (
+                    session.execute(existing_qc_metric_q).scalars().one_or_none()
                 )
-            else:
-                mutation.substitutions = row["substitutions"]
-                mutation.insertions = row["insertions"]
-                mutation.deletions = row["deletions"]
-                mutation.aa_substitutions = row["aaSubstitutions"]
-                mutation.aa_insertions = row["aaInsertions"]
-                mutation.aa_deletions = row["aaDeletions"]
-                mutation.reference_sequence_accession = dataset_info["accession"]
-            session.add(mutation)
-
-            # If SC2 (covid) we use Pangolin, not Nextclade.
-            if pathogen_slug != "SC2":
-                # lineage will return FAILED if sample did not match well against reference
-                lineage = get_lineage_from_row(row, is_result_valid)
-
-                existing_sample_lineage_q = (
-                    sa.select(SampleLineage)
-                    .join(SampleLineage.sample)
+                if qc_metric is None:
+                    qc_metric = SampleQCMetric(sample=sample, **qc_metric_fields)
+                else:
+                    for field, value in qc_metric_fields.items():
+                        setattr(qc_metric, field, value)
+                session.add(qc_metric)
+
+                # If run was invalid, we still set mutation, but all mutation data saved will be empty strings
+                mutation_fields = get_mutation_fields(row, dataset_info)
+                existing_mutation_q = (
+                    sa.select(SampleMutation)
+                    .join(SampleMutation.sample)
                     .filter(
-                        SampleLineage.sample == sample,
-                        SampleLineage.lineage_type == LineageType.NEXTCLADE,
+                        SampleMutation.sample == sample,
+                        SampleMutation.mutations_caller == MutationsCaller.NEXTCLADE,
                     )
                 )
+                mutation = session.execute(existing_mutation_q).scalars().one_or_none()
 
-                sample_lineage = (
-                    session.execute(existing_sample_lineage_q).scalars().one_or_none()
-                )
+                if mutation is None:
+                    mutation = SampleMutation(sample=sample, **mutation_fields)
+                else:
+                    for field, value in mutation_fields.items():
+                        setattr(mutation, field, value)
+                session.add(mutation)
+
+                # If SC2 (covid) we use Pangolin, not Nextclade.
+                if pathogen_slug != "SC2":
+                    # lineage will return FAILED if sample did not match well against reference
+                    lineage_fields = get_lineage_fields(
+                        row, is_result_valid, nextclade_version, dataset_info
+                    )
 
-                if sample_lineage is None:
-                    sample_lineage = SampleLineage(
-                        sample=sample,
-                        lineage_type=LineageType.NEXTCLADE,
-                        lineage_software_version=nextclade_version,
-                        lineage=lineage,
-                        reference_dataset_name=dataset_info["name"],
-                        reference_sequence_accession=dataset_info["accession"],
-                        reference_dataset_tag=dataset_info["tag"],
+                    existing_sample_lineage_q = (
+                        sa.select(SampleLineage)
+                        .join(SampleLineage.sample)
+                        .filter(
+                            SampleLineage.sample == sample,
+                            SampleLineage.lineage_type == LineageType.NEXTCLADE,
+                        )
                     )
-                else:
-                    sample_lineage.lineage_software_version = nextclade_version
-                    sample_lineage.lineage = lineage
-                    sample_lineage.reference_dataset_name = dataset_info["name"]
-                    sample_lineage.reference_sequence_accession = dataset_info[
-                        "accession"
-                    ]
-                    sample_lineage.reference_dataset_tag = dataset_info["tag"]
-                session.add(sample_lineage)
-
-            if entry_count_so_far % COMMIT_CHUNK_SIZE == 0:
-                session.commit()
+
+                    sample_lineage = (
+                        session.execute(existing_sample_lineage_q)
+                        .scalars()
+                        .one_or_none()
+                    )
+
+                    if sample_lineage is None:
+                        sample_lineage = SampleLineage(sample=sample, **lineage_fields)
+                    else:
+                        for field, value in lineage_fields.items():
+                            setattr(sample_lineage, field, value)
+                    session.add(sample_lineage)
+
+                if entry_count_so_far % COMMIT_CHUNK_SIZE == 0:
+                    session.commit()
         # Don't forget to commit the last chunk of entries that remain!
         session.commit()
         print("Finished saving Nextclade CSV results to DB.")
         print(f"Total count of samples run and saved: {entry_count_so_far}")
 
         # Now that CSV saving is done, we handle saving aligned sequence data
-        ids_in_aligned_fasta = save_aligned_genomes(
-            session,
-            nextclade_aligned_fasta_fh,
-            dataset_info["accession"],
-            nextclade_run_datetime,
-        )
+        if bulk:
+            ids_in_aligned_fasta = bulk_save_aligned_genomes(
+                session,
+                nextclade_aligned_fasta_fh,
+                dataset_info["accession"],
+                nextclade_run_datetime,
+                pathogen_slug,
+            )
+        else:
+            ids_in_aligned_fasta = save_aligned_genomes(
+                session,
+                nextclade_aligned_fasta_fh,
+                dataset_info["accession"],
+                nextclade_run_datetime,
+            )
         # The `aligned_fasta_expected` ids **should** exactly match all the ids
         # found in the FASTA. If there's a difference something weird is going
         # on and we should at least have some warning logs. Maybe even fail?
@@ -300,6 +322,161 @@ def get_lineage_from_row(
     return lineage
 
 
+def get_qc_metric_fields(
+    nextclade_csv_row: Dict[str, str],
+    is_result_valid: bool,
+    nextclade_version: str,
+    dataset_info: Dict[str, str],
+) -> Dict[str, Any]:
+    """Values to save on a sample's Nextclade SampleQCMetric for a CSV row."""
+    qc_score: Optional[str] = nextclade_csv_row["qc.overallScore"]
+    qc_status = nextclade_csv_row["qc.overallStatus"]
+    if not is_result_valid:
+        # If result was invalid, mark QC info accordingly
+        qc_score = None
+        qc_status = INVALID_RESULT_STATUS
+    return {
+        "qc_caller": QCMetricCaller.NEXTCLADE,
+        "qc_score": qc_score,
+        "qc_status": qc_status,
+        "raw_qc_output": {key: value for key, value in nextclade_csv_row.items()},
+        "qc_software_version": nextclade_version,
+        "reference_dataset_name": dataset_info["name"],
+        "reference_sequence_accession": dataset_info["accession"],
+        "reference_dataset_tag": dataset_info["tag"],
+    }
+
+
+def get_mutation_fields(
+    nextclade_csv_row: Dict[str, str], dataset_info: Dict[str, str]
+) -> Dict[str, Any]:
+    """Values to save on a sample's Nextclade SampleMutation for a CSV row."""
+    return {
+        "mutations_caller": MutationsCaller.NEXTCLADE,
+        "substitutions": nextclade_csv_row["substitutions"],
+        "insertions": nextclade_csv_row["insertions"],
+        "deletions": nextclade_csv_row["deletions"],
+        "aa_substitutions": nextclade_csv_row["aaSubstitutions"],
+        "aa_insertions": nextclade_csv_row["aaInsertions"],
+        "aa_deletions": nextclade_csv_row["aaDeletions"],
+        "reference_sequence_accession": dataset_info["accession"],
+    }
+
+
+def get_lineage_fields(
+    nextclade_csv_row: Dict[str, str],
+    is_result_valid: bool,
+    nextclade_version: str,
+    dataset_info: Dict[str, str],
+) -> Dict[str, Any]:
+    """Values to save on a sample's Nextclade SampleLineage for a CSV row."""
+    return {
+        "lineage_type": LineageType.NEXTCLADE,
+        "lineage_software_version": nextclade_version,
+        "lineage": get_lineage_from_row(nextclade_csv_row, is_result_valid),
+        "reference_dataset_name": dataset_info["name"],
+        "reference_sequence_accession": dataset_info["accession"],
+        "reference_dataset_tag": dataset_info["tag"],
+    }
+
+
+def bulk_save_results(
+    session: Session,
+    nextclade_csv: Iterable[Dict[str, str]],
+    aligned_fasta_expected: Set[int],
+    nextclade_version: str,
+    dataset_info: Dict[str, str],
+    pathogen_slug: str,
+    chunk_size: int = BULK_CHUNK_SIZE,
+) -> int:
+    """Saves Nextclade CSV results with a handful of set-based statements.
+
+    Saving row by row costs several SELECTs per sample plus ORM writes, which
+    adds up to hundreds of thousands of round trips on a full refresh. Instead,
+    we read the CSV in chunks and stage each chunk into temp tables shaped like
+    our QC metric, mutation and lineage tables. Once everything is staged, one
+    `INSERT ... ON CONFLICT DO UPDATE` per table moves it all into place.
+
+    Adds the ids of samples we expect to see in the aligned FASTA to
+    `aligned_fasta_expected` and returns the number of CSV rows saved.
+    """
+    start_time = time.perf_counter()
+    # (destination table, columns of its unique constraint for our caller)
+    upsert_targets = [
+        (SampleQCMetric.__table__, ["sample_id", "qc_caller"]),
+        (SampleMutation.__table__, ["sample_id", "mutations_caller"]),
+    ]
+    # If SC2 (covid) we use Pangolin, not Nextclade.
+    if pathogen_slug != "SC2":
+        upsert_targets.append((SampleLineage.__table__, ["sample_id", "lineage_type"]))
+    temp_tables = {
+        dest_table.name: create_temp_table(session, dest_table)
+        for dest_table, _ in upsert_targets
+    }
+
+    staged_columns: Dict[str, Dict[str, None]] = {
+        table_name: {} for table_name in temp_tables
+    }
+
+    row_count = 0
+    rows = iter(nextclade_csv)
+    while True:
+        chunk = list(itertools.islice(rows, chunk_size))
+        if not chunk:
+            break
+        staged: Dict[str, List[Dict[str, Any]]] = {
+            table_name: [] for table_name in temp_tables
+        }
+        for row in chunk:
+            # For entire workflow, we use sample id primary keys for names.
+            sample_id = int(row["seqName"])
+            is_result_valid = is_nextclade_result_valid(row)
+            if is_result_valid:
+                aligned_fasta_expected.add(sample_id)
+            staged[SampleQCMetric.__tablename__].append(
+                get_qc_metric_fields(
+                    row, is_result_valid, nextclade_version, dataset_info
+                )
+                | {"sample_id": sample_id}
+            )
+            staged[SampleMutation.__tablename__].append(
+                get_mutation_fields(row, dataset_info) | {"sample_id": sample_id}
+            )
+            if SampleLineage.__tablename__ in staged:
+                staged[SampleLineage.__tablename__].append(
+                    get_lineage_fields(
+                        row, is_result_valid, nextclade_version, dataset_info
+                    )
+                    | {"sample_id": sample_id}
+                )
+        for table_name, staged_rows in staged.items():
+            session.execute(temp_tables[table_name].insert(), staged_rows)
+            for staged_row in staged_rows:
+                staged_columns[table_name].update(dict.fromkeys(staged_row))
+        row_count += len(chunk)
+
+    for dest_table, conflict_columns in upsert_targets:
+        temp_table = temp_tables[dest_table.name]
+        # Only write the columns we staged. The rest (e.g. a lineage's
+        # probability) keep whatever they already had.
+        upsert_table_contents(
+            session,
+            temp_table,
+            dest_table,
+            conflict_columns,
+            columns=list(staged_columns[dest_table.name]),
+        )
+        drop_temp_table(session, temp_table)
+    session.commit()
+
+    elapsed = time.perf_counter() - start_time
+    print(
+        f"Bulk saved {row_count} Nextclade results in {elapsed:.1f}s "
+        f"({row_count / max(elapsed, 1e-6):.0f} rows/sec)."
+    )
+    return row_count
+
+
 def save_aligned_genomes(
     session: Session,
     aligned_fasta_file: io.TextIOBase,
@@ -380,5 +557,168 @@ def save_aligned_genomes(
     return ids_in_aligned_fasta
 
 
+def sequence_hash(sequence: str) -> str:
+    """Hash we compare aligned sequences with. Matches postgres' `md5()` of the
+    sequence as we'd store it."""
+    return hashlib.md5(stored_sequence(sequence).encode("utf-8")).hexdigest()
+
+
+def bulk_save_aligned_genomes(
+    session: Session,
+    aligned_fasta_file: IO[str],
+    latest_reference_name: str,
+    nextclade_run_datetime: datetime,
+    pathogen_slug: str,
+    chunk_size: int = BULK_GENOME_CHUNK_SIZE,
+) -> Set[int]:
+    """Saves the aligned sequences from Nextclade output to DB, in batches.
+
+    Follows the same rules as `save_aligned_genomes` for which sequences need
+    saving, but instead of a SELECT per FASTA record, we fetch the reference
+    name of every existing aligned genome for the pathogen up front, along with
+    a hash of the sequence for those aligned against an older reference. That
+    lets us skip a sequence without touching the DB when it's already aligned
+    against the latest reference, or when re-aligning it against a new
+    reference produced the exact same sequence (in that case, we only update
+    the reference name and date, not the sequence itself).
+
+    Aligned genomes are split across the entities, pathogen_genomes and
+    aligned_pathogen_genome tables, so a single INSERT ... ON CONFLICT can't
+    write them. Instead, new genomes get their ids reserved up front and are
+    written with multi-row INSERTs into each table, and changed ones are
+    written with one executemany UPDATE per table, a batch at a time.
+
+    Returns the set of all the sample_ids found in the FASTA.
+    """
+    # Only hash sequences we might update: postgres would otherwise read and
+    # hash every stored aligned sequence on every run.
+    stale_sequence_hash = sa.case(
+        (
+            AlignedPathogenGenome.reference_name != latest_reference_name,
+            sa.func.md5(PathogenGenome.sequence),
+        )
+    )
+    existing_q = (
+        sa.select(
+            AlignedPathogenGenome.sample_id,
+            AlignedPathogenGenome.pathogen_genome_id,
+            AlignedPathogenGenome.reference_name,
+            stale_sequence_hash,
+        )
+        .join(
+            PathogenGenome,
+            PathogenGenome.entity_id == AlignedPathogenGenome.pathogen_genome_id,
+        )
+        .join(Sample, Sample.id == AlignedPathogenGenome.sample_id)
+        .join(Pathogen, Pathogen.id == Sample.pathogen_id)
+        .where(Pathogen.slug == pathogen_slug)
+    )
+    # sample_id -> (pathogen_genome_id, reference_name, sequence hash)
+    existing_genomes = {
+        row[0]: (row[1], row[2], row[3]) for row in session.execute(existing_q)
+    }
+
+    update_sequence = (
+        sa.update(PathogenGenome.__table__)
+        .where(PathogenGenome.__table__.c.entity_id == sa.bindparam("genome_id"))
+        .values(sequence=sa.bindparam("new_sequence"))
+    )
+    update_alignment = (
+        sa.update(AlignedPathogenGenome.__table__)
+        .where(
+            AlignedPathogenGenome.__table__.c.pathogen_genome_id
+            == sa.bindparam("genome_id")
+        )
+        .values(
+            reference_name=latest_reference_name,
+            aligned_date=nextclade_run_datetime,
+        )
+    )
+
+    ids_in_aligned_fasta: Set[int] = set()
+    # (sample_id, sequence) of genomes that aren't in the DB yet.
+    new_genomes: List[Tuple[int, str]] = []
+    changed_sequences: List[Dict[str, Any]] = []
+    realigned_genome_ids: List[Dict[str, Any]] = []
+    saved_count = 0
+
+    def insert_new_genomes():
+        genome_ids = reserve_ids(
+            session, Entity.__table__, len(new_genomes)  # type: ignore
+        )
+        entities: List[Dict[str, Any]] = []
+        pathogen_genomes: List[Dict[str, Any]] = []
+        aligned_genomes: List[Dict[str, Any]] = []
+        for genome_id, (sample_id, sequence) in zip(genome_ids, new_genomes):
+            # These rows skip the ORM, so fill in what PathogenGenome would.
+            statistics = sequence_statistics(sequence)
+            entities.append(
+                {"id": genome_id, "entity_type": EntityType.ALIGNED_PATHOGEN_GENOME}
+            )
+            pathogen_genomes.append(
+                {
+                    "entity_id": genome_id,
+                    "sequence": sequence,
+                    "num_unambiguous_sites": statistics.num_unambiguous_sites,
+                    "num_missing_alleles": statistics.num_missing_alleles,
+                    "num_mixed": statistics.num_mixed,
+                }
+            )
+            aligned_genomes.append(
+                {
+                    "pathogen_genome_id": genome_id,
+                    "sample_id": sample_id,
+                    "reference_name": latest_reference_name,
+                    "aligned_date": nextclade_run_datetime,
+                }
+            )
+        insert_rows(session, Entity.__table__, entities)  # type: ignore
+        insert_rows(session, PathogenGenome.__table__, pathogen_genomes)  # type: ignore
+        insert_rows(
+            session, AlignedPathogenGenome.__table__, aligned_genomes  # type: ignore
+        )
+
+    def write_batch():
+        if new_genomes:
+            insert_new_genomes()
+        if changed_sequences:
+            session.execute(update_sequence, changed_sequences)
+        if realigned_genome_ids:
+            session.execute(update_alignment, realigned_genome_ids)
+        session.commit()
+        new_genomes.clear()
+        changed_sequences.clear()
+        realigned_genome_ids.clear()
+
+    for record_id, sequence in iter_fasta_records(aligned_fasta_file):
+        sample_id = int(record_id)
+        ids_in_aligned_fasta.add(sample_id)
+        existing = existing_genomes.get(sample_id)
+        if existing is None:
+            new_genomes.append((sample_id, sequence))
+        else:
+            genome_id, reference_name, existing_hash = existing
+            # If pre-existing APG, no need to update unless changed reference seq.
+            if reference_name == latest_reference_name:
+                continue
+            if sequence_hash(sequence) != existing_hash:
+                changed_sequences.append(
+                    {"genome_id": genome_id, "new_sequence": sequence}
+                )
+            realigned_genome_ids.append({"genome_id": genome_id})
+        saved_count += 1
+        if saved_count % chunk_size == 0:
+            write_batch()
+    # Don't forget to write the last batch of entries that remain!
+    write_batch()
+    print("Finished saving Nextclade aligned genomes to DB.")
+    print(
+        f"Total count of aligned pathogen genomes added (new) or updated "
+        f"(existing): {saved_count}."
+    )
+
+    return ids_in_aligned_fasta
+
+
 if __name__ == "__main__":
     cli()
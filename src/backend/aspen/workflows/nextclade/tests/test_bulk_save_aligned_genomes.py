@@ -0,0 +1,159 @@
+import datetime
+import io
+from typing import List
+
+from sqlalchemy import event
+from sqlalchemy.orm import undefer
+
+from aspen.database.models import AlignedPathogenGenome, Sample
+from aspen.test_infra.models.location import location_factory
+from aspen.test_infra.models.pathogen import random_pathogen_factory
+from aspen.test_infra.models.sample import sample_factory
+from aspen.test_infra.models.sequences import aligned_pathogen_genome_factory
+from aspen.test_infra.models.usergroup import group_factory, user_factory
+from aspen.workflows.nextclade.save import bulk_save_aligned_genomes
+
+LATEST_REFERENCE = "MN908947"
+OLD_ALIGNED_DATE = datetime.datetime(2022, 1, 1)
+RUN_DATETIME = datetime.datetime(2023, 2, 3, 3, 47)
+
+
+def create_samples(session, count: int) -> List[Sample]:
+    group = group_factory()
+    user = user_factory(group)
+    location = location_factory(
+        "North America", "USA", "California", "Santa Barbara County"
+    )
+    pathogen = random_pathogen_factory()
+    samples = [
+        sample_factory(
+            group,
+            user,
+            location,
+            pathogen=pathogen,
+            private_identifier=f"private_identifier_{i}",
+            public_identifier=f"public_identifier_{i}",
+        )
+        for i in range(count)
+    ]
+    session.add_all(samples)
+    session.commit()
+    return samples
+
+
+def get_aligned_genome(session, sample_id: int) -> AlignedPathogenGenome:
+    return (
+        session.query(AlignedPathogenGenome)
+        .filter(AlignedPathogenGenome.sample_id == sample_id)
+        .options(undefer(AlignedPathogenGenome.sequence))
+        .one()
+    )
+
+
+def test_bulk_save_aligned_genomes(session):
+    up_to_date, same_sequence, changed_sequence, new = create_samples(session, 4)
+    for sample, sequence, reference_name in [
+        (up_to_date, "G" * 1001, LATEST_REFERENCE),
+        (same_sequence, "A" * 1001, "stale"),
+        (changed_sequence, "C" * 1001, "stale"),
+    ]:
+        session.add(
+            aligned_pathogen_genome_factory(
+                sample,
+                sequence=sequence,
+                reference_name=reference_name,
+                aligned_date=OLD_ALIGNED_DATE,
+            )
+        )
+    session.commit()
+    up_to_date_id, same_sequence_id, changed_sequence_id, new_id = sample_ids = [
+        sample.id for sample in [up_to_date, same_sequence, changed_sequence, new]
+    ]
+    pathogen_slug = up_to_date.pathogen.slug
+    fasta = io.StringIO("".join(f">{id}\n{'A' * 1001}\n" for id in sample_ids))
+
+    statements: List[str] = []
+
+    def record_statement(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    engine = session.get_bind()
+    event.listen(engine, "before_cursor_execute", record_statement)
+    try:
+        ids = bulk_save_aligned_genomes(
+            session,
+            fasta,
+            LATEST_REFERENCE,
+            RUN_DATETIME,
+            pathogen_slug,
+            chunk_size=2,
+        )
+    finally:
+        event.remove(engine, "before_cursor_execute", record_statement)
+    assert ids == set(sample_ids)
+
+    session.close()
+    session.begin()
+    # Already aligned against the latest reference: left alone.
+    genome = get_aligned_genome(session, up_to_date_id)
+    assert genome.sequence == "G" * 1001
+    assert genome.aligned_date == OLD_ALIGNED_DATE
+    # Re-aligned against the new reference.
+    for sample_id in [same_sequence_id, changed_sequence_id, new_id]:
+        genome = get_aligned_genome(session, sample_id)
+        assert genome.sequence == "A" * 1001
+        assert genome.reference_name == LATEST_REFERENCE
+        assert genome.aligned_date == RUN_DATETIME
+    # The new genome's statistics are filled in, even though it skipped the ORM.
+    genome = get_aligned_genome(session, new_id)
+    assert genome.num_unambiguous_sites == 1001
+    assert genome.num_missing_alleles == 0
+    assert genome.num_mixed == 0
+    # ...and it was written with an INSERT per table, not through a flush.
+    aligned_inserts = [
+        statement
+        for statement in statements
+        if statement.lstrip().upper().startswith("INSERT")
+        and "aligned_pathogen_genome" in statement
+    ]
+    assert len(aligned_inserts) == 1
+    # Only the genome whose sequence changed had its sequence rewritten.
+    sequence_updates = [
+        statement
+        for statement in statements
+        if statement.lstrip().upper().startswith("UPDATE")
+        and "pathogen_genomes" in statement
+        and "aligned_pathogen_genome" not in statement
+    ]
+    assert len(sequence_updates) == 1
+
+
+def test_bulk_save_aligned_genomes_only_reads_pathogen(session):
+    sample, other_sample = create_samples(session, 2)
+    other_sample.pathogen = random_pathogen_factory()
+    session.add(
+        aligned_pathogen_genome_factory(
+            other_sample,
+            sequence="C" * 1001,
+            reference_name="stale",
+            aligned_date=OLD_ALIGNED_DATE,
+        )
+    )
+    session.commit()
+    sample_id, other_sample_id = sample.id, other_sample.id
+
+    bulk_save_aligned_genomes(
+        session,
+        io.StringIO(f">{sample_id}\n{'A' * 1001}\n"),
+        LATEST_REFERENCE,
+        RUN_DATETIME,
+        sample.pathogen.slug,
+    )
+
+    session.close()
+    session.begin()
+    assert get_aligned_genome(session, sample_id).sequence == "A" * 1001
+    # Another pathogen's genomes aren't touched.
+    other_genome = get_aligned_genome(session, other_sample_id)
+    assert other_genome.reference_name == "stale"
+    assert other_genome.sequence == "C" * 1001
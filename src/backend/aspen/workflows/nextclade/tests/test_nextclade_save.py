@@ -1,5 +1,7 @@
+import datetime
 from pathlib import Path, PosixPath
 
+import pytest
 from click.testing import CliRunner, Result
 from sqlalchemy.orm import undefer
 
@@ -62,7 +64,8 @@ def mock_remote_db_uri(mocker, test_postgres_db_uri):
     )
 
 
-def test_nextclade_save_new_entries(mocker, session, postgres_database):
+@pytest.mark.parametrize("extra_args", [[], ["--no-bulk"]])
+def test_nextclade_save_new_entries(mocker, session, postgres_database, extra_args):
 
     group, samples, pathogen_genomes = create_test_data(session)
     mock_remote_db_uri(mocker, postgres_database.as_uri())
@@ -89,7 +92,8 @@ def test_nextclade_save_new_entries(mocker, session, postgres_database):
             "2023-02-03T03:47:00",
             "--pathogen-slug",
             "MPX",
-        ],
+        ]
+        + extra_args,
     )
 
     assert result.exit_code == 0
@@ -129,7 +133,8 @@ def test_nextclade_save_new_entries(mocker, session, postgres_database):
     assert aligned_pathogen_genome.sequence == "A" * 1001
 
 
-def test_nextclade_save_overwrite(mocker, session, postgres_database):
+@pytest.mark.parametrize("extra_args", [[], ["--no-bulk"]])
+def test_nextclade_save_overwrite(mocker, session, postgres_database, extra_args):
 
     group, samples, pathogen_genomes = create_test_data(session)
     mock_remote_db_uri(mocker, postgres_database.as_uri())
@@ -160,6 +165,9 @@ def test_nextclade_save_overwrite(mocker, session, postgres_database):
         lineage_type=LineageType.NEXTCLADE,
         lineage_software_version="v1",
         lineage="B",
+        lineage_probability=0.5,
+        raw_lineage_output={"lineage": "B"},
+        last_updated=datetime.datetime(2023, 1, 1),
     )
     aligned_pathogen_genome = AlignedPathogenGenome(
         sample=sample,
@@ -194,7 +202,8 @@ def test_nextclade_save_overwrite(mocker, session, postgres_database):
             "2023-02-03T03:47:00",
             "--pathogen-slug",
             "MPX",
-        ],
+        ]
+        + extra_args,
     )
 
     assert result.exit_code == 0
@@ -221,6 +230,10 @@ def test_nextclade_save_overwrite(mocker, session, postgres_database):
     assert qc_metrics.qc_status == "good"
     assert qc_metrics.qc_software_version == "v1.1"
     assert lineage.lineage == "21J (Delta)"
+    # Nextclade doesn't set these, so they're left alone.
+    assert lineage.lineage_probability == 0.5
+    assert lineage.raw_lineage_output == {"lineage": "B"}
+    assert lineage.last_updated == datetime.datetime(2023, 1, 1)
     # matched against value from test tag.json in test data directory
     assert qc_metrics.reference_dataset_name == "sars-cov-2"
     assert qc_metrics.reference_sequence_accession == "MN908947"
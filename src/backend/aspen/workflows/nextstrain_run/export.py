@@ -2,11 +2,24 @@ import csv
 import io
 import json
 import re
-from typing import Any, Dict, IO, Iterable, List, Mapping, MutableMapping, Optional, Set
+import sys
+import time
+from typing import (
+    Any,
+    Dict,
+    IO,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    MutableMapping,
+    Optional,
+    Tuple,
+)
 
 import click
 import sqlalchemy as sa
-from sqlalchemy.orm import aliased, joinedload, with_polymorphic
+from sqlalchemy.orm import aliased, joinedload, selectinload, with_polymorphic
 
 from aspen.config.config import Config
 from aspen.database.connection import (
@@ -28,9 +41,11 @@ from aspen.database.models import (
     PathogenLineage,
     PhyloRun,
     Sample,
+    UploadedPathogenGenome,
 )
 from aspen.database.models.workflow import WorkflowStatusType
 from aspen.util.lineage import expand_lineage_wildcards
+from aspen.util.sequences import normalize_sequence
 from aspen.workflows.nextstrain_run.build_config import TemplateBuilder
 
 NCOV_CSV_FIELDS = [
@@ -93,6 +108,10 @@ GENBANK_CSV_FIELDS = [
     "institution",
 ]
 
+# How many of a group's samples (and their sequences) we hold in memory at once
+# while exporting them.
+EXPORT_BATCH_SIZE = 1000
+
 
 @click.command("save")
 @click.option("--phylo-run-id", type=int, required=True)
@@ -207,22 +226,29 @@ def export_run_config(
             session.commit()
         group: Group = phylo_run.group
 
-        # Fetch all of a group's samples.
-        county_samples: List[PathogenGenome] = []
-        if sequence_type == "aligned":
-            county_samples = get_aligned_county_samples(
-                session, group, phylo_run.pathogen
-            )
-        else:
-            county_samples = get_county_samples(session, group, phylo_run.pathogen)
-
         # get the aligned upstream run info.
         aligned_repo_data: AlignedRepositoryData = [
             inp for inp in phylo_run.inputs if isinstance(inp, AlignedRepositoryData)
         ][0]
 
-        num_sequences = write_sequences_files(
-            session, sequence_type, county_samples, sequences_fh, metadata_fh
+        # Stream all of a group's samples out to disk as we read them.
+        start_time = time.perf_counter()
+        sequences_writer = CountingWriter(sequences_fh)
+        metadata_writer = CountingWriter(metadata_fh)
+        num_sequences = write_sample_rows(
+            sequence_type,
+            stream_county_samples(session, group, phylo_run.pathogen, sequence_type),
+            sequences_writer,
+            metadata_writer,
+        )
+        elapsed = time.perf_counter() - start_time
+        # stdout is reserved for the json our callers parse, so report to stderr.
+        print(
+            f"Exported {num_sequences} samples in {elapsed:.1f}s "
+            f"({num_sequences / max(elapsed, 1e-6):.0f} rows/sec), wrote "
+            f"{sequences_writer.bytes_written} sequence bytes and "
+            f"{metadata_writer.bytes_written} metadata bytes.",
+            file=sys.stderr,
         )
 
         selected_samples: List[PathogenGenome] = [
@@ -262,36 +288,48 @@ def export_run_config(
         }
 
 
-def get_county_samples(session, group: Group, pathogen: Pathogen):
-    # Get all samples for the group
-    all_samples: Iterable[Sample] = (
+def stream_county_samples(
+    session, group: Group, pathogen: Pathogen, sequence_type: str
+) -> Iterator[Tuple[Sample, PathogenGenome]]:
+    """Yields (sample, pathogen genome) for all of a group's samples.
+
+    Groups can have a lot of samples, and their sequences add up. Rather than
+    loading them all at once, this reads them through a server-side cursor
+    `EXPORT_BATCH_SIZE` samples at a time, eagerly loading everything that
+    `write_sample_rows` needs for each batch. Callers should write out each
+    row as they get it and not hang on to it, so that memory use stays flat.
+    """
+    query = (
         session.query(Sample)
         .filter(Sample.submitting_group_id == group.id)
         .filter(Sample.pathogen_id == pathogen.id)
         .options(
-            joinedload(Sample.uploaded_pathogen_genome, innerjoin=True).undefer(
-                PathogenGenome.sequence
-            )
+            joinedload(Sample.collection_location),
+            joinedload(Sample.submitting_group),
+            selectinload(Sample.lineages),
+            selectinload(Sample.accessions),
         )
+        .order_by(Sample.id)
     )
-    pathogen_genomes = [sample.uploaded_pathogen_genome for sample in all_samples]
-    return pathogen_genomes
-
-
-def get_aligned_county_samples(session, group: Group, pathogen: Pathogen):
-    # Get all samples for the group
-    all_samples: Iterable[Sample] = (
-        session.query(Sample)
-        .filter(Sample.submitting_group_id == group.id)
-        .filter(Sample.pathogen_id == pathogen.id)
-        .options(
-            joinedload(Sample.aligned_pathogen_genome, innerjoin=True).undefer(
+    if sequence_type == "aligned":
+        # Collections can't be joined-loaded while yielding per batch.
+        query = query.filter(Sample.aligned_pathogen_genome.any()).options(
+            joinedload(Sample.uploaded_pathogen_genome),
+            selectinload(Sample.aligned_pathogen_genome).undefer(
                 PathogenGenome.sequence
+            ),
+        )
+    else:
+        query = query.options(
+            joinedload(Sample.uploaded_pathogen_genome, innerjoin=True).undefer(
+                UploadedPathogenGenome.fasta_sequence
             )
         )
-    )
-    pathogen_genomes = [sample.aligned_pathogen_genome[0] for sample in all_samples]
-    return pathogen_genomes
+    for sample in query.yield_per(EXPORT_BATCH_SIZE):
+        if sequence_type == "aligned":
+            yield sample, sample.aligned_pathogen_genome[0]
+        else:
+            yield sample, sample.uploaded_pathogen_genome
 
 
 def get_phylo_run(session, phylo_run_id):
@@ -500,11 +538,23 @@ def populate_aligned_row(sample, sequence):
     return row
 
 
+class CountingWriter:
+    """Wraps a text file handle to keep count of how much was written to it."""
+
+    def __init__(self, fh: IO[str]):
+        self.fh = fh
+        self.bytes_written = 0
+
+    def write(self, data: str) -> int:
+        # Our exports are ascii, so characters and bytes are one and the same.
+        self.bytes_written += len(data)
+        return self.fh.write(data)
+
+
 def write_sequences_files(
     session, sequence_type: str, pathogen_genomes, sequences_fh, metadata_fh
 ):
     # Create a list of the inputted pathogen genomes that are uploaded pathogen genomes
-    num_sequences = 0
     sequences = {sequence for sequence in pathogen_genomes}
 
     sample_ids = {sequence.sample_id for sequence in sequences}
@@ -518,29 +568,40 @@ def write_sequences_files(
     }
     aliased(Entity)
 
-    aspen_samples: Set[str] = set()
+    return write_sample_rows(
+        sequence_type,
+        (
+            (sample_id_to_sample[pathogen_genome.sample_id], pathogen_genome)
+            for pathogen_genome in pathogen_genomes
+        ),
+        sequences_fh,
+        metadata_fh,
+    )
+
+
+def write_sample_rows(
+    sequence_type: str,
+    samples: Iterable[Tuple[Sample, PathogenGenome]],
+    sequences_fh,
+    metadata_fh,
+) -> int:
+    """Writes a FASTA entry and a metadata row for each (sample, genome) pair.
+
+    Each row is written out as soon as it's read from `samples`, so this works
+    just as well on a stream of rows from the DB as on a list.
+    """
+    num_sequences = 0
     csv_fields = NCOV_CSV_FIELDS
     if sequence_type == "aligned":
         csv_fields = GENBANK_CSV_FIELDS
     metadata_csv_fh = csv.DictWriter(metadata_fh, csv_fields, delimiter="\t")
     metadata_csv_fh.writeheader()
-    for pathogen_genome in pathogen_genomes:
-        # find the corresponding sample
-        sample_id = pathogen_genome.sample_id
-        sample = sample_id_to_sample[sample_id]
-        aspen_samples.add(sample.public_identifier)
-
-        sequence = "".join(
-            [
-                line
-                for line in pathogen_genome.sequence.splitlines()
-                if not (line.startswith(">") or line.startswith(";"))
-            ]
-        )
-
+    for sample, pathogen_genome in samples:
         # N's are desired in aligned sequences but not uploaded ones!
-        if sequence_type != "aligned":
-            sequence = sequence.strip("Nn")
+        if sequence_type == "aligned":
+            sequence = normalize_sequence(pathogen_genome.sequence)
+        else:
+            sequence = pathogen_genome.get_stripped_sequence()
 
         fasta_label = f">{sample.public_identifier}\n"
         if sequence_type == "aligned":
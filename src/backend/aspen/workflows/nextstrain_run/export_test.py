@@ -180,13 +180,15 @@ def cli(
 
 def get_random_pathogen_genomes(session, max_genomes, sequence_type):
     sequence_model = UploadedPathogenGenome
+    sequence_column = UploadedPathogenGenome.fasta_sequence
     if sequence_type == "aligned":
         sequence_model = AlignedPathogenGenome
+        sequence_column = PathogenGenome.sequence
     all_genomes: Iterable[Sample] = (
         sa.select(sequence_model)  # type: ignore
         .options(
             joinedload(sequence_model.sample, innerjoin=True),
-            undefer(PathogenGenome.sequence),
+            undefer(sequence_column),
         )
         .limit(max_genomes)
     )
@@ -1,10 +1,13 @@
 import datetime
+import gzip
 import io
 import json
-from typing import IO, MutableSequence, Set
+import os
+from typing import Dict, IO, MutableSequence, Optional, Set
 
+import boto3
 import click
-from sqlalchemy.orm import joinedload
+from sqlalchemy.orm import joinedload, Session
 from sqlalchemy.orm.exc import NoResultFound
 
 from aspen.config.config import Config
@@ -16,13 +19,65 @@ from aspen.database.connection import (
 )
 from aspen.database.models import (
     PathogenGenome,
+    PathogenRepoConfig,
     PhyloRun,
     PhyloTree,
     Sample,
     UploadedPathogenGenome,
 )
 from aspen.database.models.workflow import SoftwareNames, WorkflowStatusType
-from aspen.phylo_tree.identifiers import get_names_from_tree
+from aspen.phylo_tree.colors import all_category_locations, load_coordinates, set_colors
+from aspen.phylo_tree.node_index import NodeIndexBuilder
+from aspen.phylo_tree.walk import (
+    ExtractedLocation,
+    NameCollector,
+    NodeRenamer,
+    TreeVisitor,
+    walk_tree,
+)
+
+
+def get_public_repo_config(
+    session: Session, phylo_run: PhyloRun
+) -> Optional[PathogenRepoConfig]:
+    return (
+        session.query(PathogenRepoConfig)
+        .filter(
+            PathogenRepoConfig.pathogen == phylo_run.pathogen,
+            PathogenRepoConfig.public_repository == phylo_run.contextual_repository,
+        )
+        .options(joinedload(PathogenRepoConfig.public_repository))
+        .one_or_none()
+    )
+
+
+def render_public_tree(
+    session: Session,
+    phylo_run: PhyloRun,
+    tree_json: Dict,
+    locations: Set[ExtractedLocation],
+) -> bytes:
+    """Colors a tree whose nodes were already renamed for id_style=public, then
+    serializes and gzips it exactly the way the API would send it."""
+    coordinates = load_coordinates(session, all_category_locations(locations))
+    set_colors(tree_json, phylo_run.group.default_tree_location, locations, coordinates)
+    body = json.dumps(
+        tree_json, ensure_ascii=False, allow_nan=False, separators=(",", ":")
+    ).encode("utf-8")
+    return gzip.compress(body)
+
+
+def upload_public_tree(bucket: str, key: str, body: bytes) -> str:
+    public_tree_key = f"{os.path.splitext(key)[0]}.public.json.gz"
+    s3 = boto3.resource(
+        "s3",
+        endpoint_url=os.getenv("BOTO_ENDPOINT_URL") or None,
+        config=boto3.session.Config(signature_version="s3v4"),
+    )
+    s3.Bucket(bucket).Object(public_tree_key).put(
+        Body=body, ContentType="application/json", ContentEncoding="gzip"
+    )
+    return public_tree_key
 
 
 @click.command("save")
@@ -81,7 +136,20 @@ def cli(
 
         # read the tree
         tree_json = json.load(tree_path)
-        all_public_identifiers = get_names_from_tree([tree_json["tree"]])
+        # Keep what we learn from walking the tree, so the API doesn't have to
+        # download and walk it again.
+        names = NameCollector()
+        node_index = NodeIndexBuilder()
+        visitors: MutableSequence[TreeVisitor] = [names, node_index]
+        # While we're at it, render the tree the way we serve it for
+        # id_style=public, so the API can send it as is.
+        repo_config = get_public_repo_config(session, phylo_run)
+        if repo_config is not None:
+            save_key = "{}_ID".format(repo_config.public_repository.name.upper())
+            # This has to come last, the other visitors want the original names.
+            visitors.append(NodeRenamer(repo_config.prefix, {}, save_key))
+        walk_tree(tree_json["tree"], *visitors)
+        all_public_identifiers = names.names
 
         # get all the children that are pathogen genomes
         pathogen_genomes = [
@@ -104,6 +172,16 @@ def cli(
             ):
                 included_samples.append(uploaded_pathogen_genome.sample)
 
+        public_tree_s3_key = None
+        # The rendering is only good for as long as the group's tree location
+        # stays what we colored it by, so remember what that was.
+        tree_location = phylo_run.group.default_tree_location
+        if repo_config is not None:
+            public_tree = render_public_tree(
+                session, phylo_run, tree_json, node_index.locations.locations
+            )
+            public_tree_s3_key = upload_public_tree(bucket, key, public_tree)
+
         phylo_tree_kwargs = {
             "s3_bucket": bucket,
             "s3_key": key,
@@ -114,6 +192,11 @@ def cli(
             "pathogen": phylo_run.pathogen,
             "resolved_template_args": resolved_template_args,
             "contextual_repository": phylo_run.contextual_repository,
+            "node_index": node_index.to_json(),
+            "public_tree_s3_key": public_tree_s3_key,
+            "public_tree_location_id": tree_location.id,
+            "public_tree_latitude": tree_location.latitude,
+            "public_tree_longitude": tree_location.longitude,
         }
         try:
             # Overwrite our existing tree output
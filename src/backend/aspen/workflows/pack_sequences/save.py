@@ -0,0 +1,79 @@
+"""Backfills packed storage (see aspen.util.sequences) for sequences that were
+written as plain FASTA text. Safe to re-run, and to run while the API is
+writing: it only touches sequences that aren't packed yet."""
+from typing import Optional
+
+import click
+import sqlalchemy as sa
+from sqlalchemy.orm import Session
+
+from aspen.config.config import Config
+from aspen.database.connection import (
+    get_db_uri,
+    init_db,
+    session_scope,
+    SqlAlchemyInterface,
+)
+from aspen.database.models import PathogenGenome
+from aspen.util.sequences import pack_sequence, PACKED_SEQUENCE_PREFIX
+
+BATCH_SIZE = 500
+
+
+def pack_sequences(
+    session: Session, batch_size: int = BATCH_SIZE, limit: Optional[int] = None
+) -> int:
+    """Packs unpacked sequences a batch at a time, committing after each batch.
+    Returns how many sequences were packed."""
+    table = PathogenGenome.__table__
+    # The sequence column's type would pack this pattern like any other value
+    # we compare it with, so bind it as plain text.
+    packed_pattern = sa.literal(f"{PACKED_SEQUENCE_PREFIX}%", sa.String)
+    update = (
+        sa.update(table)
+        .where(table.c.entity_id == sa.bindparam("genome_id"))
+        .values(sequence=sa.bindparam("packed_sequence"))
+    )
+    packed = 0
+    last_id = 0
+    while limit is None or packed < limit:
+        size = batch_size if limit is None else min(batch_size, limit - packed)
+        rows = session.execute(
+            sa.select(table.c.entity_id, table.c.sequence)
+            .where(table.c.entity_id > last_id)
+            .where(table.c.sequence.notlike(packed_pattern))
+            .order_by(table.c.entity_id)
+            .limit(size)
+        ).all()
+        if not rows:
+            break
+        session.execute(
+            update,
+            [
+                {"genome_id": genome_id, "packed_sequence": pack_sequence(sequence)}
+                for genome_id, sequence in rows
+            ],
+        )
+        session.commit()
+        packed += len(rows)
+        last_id = rows[-1][0]
+        print(f"Packed {packed} sequences")
+    return packed
+
+
+@click.command("save")
+@click.option("--batch-size", type=int, default=BATCH_SIZE)
+@click.option("--limit", type=int, default=None, help="Stop after this many")
+@click.option("--test", type=bool, is_flag=True)
+def cli(batch_size: int, limit: Optional[int], test: bool):
+    if test:
+        print("Success!")
+        return
+    interface: SqlAlchemyInterface = init_db(get_db_uri(Config()))
+    with session_scope(interface) as session:
+        packed = pack_sequences(session, batch_size, limit)
+    print(f"Successfully packed {packed} sequences!")
+
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,73 @@
+import sqlalchemy as sa
+from sqlalchemy.orm import undefer
+
+from aspen.database.models import UploadedPathogenGenome
+from aspen.test_infra.models.location import location_factory
+from aspen.test_infra.models.pathogen import random_pathogen_factory
+from aspen.test_infra.models.sample import sample_factory
+from aspen.test_infra.models.sequences import uploaded_pathogen_genome_factory
+from aspen.test_infra.models.usergroup import group_factory, user_factory
+from aspen.workflows.pack_sequences.save import pack_sequences
+
+
+def create_genomes(session, sequences):
+    group = group_factory()
+    uploaded_by_user = user_factory(group)
+    pathogen = random_pathogen_factory()
+    location = location_factory(
+        "North America", "USA", "California", "Santa Barbara County"
+    )
+    for i, sequence in enumerate(sequences):
+        sample = sample_factory(
+            group,
+            uploaded_by_user,
+            location,
+            pathogen=pathogen,
+            private_identifier=f"private_identifier_{i}",
+            public_identifier=f"public_identifier_{i}",
+        )
+        session.add(uploaded_pathogen_genome_factory(sample, sequence=sequence))
+    session.commit()
+
+
+def stored_values(session):
+    # Read the column as plain text, so we see what's actually stored.
+    return [
+        row[0]
+        for row in session.execute(
+            sa.text("SELECT sequence FROM aspen.pathogen_genomes ORDER BY entity_id")
+        )
+    ]
+
+
+def test_pack_sequences(session):
+    sequences = [">sample 1\nNNACGT\nACGTNN\n", ">sample 2\nTTTT\n", "GGGG"]
+    create_genomes(session, sequences)
+    assert stored_values(session) == sequences
+
+    assert pack_sequences(session, batch_size=2, limit=2) == 2
+    stored = stored_values(session)
+    assert [value.startswith("~z1:") for value in stored] == [True, True, False]
+
+    # Only the remaining sequence gets packed on another run.
+    assert pack_sequences(session, batch_size=2) == 1
+    assert all(value.startswith("~z1:") for value in stored_values(session))
+    assert pack_sequences(session) == 0
+
+    # Sequences read back normalized through the model.
+    session.expire_all()
+    genomes = (
+        session.query(UploadedPathogenGenome)
+        .options(
+            undefer(UploadedPathogenGenome.sequence),
+            undefer(UploadedPathogenGenome.fasta_sequence),
+        )
+        .order_by(UploadedPathogenGenome.pathogen_genome_id)
+        .all()
+    )
+    assert [genome.sequence for genome in genomes] == [
+        "NNACGTACGTNN",
+        "TTTT",
+        "GGGG",
+    ]
+    assert genomes[0].get_stripped_sequence() == "ACGTACGT"
@@ -28,7 +28,7 @@ def cli(samples_fh: io.TextIOBase, sequences_fh: io.TextIOBase):
             .filter(Sample.public_identifier.in_(sample_public_identifiers))
             .options(
                 joinedload(Sample.uploaded_pathogen_genome).undefer(
-                    UploadedPathogenGenome.sequence
+                    UploadedPathogenGenome.fasta_sequence
                 ),
             )
         )
@@ -36,15 +36,7 @@ def cli(samples_fh: io.TextIOBase, sequences_fh: io.TextIOBase):
         for sample in all_samples:
             pathogen_genome = sample.uploaded_pathogen_genome
 
-            sequence: str = "".join(
-                [
-                    line
-                    for line in pathogen_genome.sequence.splitlines()  # type: ignore
-                    if not (line.startswith(">") or line.startswith(";"))
-                ]
-            )
-
-            stripped_sequence: str = sequence.strip("Nn")
+            stripped_sequence = pathogen_genome.get_stripped_sequence()  # type: ignore
             sequences_fh.write(f">{pathogen_genome.entity_id}\n")  # type: ignore
             sequences_fh.write(stripped_sequence)
             sequences_fh.write("\n")
@@ -1,15 +1,22 @@
 import re
 import uuid
-from typing import Iterable, Optional
+from typing import Any, Iterable, Iterator, List, Mapping, Optional, Sequence
 
+import sqlalchemy as sa
 from sqlalchemy import Column, MetaData, Table
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.orm.session import Session
 from sqlalchemy.schema import CreateTable, DropTable
 from sqlalchemy.sql.elements import ClauseElement
+from sqlalchemy.sql.expression import Insert, Select
 
 # Used in names of temp tables to show intention to be temporary.
 TEMPORARY_INDICATOR = "temporary"
 
+# Postgres allows at most 32767 bind parameters per statement, and the widest
+# rows we insert in bulk (samples) have about a dozen columns.
+INSERT_BATCH_SIZE = 1000
+
 
 def create_temp_table(session: Session, source_table: Table) -> Table:
     """Creates new table, structured same as source. Intended to be temporary.
@@ -57,6 +64,80 @@ def mv_table_contents(
     session.execute(dest_table.insert().from_select(cols, source_table.select()))
 
 
+def upsert_table_contents(
+    session: Session,
+    source_table: Table,
+    dest_table: Table,
+    conflict_columns: List[str],
+    columns: Optional[Sequence[str]] = None,
+) -> None:
+    """Copies contents of source into dest, updating rows of dest that clash
+    with incoming rows on `conflict_columns` instead of duplicating them.
+
+    `conflict_columns` must match a unique constraint of dest_table. Primary
+    keys are left for dest_table to assign, so existing rows keep their ids.
+    If source has several rows for the same conflict columns, the one that
+    was inserted last wins.
+
+    If `columns` is given, only those columns (which must include the conflict
+    columns) are copied: new rows get dest_table's defaults for the others and
+    existing rows keep their values. Otherwise every non-primary key column is.
+    """
+    if columns is None:
+        cols = [col.name for col in dest_table.columns if not col.primary_key]
+    else:
+        cols = list(columns)
+    source_pk = [col for col in source_table.columns if col.primary_key]
+    conflict_source_cols = [source_table.c[name] for name in conflict_columns]
+    latest_rows = (
+        source_table.select()
+        .with_only_columns([source_table.c[name] for name in cols])
+        .distinct(*conflict_source_cols)
+        .order_by(*conflict_source_cols, *[col.desc() for col in source_pk])
+    )
+    upsert = insert(dest_table).from_select(cols, latest_rows)
+    upsert = upsert.on_conflict_do_update(
+        index_elements=conflict_columns,
+        set_={
+            name: upsert.excluded[name] for name in cols if name not in conflict_columns
+        },
+    )
+    session.execute(upsert)
+
+
+def reserve_ids_query(table: Table, count: int) -> Select:
+    """Takes `count` ids from the sequence behind `table`'s id column."""
+    sequence = sa.func.pg_get_serial_sequence(table.fullname, "id")
+    return sa.select(sa.func.nextval(sequence)).select_from(
+        sa.func.generate_series(1, count)
+    )
+
+
+def insert_batches(table: Table, rows: Sequence[Mapping[str, Any]]) -> Iterator[Insert]:
+    """Multi-row INSERTs of `rows` into `table`, INSERT_BATCH_SIZE rows each."""
+    for start in range(0, len(rows), INSERT_BATCH_SIZE):
+        yield sa.insert(table).values(list(rows[start : start + INSERT_BATCH_SIZE]))
+
+
+def reserve_ids(session: Session, table: Table, count: int) -> List[int]:
+    """Takes `count` ids from the sequence behind `table`'s id column, in
+    ascending order, so rows can be inserted with their ids known up front."""
+    if not count:
+        return []
+    return sorted(session.execute(reserve_ids_query(table, count)).scalars())
+
+
+def insert_rows(
+    session: Session, table: Table, rows: Sequence[Mapping[str, Any]]
+) -> None:
+    """Inserts `rows` into `table` with as few statements as we can.
+
+    This skips the ORM, so rows need every value the models would otherwise
+    fill in on flush."""
+    for statement in insert_batches(table, rows):
+        session.execute(statement)
+
+
 def drop_temp_table(
     session: Session, table_obj: Table, check_is_temp: bool = True
 ) -> None:
@@ -0,0 +1,26 @@
+from typing import IO, Iterator, List, Optional, Tuple
+
+
+def iter_fasta_records(fasta_fh: IO[str]) -> Iterator[Tuple[str, str]]:
+    """Yields (id, sequence) for each record in a FASTA file.
+
+    A much lighter weight alternative to `Bio.SeqIO.parse` for when we just
+    want the raw strings and don't need SeqRecord objects. Like biopython's
+    `record.id`, the id is the `>` line up until its first whitespace, so any
+    trailing description (eg, " |(reverse complement)") is dropped. Sequence
+    lines are joined together without their newlines.
+    """
+    record_id: Optional[str] = None
+    sequence_lines: List[str] = []
+    for line in fasta_fh:
+        line = line.rstrip()
+        if line.startswith(">"):
+            if record_id is not None:
+                yield record_id, "".join(sequence_lines)
+            header = line[1:].split(maxsplit=1)
+            record_id = header[0] if header else ""
+            sequence_lines = []
+        elif record_id is not None and line:
+            sequence_lines.append(line)
+    if record_id is not None:
+        yield record_id, "".join(sequence_lines)
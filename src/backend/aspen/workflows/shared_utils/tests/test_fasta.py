@@ -0,0 +1,32 @@
+import io
+
+from aspen.workflows.shared_utils.fasta import iter_fasta_records
+
+
+def test_iter_fasta_records():
+    fasta = io.StringIO(
+        ">1\n"
+        "ACGT\n"
+        "ACG\n"
+        "\n"
+        ">2 |(reverse complement)\r\n"
+        "NNNN\r\n"
+        ">3\n"
+        ">\n"
+        "TT\n"
+    )
+    assert list(iter_fasta_records(fasta)) == [
+        ("1", "ACGTACG"),
+        ("2", "NNNN"),
+        ("3", ""),
+        ("", "TT"),
+    ]
+
+
+def test_iter_fasta_records_ignores_lines_before_first_header():
+    fasta = io.StringIO("not a record\n>1\nAC\nGT")
+    assert list(iter_fasta_records(fasta)) == [("1", "ACGT")]
+
+
+def test_iter_fasta_records_empty():
+    assert list(iter_fasta_records(io.StringIO(""))) == []
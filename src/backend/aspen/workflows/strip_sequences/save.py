@@ -0,0 +1,85 @@
+"""Backfills the stripped sequence (see UploadedPathogenGenome.get_stripped_sequence)
+for uploaded genomes written before we stored it. Safe to re-run, and to run
+while the API is writing: it only touches genomes that don't have one yet."""
+from typing import Optional
+
+import click
+import sqlalchemy as sa
+from sqlalchemy.orm import Session
+
+from aspen.config.config import Config
+from aspen.database.connection import (
+    get_db_uri,
+    init_db,
+    session_scope,
+    SqlAlchemyInterface,
+)
+from aspen.database.models import PathogenGenome, UploadedPathogenGenome
+from aspen.util.sequences import strip_sequence
+
+BATCH_SIZE = 500
+
+
+def strip_sequences(
+    session: Session, batch_size: int = BATCH_SIZE, limit: Optional[int] = None
+) -> int:
+    """Stores stripped sequences a batch at a time, committing after each
+    batch. Returns how many genomes were updated."""
+    genomes = UploadedPathogenGenome.__table__
+    sequences = PathogenGenome.__table__
+    update = (
+        sa.update(genomes)
+        .where(genomes.c.pathogen_genome_id == sa.bindparam("genome_id"))
+        .values(
+            stripped_sequence=sa.bindparam("new_stripped_sequence"),
+            stripped_sequence_length=sa.bindparam("new_stripped_sequence_length"),
+        )
+    )
+    stripped = 0
+    last_id = 0
+    while limit is None or stripped < limit:
+        size = batch_size if limit is None else min(batch_size, limit - stripped)
+        rows = session.execute(
+            sa.select(genomes.c.pathogen_genome_id, sequences.c.sequence)
+            .join(sequences, sequences.c.entity_id == genomes.c.pathogen_genome_id)
+            .where(genomes.c.pathogen_genome_id > last_id)
+            .where(genomes.c.stripped_sequence_length.is_(None))
+            .order_by(genomes.c.pathogen_genome_id)
+            .limit(size)
+        ).all()
+        if not rows:
+            break
+        updates = []
+        for genome_id, sequence in rows:
+            stripped_sequence = strip_sequence(sequence)
+            updates.append(
+                {
+                    "genome_id": genome_id,
+                    "new_stripped_sequence": stripped_sequence,
+                    "new_stripped_sequence_length": len(stripped_sequence),
+                }
+            )
+        session.execute(update, updates)
+        session.commit()
+        stripped += len(rows)
+        last_id = rows[-1][0]
+        print(f"Stripped {stripped} sequences")
+    return stripped
+
+
+@click.command("save")
+@click.option("--batch-size", type=int, default=BATCH_SIZE)
+@click.option("--limit", type=int, default=None, help="Stop after this many")
+@click.option("--test", type=bool, is_flag=True)
+def cli(batch_size: int, limit: Optional[int], test: bool):
+    if test:
+        print("Success!")
+        return
+    interface: SqlAlchemyInterface = init_db(get_db_uri(Config()))
+    with session_scope(interface) as session:
+        stripped = strip_sequences(session, batch_size, limit)
+    print(f"Successfully stripped {stripped} sequences!")
+
+
+if __name__ == "__main__":
+    cli()
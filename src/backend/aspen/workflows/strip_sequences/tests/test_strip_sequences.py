@@ -0,0 +1,80 @@
+import sqlalchemy as sa
+from sqlalchemy.orm import undefer
+
+from aspen.database.models import UploadedPathogenGenome
+from aspen.test_infra.models.location import location_factory
+from aspen.test_infra.models.pathogen import random_pathogen_factory
+from aspen.test_infra.models.sample import sample_factory
+from aspen.test_infra.models.sequences import uploaded_pathogen_genome_factory
+from aspen.test_infra.models.usergroup import group_factory, user_factory
+from aspen.workflows.strip_sequences.save import strip_sequences
+
+
+def create_genomes(session, sequences):
+    group = group_factory()
+    uploaded_by_user = user_factory(group)
+    pathogen = random_pathogen_factory()
+    location = location_factory(
+        "North America", "USA", "California", "Santa Barbara County"
+    )
+    for i, sequence in enumerate(sequences):
+        sample = sample_factory(
+            group,
+            uploaded_by_user,
+            location,
+            pathogen=pathogen,
+            private_identifier=f"private_identifier_{i}",
+            public_identifier=f"public_identifier_{i}",
+        )
+        session.add(uploaded_pathogen_genome_factory(sample, sequence=sequence))
+    session.commit()
+
+
+def stored_values(session):
+    return [
+        tuple(row)
+        for row in session.execute(
+            sa.text(
+                "SELECT stripped_sequence, stripped_sequence_length"
+                " FROM aspen.uploaded_pathogen_genomes ORDER BY pathogen_genome_id"
+            )
+        )
+    ]
+
+
+def test_strip_sequences(session):
+    sequences = [">sample 1\nNNACGT\nACGTNN\n", ">sample 2\nnTTTT\n", "GGGG"]
+    create_genomes(session, sequences)
+    # New genomes get their stripped sequence when they're written.
+    expected = [("ACGTACGT", 8), ("TTTT", 4), ("GGGG", 4)]
+    assert stored_values(session) == expected
+
+    # Forget them, like genomes written before we stored them.
+    session.execute(
+        sa.text(
+            "UPDATE aspen.uploaded_pathogen_genomes"
+            " SET stripped_sequence = NULL, stripped_sequence_length = NULL"
+        )
+    )
+    session.commit()
+
+    # They're still stripped on read until they're backfilled.
+    genomes = (
+        session.query(UploadedPathogenGenome)
+        .options(undefer(UploadedPathogenGenome.fasta_sequence))
+        .order_by(UploadedPathogenGenome.pathogen_genome_id)
+        .all()
+    )
+    assert [genome.get_stripped_sequence() for genome in genomes] == [
+        "ACGTACGT",
+        "TTTT",
+        "GGGG",
+    ]
+
+    assert strip_sequences(session, batch_size=2, limit=2) == 2
+    assert stored_values(session) == expected[:2] + [(None, None)]
+
+    # Only the remaining genome gets stripped on another run.
+    assert strip_sequences(session, batch_size=2) == 1
+    assert stored_values(session) == expected
+    assert strip_sequences(session) == 0
@@ -0,0 +1,29 @@
+"""index samples public identifier
+
+Create Date: 2026-10-18 09:35:12.402117
+
+"""
+import enumtables  # noqa: F401
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "20261018_093512"
+down_revision = "20230321_232555"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index(
+        op.f("ix_samples_public_identifier"),
+        "samples",
+        ["public_identifier"],
+        unique=False,
+        schema="aspen",
+    )
+
+
+def downgrade():
+    op.drop_index(
+        op.f("ix_samples_public_identifier"), table_name="samples", schema="aspen"
+    )
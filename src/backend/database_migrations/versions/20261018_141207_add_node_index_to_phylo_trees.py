@@ -0,0 +1,27 @@
+"""add node index to phylo trees
+
+Create Date: 2026-10-18 14:12:07.518204
+
+"""
+import enumtables  # noqa: F401
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = "20261018_141207"
+down_revision = "20261018_093512"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column(
+        "phylo_trees",
+        sa.Column("node_index", postgresql.JSONB(astext_type=sa.Text()), nullable=True),
+        schema="aspen",
+    )
+
+
+def downgrade():
+    op.drop_column("phylo_trees", "node_index", schema="aspen")
@@ -0,0 +1,26 @@
+"""add public tree s3 key to phylo trees
+
+Create Date: 2026-10-18 16:33:44.906315
+
+"""
+import enumtables  # noqa: F401
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "20261018_163344"
+down_revision = "20261018_141207"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column(
+        "phylo_trees",
+        sa.Column("public_tree_s3_key", sa.String(), nullable=True),
+        schema="aspen",
+    )
+
+
+def downgrade():
+    op.drop_column("phylo_trees", "public_tree_s3_key", schema="aspen")
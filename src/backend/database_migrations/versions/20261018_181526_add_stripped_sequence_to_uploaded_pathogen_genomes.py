@@ -0,0 +1,35 @@
+"""add stripped sequence to uploaded pathogen genomes
+
+Create Date: 2026-10-18 18:15:26.314852
+
+"""
+import enumtables  # noqa: F401
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "20261018_181526"
+down_revision = "20261018_163344"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Both are filled in for existing genomes by the strip_sequences workflow.
+    op.add_column(
+        "uploaded_pathogen_genomes",
+        sa.Column("stripped_sequence", sa.String(), nullable=True),
+        schema="aspen",
+    )
+    op.add_column(
+        "uploaded_pathogen_genomes",
+        sa.Column("stripped_sequence_length", sa.Integer(), nullable=True),
+        schema="aspen",
+    )
+
+
+def downgrade():
+    op.drop_column(
+        "uploaded_pathogen_genomes", "stripped_sequence_length", schema="aspen"
+    )
+    op.drop_column("uploaded_pathogen_genomes", "stripped_sequence", schema="aspen")
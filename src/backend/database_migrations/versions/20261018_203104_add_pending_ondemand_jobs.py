@@ -0,0 +1,76 @@
+"""add pending ondemand jobs
+
+Create Date: 2026-10-18 20:31:04.518207
+
+"""
+import enumtables  # noqa: F401
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = "20261018_203104"
+down_revision = "20261018_181526"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "ondemand_job_types",
+        sa.Column("item_id", sa.String(), nullable=False),
+        sa.PrimaryKeyConstraint("item_id", name=op.f("pk_ondemand_job_types")),
+        schema="aspen",
+    )
+    op.enum_insert("ondemand_job_types", ["PANGOLIN", "LINEAGE_QC"], schema="aspen")
+    op.create_table(
+        "pending_ondemand_jobs",
+        sa.Column("id", sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column("group_id", sa.Integer(), nullable=False),
+        sa.Column("pathogen_id", sa.Integer(), nullable=False),
+        sa.Column("job_type", enumtables.enum_column.EnumType(), nullable=False),
+        sa.Column(
+            "sample_ids", postgresql.JSONB(astext_type=sa.Text()), nullable=False
+        ),
+        sa.Column(
+            "created_at",
+            sa.DateTime(),
+            server_default=sa.text("now()"),
+            nullable=False,
+        ),
+        sa.ForeignKeyConstraint(
+            ["group_id"],
+            ["aspen.groups.id"],
+            name=op.f("fk_pending_ondemand_jobs_group_id_groups"),
+        ),
+        sa.ForeignKeyConstraint(
+            ["pathogen_id"],
+            ["aspen.pathogens.id"],
+            name=op.f("fk_pending_ondemand_jobs_pathogen_id_pathogens"),
+        ),
+        sa.ForeignKeyConstraint(
+            ["job_type"],
+            ["aspen.ondemand_job_types.item_id"],
+            name=op.f("fk_pending_ondemand_jobs_job_type_ondemand_job_types"),
+        ),
+        sa.PrimaryKeyConstraint("id", name=op.f("pk_pending_ondemand_jobs")),
+        schema="aspen",
+    )
+    op.create_index(
+        "ix_pending_ondemand_jobs_group_id_pathogen_id_job_type",
+        "pending_ondemand_jobs",
+        ["group_id", "pathogen_id", "job_type"],
+        unique=False,
+        schema="aspen",
+    )
+
+
+def downgrade():
+    op.drop_index(
+        "ix_pending_ondemand_jobs_group_id_pathogen_id_job_type",
+        table_name="pending_ondemand_jobs",
+        schema="aspen",
+    )
+    op.drop_table("pending_ondemand_jobs", schema="aspen")
+    op.enum_delete("ondemand_job_types", ["PANGOLIN", "LINEAGE_QC"], schema="aspen")
+    op.drop_table("ondemand_job_types", schema="aspen")
@@ -0,0 +1,28 @@
+"""add auth version to users
+
+Create Date: 2026-10-19 09:04:12.371925
+
+"""
+import enumtables  # noqa: F401
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "20261019_090412"
+down_revision = "20261018_203104"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column(
+        "users",
+        sa.Column(
+            "auth_version", sa.Integer(), server_default=sa.text("0"), nullable=False
+        ),
+        schema="aspen",
+    )
+
+
+def downgrade():
+    op.drop_column("users", "auth_version", schema="aspen")
@@ -0,0 +1,40 @@
+"""add retries to pending ondemand jobs
+
+Create Date: 2026-10-19 14:22:08.514093
+
+"""
+import enumtables  # noqa: F401
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "20261019_142208"
+down_revision = "20261019_090412"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column(
+        "pending_ondemand_jobs",
+        sa.Column(
+            "attempts", sa.Integer(), server_default=sa.text("0"), nullable=False
+        ),
+        schema="aspen",
+    )
+    op.add_column(
+        "pending_ondemand_jobs",
+        sa.Column("retry_at", sa.DateTime(), nullable=True),
+        schema="aspen",
+    )
+    op.add_column(
+        "pending_ondemand_jobs",
+        sa.Column("failed_at", sa.DateTime(), nullable=True),
+        schema="aspen",
+    )
+
+
+def downgrade():
+    op.drop_column("pending_ondemand_jobs", "failed_at", schema="aspen")
+    op.drop_column("pending_ondemand_jobs", "retry_at", schema="aspen")
+    op.drop_column("pending_ondemand_jobs", "attempts", schema="aspen")
@@ -0,0 +1,53 @@
+"""add public tree location to phylo trees
+
+Create Date: 2026-10-19 16:05:14.271843
+
+"""
+import enumtables  # noqa: F401
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "20261019_160514"
+down_revision = "20261019_142208"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column(
+        "phylo_trees",
+        sa.Column("public_tree_location_id", sa.Integer(), nullable=True),
+        schema="aspen",
+    )
+    op.add_column(
+        "phylo_trees",
+        sa.Column("public_tree_latitude", sa.Float(), nullable=True),
+        schema="aspen",
+    )
+    op.add_column(
+        "phylo_trees",
+        sa.Column("public_tree_longitude", sa.Float(), nullable=True),
+        schema="aspen",
+    )
+    op.create_foreign_key(
+        op.f("fk_phylo_trees_public_tree_location_id_locations"),
+        "phylo_trees",
+        "locations",
+        ["public_tree_location_id"],
+        ["id"],
+        source_schema="aspen",
+        referent_schema="aspen",
+    )
+
+
+def downgrade():
+    op.drop_constraint(
+        op.f("fk_phylo_trees_public_tree_location_id_locations"),
+        "phylo_trees",
+        schema="aspen",
+        type_="foreignkey",
+    )
+    op.drop_column("phylo_trees", "public_tree_longitude", schema="aspen")
+    op.drop_column("phylo_trees", "public_tree_latitude", schema="aspen")
+    op.drop_column("phylo_trees", "public_tree_location_id", schema="aspen")
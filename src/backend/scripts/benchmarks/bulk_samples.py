@@ -0,0 +1,164 @@
+"""Benchmark for creating uploaded samples, one ORM object at a time vs. in bulk.
+
+Runs synthetic uploads through the checks and inserts `create_samples` does,
+the way it used to (a location lookup per row, full Sample rows loaded to check
+for duplicates, and a Sample and UploadedPathogenGenome added per row) and
+through `aspen.api.utils.bulk_samples`. Needs a database with the aspen schema;
+everything is written in transactions that are rolled back. Run it with:
+
+    DB_DSN=postgresql+asyncpg://... python scripts/benchmarks/bulk_samples.py \\
+        --samples 1000 --samples 5000 --samples 10000
+"""
+import asyncio
+import datetime
+import random
+import time
+from typing import Awaitable, Callable, List, Tuple
+from uuid import uuid1
+
+import click
+import sqlalchemy as sa
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from aspen.api.schemas.samples import CreateSampleRequest
+from aspen.api.utils.bulk_samples import create_uploaded_samples, get_locations_by_id
+from aspen.api.utils.sample import check_duplicate_samples
+from aspen.database.connection import init_async_db, SqlAlchemyInterface
+from aspen.database.models import (
+    Group,
+    Location,
+    Pathogen,
+    Sample,
+    UploadedPathogenGenome,
+    User,
+)
+from aspen.test_infra.models.location import location_factory
+from aspen.test_infra.models.pathogen import random_pathogen_factory
+from aspen.test_infra.models.usergroup import group_factory, user_factory
+
+SC2_GENOME_LENGTH = 29903
+PUBLIC_IDENTIFIER_PREFIX = "hCoV-19"
+
+Fixtures = Tuple[Group, User, Pathogen, Location]
+
+
+def make_requests(num_samples: int, seed: int = 0) -> List[CreateSampleRequest]:
+    rng = random.Random(seed)
+    sequence = "".join(rng.choices("ACGT", k=SC2_GENOME_LENGTH))
+    return [
+        CreateSampleRequest.parse_obj(
+            {
+                "sample": {
+                    "private_identifier": f"benchmark-{i}",
+                    "collection_date": datetime.date.today(),
+                    "location_id": 0,
+                    "private": False,
+                },
+                "pathogen_genome": {"sequence": sequence},
+            }
+        )
+        for i in range(num_samples)
+    ]
+
+
+async def add_fixtures(db: AsyncSession) -> Fixtures:
+    name = f"benchmark-{uuid1()}"
+    group = group_factory(name=name)
+    user = user_factory(group, auth0_user_id=name, email=f"{name}@dph.org")
+    pathogen = random_pathogen_factory()
+    location = location_factory("North America", "USA", "California", name)
+    db.add_all([group, user, pathogen, location])
+    await db.flush()
+    return group, user, pathogen, location
+
+
+async def create_one_by_one(
+    db: AsyncSession, fixtures: Fixtures, requests: List[CreateSampleRequest]
+) -> None:
+    group, user, pathogen, _ = fixtures
+    private_ids = [row.sample.private_identifier for row in requests]
+    # The requests have no public ids, they're generated.
+    for column, ids in [
+        (Sample.private_identifier, private_ids),
+        (Sample.public_identifier, []),
+    ]:
+        await db.execute(sa.select(Sample).where(column.in_(ids)))  # type: ignore
+    for row in requests:
+        location = await Location.get_by_id(db, row.sample.location_id)
+        sample = Sample(
+            submitting_group=group,
+            uploaded_by=user,
+            sample_collected_by=group.name,
+            sample_collector_contact_address=group.address,
+            organism=row.sample.organism,
+            private_identifier=row.sample.private_identifier,
+            collection_date=row.sample.collection_date,
+            private=row.sample.private,
+            authors=[group.name],
+            collection_location=location,
+            pathogen=pathogen,
+        )
+        sample.generate_public_identifier(PUBLIC_IDENTIFIER_PREFIX)
+        db.add(sample)
+        db.add(
+            UploadedPathogenGenome(sample=sample, sequence=row.pathogen_genome.sequence)
+        )
+    await db.flush()
+
+
+async def create_in_bulk(
+    db: AsyncSession, fixtures: Fixtures, requests: List[CreateSampleRequest]
+) -> None:
+    group, user, pathogen, _ = fixtures
+    await check_duplicate_samples(requests, db, group.id)
+    locations = await get_locations_by_id(
+        db, (row.sample.location_id for row in requests)
+    )
+    await create_uploaded_samples(
+        db, group, user, pathogen, PUBLIC_IDENTIFIER_PREFIX, locations, requests
+    )
+
+
+async def time_upload(
+    interface: SqlAlchemyInterface,
+    create: Callable[
+        [AsyncSession, Fixtures, List[CreateSampleRequest]], Awaitable[None]
+    ],
+    requests: List[CreateSampleRequest],
+) -> float:
+    db = interface.make_session()
+    try:
+        fixtures = await add_fixtures(db)
+        for row in requests:
+            row.sample.location_id = fixtures[3].id
+        start = time.perf_counter()
+        await create(db, fixtures, requests)
+        return time.perf_counter() - start
+    finally:
+        await db.rollback()
+        await db.close()
+
+
+async def run(db_uri: str, sample_counts: Tuple[int, ...]) -> None:
+    interface = init_async_db(db_uri)
+    for count in sample_counts:
+        requests = make_requests(count)
+        print(f"{count} samples of {SC2_GENOME_LENGTH}bp:")
+        for name, create in [
+            ("one by one", create_one_by_one),
+            ("bulk", create_in_bulk),
+        ]:
+            seconds = await time_upload(interface, create, requests)
+            print(f"  {name + ':':<12}{seconds:>8.2f}s {count / seconds:>8.0f} rows/s")
+    await interface.engine.dispose()
+
+
+@click.command("bulk_samples")
+@click.option("--db-uri", envvar="DB_DSN", required=True)
+@click.option("--samples", type=int, multiple=True, default=[1000, 5000, 10000])
+def cli(db_uri: str, samples: Tuple[int, ...]):
+    asyncio.run(run(db_uri, samples))
+
+
+if __name__ == "__main__":
+    cli()
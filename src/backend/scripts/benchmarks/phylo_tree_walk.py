@@ -0,0 +1,71 @@
+"""Micro-benchmark for the tree processing we do when serving Auspice trees.
+
+Compares the old per-task recursive walks against a single pass of the
+stack-based walker on a synthetic tree. Run it with:
+
+    python scripts/benchmarks/phylo_tree_walk.py --leaves 50000
+"""
+import copy
+import time
+from typing import Callable, Dict
+
+import click
+
+from aspen.phylo_tree.tests.utils.tree_utils import (
+    make_synthetic_tree,
+    PREFIX,
+    recursive_accessions,
+    recursive_locations,
+    recursive_names,
+    recursive_rename,
+)
+from aspen.phylo_tree.walk import (
+    AccessionCollector,
+    LocationCollector,
+    NameCollector,
+    NodeRenamer,
+    walk_tree,
+)
+
+
+def recursive_passes(tree: Dict, name_map: Dict[str, str]) -> None:
+    recursive_names([tree])
+    recursive_locations(tree)
+    recursive_rename(PREFIX, tree, name_map, "GISAID_ID")
+    recursive_accessions([], tree)
+
+
+def single_pass(tree: Dict, name_map: Dict[str, str]) -> None:
+    walk_tree(
+        tree,
+        NameCollector(),
+        LocationCollector(),
+        NodeRenamer(PREFIX, name_map, "GISAID_ID"),
+        AccessionCollector(),
+    )
+
+
+def time_it(func: Callable[[Dict, Dict[str, str]], None], tree: Dict, runs: int):
+    timings = []
+    for _ in range(runs):
+        tree_copy = copy.deepcopy(tree)
+        start = time.perf_counter()
+        func(tree_copy, {})
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+@click.command("phylo_tree_walk")
+@click.option("--leaves", type=int, default=50000)
+@click.option("--runs", type=int, default=5)
+def cli(leaves: int, runs: int):
+    tree = make_synthetic_tree(leaves)
+    recursive = time_it(recursive_passes, tree, runs)
+    iterative = time_it(single_pass, tree, runs)
+    print(f"{leaves} leaves, best of {runs} runs:")
+    print(f"  recursive, one walk per task: {recursive * 1000:.1f}ms")
+    print(f"  iterative, single walk:       {iterative * 1000:.1f}ms")
+
+
+if __name__ == "__main__":
+    cli()
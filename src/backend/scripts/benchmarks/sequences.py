@@ -0,0 +1,106 @@
+"""Micro-benchmark for how we store and read genome sequences.
+
+Generates synthetic FASTA records the size of SARS-CoV-2 (30kb) and mpox
+(200kb) genomes, and reports how many bytes each one takes stored plain vs
+packed, how fast we can pack and unpack them, and how long computing their
+statistics and stripping them for FASTAs (which uploaded genomes now store)
+takes. Run it with:
+
+    python scripts/benchmarks/sequences.py --genome-length 30000 --genome-length 200000
+"""
+import random
+import time
+from typing import Any, Callable, List, Tuple
+
+import click
+
+from aspen.util.sequences import (
+    normalize_sequence,
+    pack_sequence,
+    sequence_statistics,
+    strip_sequence,
+    unpack_sequence,
+)
+
+FASTA_LINE_LENGTH = 60
+
+
+def make_fasta_record(genome_length: int, seed: int = 0) -> str:
+    """A wrapped FASTA record, padded with Ns at both ends and with a few Ns and
+    ambiguous bases sprinkled through it, like the uploads we see."""
+    rng = random.Random(seed)
+    bases = rng.choices("ACGT", k=genome_length)
+    for _ in range(genome_length // 1000):
+        start = rng.randrange(genome_length)
+        bases[start : start + rng.randrange(1, 200)] = "N" * rng.randrange(1, 200)
+    for _ in range(genome_length // 5000):
+        bases[rng.randrange(len(bases))] = rng.choice("RYKMSW")
+    sequence = "N" * 50 + "".join(bases) + "N" * 100
+    lines = [
+        sequence[i : i + FASTA_LINE_LENGTH]
+        for i in range(0, len(sequence), FASTA_LINE_LENGTH)
+    ]
+    return ">hCoV-19/USA/CA-CZB-1234/2022\n" + "\n".join(lines) + "\n"
+
+
+def per_character_statistics(sequence: str) -> Tuple[int, int, int]:
+    """How PathogenGenome computed its statistics before, one pass each."""
+    return (
+        sum((1 for i in sequence if i in ("ACTGU"))),
+        sum((1 for i in sequence if i == "N")),
+        sum((1 for i in sequence if i not in ("ACTGUN-"))),
+    )
+
+
+def time_it(func: Callable[[str], Any], value: str, runs: int) -> float:
+    timings: List[float] = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        func(value)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def benchmark(genome_length: int, runs: int) -> List[Tuple[str, str]]:
+    record = make_fasta_record(genome_length)
+    packed = pack_sequence(record)
+    normalized_length = len(normalize_sequence(record))
+    results = [
+        ("plain bytes", f"{len(record.encode('utf-8'))}"),
+        (
+            "packed bytes",
+            f"{len(packed.encode('utf-8'))} "
+            f"({len(record) / len(packed):.1f}x smaller)",
+        ),
+    ]
+    for name, func, value in [
+        ("pack", pack_sequence, record),
+        ("unpack", unpack_sequence, packed),
+        ("normalize plain", normalize_sequence, record),
+        ("strip plain", strip_sequence, record),
+        ("stats, 3 passes", per_character_statistics, record),
+        ("stats, 1 pass", sequence_statistics, record),
+    ]:
+        seconds = time_it(func, value, runs)
+        results.append(
+            (
+                name,
+                f"{seconds * 1000:.2f}ms "
+                f"({normalized_length / seconds / 1024 / 1024:.0f}MB/s)",
+            )
+        )
+    return results
+
+
+@click.command("sequences")
+@click.option("--genome-length", type=int, multiple=True, default=[30000, 200000])
+@click.option("--runs", type=int, default=20)
+def cli(genome_length: Tuple[int, ...], runs: int):
+    for length in genome_length:
+        print(f"{length}bp genome, best of {runs} runs:")
+        for name, result in benchmark(length, runs):
+            print(f"  {name + ':':<18}{result}")
+
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,221 @@
+"""Benchmarks for how we stream FASTA and submission template downloads.
+
+`synthetic` runs made-up downloads through the same StreamingResponse the
+/sequences/ and /submission_template endpoints return, and counts the ASGI
+send events and bytes that make it to the server, with and without chunking
+and gzip. It doesn't need a database:
+
+    python scripts/benchmarks/stream_downloads.py synthetic --samples 10000
+
+`endpoints` downloads real samples through a running API (eg, the
+docker-compose one), with and without gzip, and reports the time to the
+first byte and the throughput over the wire:
+
+    python scripts/benchmarks/stream_downloads.py endpoints \\
+        --org-id 1 --token "$GENEPI_TOKEN" --samples 5000
+"""
+import asyncio
+import random
+import time
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+import click
+import requests
+from fastapi.responses import StreamingResponse
+
+from aspen.api.utils.chunked_output import chunk_output_async, DEFAULT_CHUNK_SIZE
+from aspen.api.utils.tsv_streamer import GenBankSubmissionFormTSVStreamer
+
+SC2_GENOME_LENGTH = 29903
+LOCALDEV_BACKEND_URL = "http://backend.genepinet.localdev:3000"
+
+
+async def fasta_records(
+    num_samples: int, genome_length: int, seed: int = 0
+) -> AsyncIterator[str]:
+    """What FastaStreamer.records yields, minus the db."""
+    rng = random.Random(seed)
+    genome = "".join(rng.choice("ACGT") for _ in range(genome_length))
+    for i in range(num_samples):
+        yield f">hCoV-19/USA/CA-CZB-{i}/2022\n"
+        yield genome
+        yield "\n"
+
+
+def genbank_rows(num_samples: int) -> List[Dict[str, str]]:
+    return [
+        {
+            "Sequence_ID": f"SARS-CoV-2/human/USA/CA-CZB-{i}/2022",
+            "collection-date": "2022-01-01",
+            "country": "USA: California, Alameda County",
+            "isolate": f"SARS-CoV-2/human/USA/CA-CZB-{i}/2022",
+            "isolation-source": "Nasopharyngeal/oropharyngeal swab",
+        }
+        for i in range(num_samples)
+    ]
+
+
+async def drain(response: StreamingResponse) -> Tuple[int, int]:
+    """Runs `response` as an ASGI app, returning how many body messages it sent
+    and how many bytes they held."""
+    events = 0
+    body_bytes = 0
+
+    async def receive():
+        # Never disconnect.
+        await asyncio.Event().wait()
+
+    async def send(message):
+        nonlocal events, body_bytes
+        if message["type"] == "http.response.body":
+            events += 1
+            body_bytes += len(message.get("body", b""))
+
+    await response({"type": "http"}, receive, send)
+    return events, body_bytes
+
+
+def report(name: str, events: int, body_bytes: int, seconds: float) -> None:
+    throughput = body_bytes / seconds / 1024 / 1024
+    print(
+        f"  {name:<24} {events:>8} sends {body_bytes / 1024 / 1024:>9.1f}MB "
+        f"{seconds * 1000:>9.1f}ms {throughput:>8.1f}MB/s"
+    )
+
+
+async def run_fasta(
+    samples: int, genome_length: int, chunk_size: Optional[int], compress: bool
+) -> Tuple[int, int, float]:
+    if chunk_size is None:
+        # How FastaStreamer used to stream: every record piece on its own.
+        body: AsyncIterator = fasta_records(samples, genome_length)
+    else:
+        body = chunk_output_async(
+            fasta_records(samples, genome_length), chunk_size, compress
+        )
+    start = time.perf_counter()
+    events, body_bytes = await drain(StreamingResponse(body))
+    return events, body_bytes, time.perf_counter() - start
+
+
+async def run_genbank(
+    samples: int, chunk_size: Optional[int], compress: bool
+) -> Tuple[int, int, float]:
+    streamer = GenBankSubmissionFormTSVStreamer("metadata.tsv", genbank_rows(samples))
+    if chunk_size is None:
+        # How FieldSeparatedStreamer used to stream: a send per row.
+        response = StreamingResponse(streamer.rows())
+    else:
+        streamer.chunk_size = chunk_size
+        response = streamer.get_response(gzip=compress)
+    start = time.perf_counter()
+    events, body_bytes = await drain(response)
+    return events, body_bytes, time.perf_counter() - start
+
+
+def download(
+    session: requests.Session, url: str, body: Dict, gzip: bool
+) -> Tuple[float, int, str, float]:
+    """POSTs `body` to `url` and reads the whole response. Returns the time to
+    the first byte, the bytes on the wire, their encoding, and the total time."""
+    headers = {"Accept-Encoding": "gzip" if gzip else "identity"}
+    start = time.perf_counter()
+    first_byte = None
+    wire_bytes = 0
+    with session.post(url, json=body, headers=headers, stream=True) as response:
+        response.raise_for_status()
+        # Read the raw stream ourselves, so we count what was actually sent.
+        for chunk in response.raw.stream(DEFAULT_CHUNK_SIZE, decode_content=False):
+            if first_byte is None:
+                first_byte = time.perf_counter() - start
+            wire_bytes += len(chunk)
+        encoding = response.headers.get("Content-Encoding", "identity")
+    total = time.perf_counter() - start
+    return first_byte or total, wire_bytes, encoding, total
+
+
+def report_download(
+    first_byte: float, wire_bytes: int, encoding: str, seconds: float
+) -> None:
+    throughput = wire_bytes / seconds / 1024 / 1024
+    print(
+        f"  {encoding:<10} {wire_bytes / 1024 / 1024:>9.1f}MB "
+        f"first byte {first_byte * 1000:>8.1f}ms total {seconds * 1000:>9.1f}ms "
+        f"{throughput:>8.1f}MB/s"
+    )
+
+
+@click.group()
+def cli():
+    pass
+
+
+@cli.command("synthetic")
+@click.option("--samples", type=int, default=10000)
+@click.option("--genome-length", type=int, default=SC2_GENOME_LENGTH)
+@click.option("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+def synthetic(samples: int, genome_length: int, chunk_size: int):
+    variants = [
+        ("unchunked", None, False),
+        (f"{chunk_size // 1024}KiB chunks", chunk_size, False),
+        (f"{chunk_size // 1024}KiB chunks, gzip", chunk_size, True),
+    ]
+    print(f"/sequences/, {samples} samples of {genome_length}bp:")
+    for name, size, compress in variants:
+        report(name, *asyncio.run(run_fasta(samples, genome_length, size, compress)))
+    print(f"/submission_template (GenBank), {samples} samples:")
+    for name, size, compress in variants:
+        report(name, *asyncio.run(run_genbank(samples, size, compress)))
+
+
+@cli.command("endpoints")
+@click.option("--url", default=LOCALDEV_BACKEND_URL, show_default=True)
+@click.option("--org-id", type=int, required=True)
+@click.option("--pathogen", default="SC2", show_default=True)
+@click.option(
+    "--token",
+    envvar="GENEPI_TOKEN",
+    required=True,
+    help="An auth0 id token for a member of the org.",
+)
+@click.option(
+    "--samples",
+    type=int,
+    default=1000,
+    help="How many of the org's samples to download.",
+)
+@click.option("--runs", type=int, default=3)
+def endpoints(
+    url: str, org_id: int, pathogen: str, token: str, samples: int, runs: int
+):
+    session = requests.Session()
+    session.headers["Authorization"] = f"Bearer {token}"
+    base_url = f"{url}/v2/orgs/{org_id}/pathogens/{pathogen}"
+
+    res = session.get(f"{base_url}/samples/")
+    res.raise_for_status()
+    sample_ids = [
+        sample["public_identifier"]
+        for sample in res.json()["samples"]
+        if sample["public_identifier"]
+    ][:samples]
+    if not sample_ids:
+        raise click.ClickException(f"Org {org_id} has no {pathogen} samples")
+
+    requests_to_time = [
+        ("/sequences/", f"{base_url}/sequences/", {"sample_ids": sample_ids}),
+        (
+            "/submission_template",
+            f"{base_url}/samples/submission_template",
+            {"sample_ids": sample_ids, "public_repository_name": "GenBank"},
+        ),
+    ]
+    for name, endpoint, body in requests_to_time:
+        print(f"{name}, {len(sample_ids)} samples, best of {runs} runs:")
+        for gzip in [False, True]:
+            timings = [download(session, endpoint, body, gzip) for _ in range(runs)]
+            report_download(*min(timings, key=lambda timing: timing[-1]))
+
+
+if __name__ == "__main__":
+    cli()